@@ -0,0 +1,153 @@
+# ===========================================
+# accounts/authentication.py
+# ===========================================
+"""
+Authentification JWT sans lecture de la table users à chaque requête.
+
+L'utilisateur désigné par le jeton est lu dans un LRU du processus (durée de
+vie AUTH_USER_CACHE_TTL secondes), puis dans le cache partagé si
+AUTH_USER_SHARED_CACHE (settings.CACHES, durée AUTH_USER_SHARED_CACHE_TTL),
+et seulement ensuite en base. Toute sauvegarde ou suppression d'un
+utilisateur l'efface des deux caches après validation ; les LRU des autres
+processus le servent au plus AUTH_USER_CACHE_TTL secondes de plus (délai
+maximal de prise en compte d'une désactivation de compte).
+
+Le jeton porte l'empreinte du mot de passe (SIMPLE_JWT CHECK_REVOKE_TOKEN) :
+si elle diffère de celle de l'utilisateur en cache, celui-ci est relu en base
+(et remis en cache) avant de conclure. Un jeton émis après un changement de
+mot de passe est donc accepté sans attendre l'expiration du cache, et un jeton
+antérieur est refusé dès que la base a changé.
+
+Chaque requête reçoit sa propre copie de l'utilisateur : les objets liés
+qu'elle charge (ex. user.wallet) ne sont pas partagés.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import User
+
+SHARED_KEY = 'auth:user:{}'
+
+
+class UserLRU:
+    """LRU borné à durée de vie, partagé par les threads du processus"""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # id -> (expire à, utilisateur)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, user):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+_local = None
+
+
+def local_cache():
+    global _local
+    if _local is None:
+        _local = UserLRU(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+    return _local
+
+
+def resolve(user_id, fresh=False):
+    """
+    Utilisateur d'id `user_id` (copie propre à l'appelant), ou None s'il n'existe
+    pas. `fresh` ignore les caches et les met à jour depuis la base.
+    """
+    key = str(user_id)
+    user = None if fresh else local_cache().get(key)
+    if user is not None:
+        return copy.copy(user)
+
+    if settings.AUTH_USER_SHARED_CACHE and not fresh:
+        user = cache.get(SHARED_KEY.format(key))
+    if user is None:
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            return None
+        if settings.AUTH_USER_SHARED_CACHE:
+            cache.set(SHARED_KEY.format(key), user, timeout=settings.AUTH_USER_SHARED_CACHE_TTL)
+    local_cache().set(key, copy.copy(user))
+    return user
+
+
+def invalidate(user_id):
+    key = str(user_id)
+    local_cache().discard(key)
+    if settings.AUTH_USER_SHARED_CACHE:
+        cache.delete(SHARED_KEY.format(key))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Après validation : une lecture concurrente ne doit pas remettre l'ancienne version en cache
+    db_transaction.on_commit(partial(invalidate, getattr(instance, api_settings.USER_ID_FIELD)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication dont l'utilisateur vient du cache (mêmes contrôles que simplejwt)"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = resolve(user_id)
+        if user is not None and not self.matches(validated_token, user):
+            # Cache antérieur (ou postérieur) au mot de passe du jeton : la base tranche
+            user = resolve(user_id, fresh=True)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if not self.matches(validated_token, user):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    @staticmethod
+    def matches(validated_token, user):
+        """Le jeton a-t-il été émis pour le mot de passe actuel de `user` ?"""
+        if not api_settings.CHECK_REVOKE_TOKEN:
+            return True
+        return validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) == get_md5_hash_password(user.password)
@@ -0,0 +1,194 @@
+# ===========================================
+# accounts/ledger.py
+# ===========================================
+"""
+Grand livre en partie double, en ajout seul.
+
+Tout mouvement de solde est un INSERT de plusieurs écritures de somme nulle :
+aucune ligne n'est modifiée, il n'y a donc pas de verrou de ligne disputé.
+Le solde d'un compte est son dernier instantané (BalanceSnapshot) plus ses
+écritures postérieures ; compact() écrit périodiquement de nouveaux instantanés
+pour que cette lecture reste courte.
+"""
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from .models import BalanceSnapshot, LedgerEntry
+
+ENTRIES_TABLE = LedgerEntry._meta.db_table
+SNAPSHOTS_TABLE = BalanceSnapshot._meta.db_table
+
+# Comptes système, contreparties des portefeuilles
+PAYTECH_CLEARING = 'external:paytech'
+OPENING_BALANCE = 'equity:opening'
+FEES_REVENUE = 'revenue:fees'
+
+# Verrou consultatif : une seule compaction à la fois
+COMPACTION_LOCK_ID = 0x1ED6E5
+
+
+class UnbalancedJournal(ValueError):
+    pass
+
+
+def wallet_account(wallet_id):
+    return f'wallet:{wallet_id}'
+
+
+def wallet_entries(wallets):
+    """Écritures des comptes des portefeuilles d'un queryset Wallet, en sous-requête"""
+    accounts = wallets.annotate(account=Concat(Value('wallet:'), Cast('id', CharField()))).values('account')
+    return LedgerEntry.objects.filter(account__in=accounts)
+
+
+def post(legs, transaction_id=None, description=''):
+    """
+    Enregistre un journal : `legs` est une liste de (compte, montant signé) de
+    somme nulle, insérée en un seul INSERT multi-lignes. Une écriture peut porter sa propre
+    transaction : (compte, montant, transaction_id). Renvoie l'identifiant du journal.
+    """
+    if len(legs) < 2 or sum(Decimal(leg[1]) for leg in legs) != 0:
+        raise UnbalancedJournal("Un journal doit compter au moins deux écritures de somme nulle")
+
+    journal_id = uuid.uuid4()
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        # Identifiant de transaction attribué avant la prise des id d'écriture :
+        # compact() s'appuie sur cet ordre pour borner ses instantanés
+        cursor.execute('SELECT pg_current_xact_id()')
+        execute_values(
+            cursor.cursor,
+            f"""
+            INSERT INTO {ENTRIES_TABLE} (journal_id, account, amount, transaction_id, description, created_at)
+            VALUES %s
+            """,
+            [
+                (journal_id, leg[0], leg[1], leg[2] if len(leg) > 2 else transaction_id, description, now)
+                for leg in legs
+            ],
+            page_size=2000,
+        )
+    return journal_id
+
+
+def balance(account):
+    """Dernier instantané du compte plus les écritures postérieures, en une requête"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH snapshot AS (
+                SELECT balance, entry_id FROM {SNAPSHOTS_TABLE}
+                WHERE account = %s ORDER BY entry_id DESC LIMIT 1
+            )
+            SELECT COALESCE((SELECT balance FROM snapshot), 0) + COALESCE((
+                SELECT SUM(amount) FROM {ENTRIES_TABLE}
+                WHERE account = %s AND id > COALESCE((SELECT entry_id FROM snapshot), 0)
+            ), 0)
+            """,
+            [account, account],
+        )
+        return cursor.fetchone()[0]
+
+
+def wallet_balance(wallet_id):
+    return balance(wallet_account(wallet_id))
+
+
+def compact(wait=None):
+    """
+    Écrit un instantané pour chaque compte mouvementé depuis la compaction précédente.
+
+    L'instantané couvre les écritures d'id inférieur ou égal à la dernière
+    valeur de la séquence, lue avant que la compaction ne prenne son propre
+    identifiant de transaction (xid). post() prend le xid de sa transaction
+    avant ses id d'écriture : toute transaction détenant un id couvert a donc un
+    xid plus ancien. La compaction attend (au plus `wait` secondes) que toutes
+    ces transactions soient terminées ; une écriture couverte ne peut plus
+    ensuite être validée après l'instantané, quelle que soit la durée de sa
+    transaction. Renvoie (nombre d'instantanés, entry_id).
+    Met aussi à jour le cache Wallet.balance des portefeuilles concernés.
+    """
+    wait = settings.LEDGER_COMPACTION_WAIT if wait is None else wait
+
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [COMPACTION_LOCK_ID])
+
+        cursor.execute(f'SELECT COALESCE(MAX(entry_id), 0) FROM {SNAPSHOTS_TABLE}')
+        previous = cursor.fetchone()[0]
+        horizon = _settled_horizon(cursor, wait)
+        if horizon is None or horizon <= previous:
+            return 0, previous
+
+        cursor.execute(
+            f"""
+            INSERT INTO {SNAPSHOTS_TABLE} (account, entry_id, balance, created_at)
+            SELECT delta.account, %s, COALESCE(last.balance, 0) + delta.total, %s
+            FROM (
+                SELECT account, SUM(amount) AS total FROM {ENTRIES_TABLE}
+                WHERE id > %s AND id <= %s
+                GROUP BY account
+            ) AS delta
+            LEFT JOIN LATERAL (
+                SELECT balance FROM {SNAPSHOTS_TABLE}
+                WHERE account = delta.account ORDER BY entry_id DESC LIMIT 1
+            ) AS last ON true
+            """,
+            [horizon, timezone.now(), previous, horizon],
+        )
+        snapshots = cursor.rowcount
+
+        cursor.execute(
+            f"""
+            UPDATE wallets SET balance = snapshot.balance
+            FROM {SNAPSHOTS_TABLE} AS snapshot
+            WHERE snapshot.entry_id = %s AND snapshot.account = 'wallet:' || wallets.id::text
+            """,
+            [horizon],
+        )
+
+    return snapshots, horizon
+
+
+def _settled_horizon(cursor, wait):
+    """
+    Dernier id d'écriture attribué, une fois terminées toutes les transactions
+    qui ont pu en obtenir un ; None si l'une d'elles dure plus de `wait` secondes.
+    """
+    cursor.execute(
+        f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END "
+        f"FROM {connection.ops.quote_name(ENTRIES_TABLE + '_id_seq')}"
+    )
+    horizon = cursor.fetchone()[0]
+    # xid de la compaction, postérieur à celui de toute transaction ayant pris un id <= horizon
+    cursor.execute('SELECT pg_current_xact_id()')
+
+    deadline = time.monotonic() + wait
+    while True:
+        # Chaque requête a son propre instantané (READ COMMITTED) : xmin avance avec les validations
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot()) >= pg_current_xact_id()')
+        if cursor.fetchone()[0]:
+            return horizon
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.05)
+
+
+def prune_snapshots():
+    """Supprime les instantanés remplacés (seul le dernier de chaque compte sert aux lectures)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {SNAPSHOTS_TABLE} AS old
+            USING {SNAPSHOTS_TABLE} AS newer
+            WHERE newer.account = old.account AND newer.entry_id > old.entry_id
+            """
+        )
+        return cursor.rowcount
@@ -0,0 +1,86 @@
+# ===========================================
+# accounts/management/commands/bench_wallet_credits.py
+# ===========================================
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction as db_transaction
+from django.db.models import F
+
+from accounts import ledger, wallets
+from accounts.models import LedgerEntry, User, Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les crédits/s concurrents vers un même portefeuille marchand : "
+        "mise à jour de la ligne du portefeuille puis écritures du grand livre"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--credits', type=int, default=2000)
+        parser.add_argument(
+            '--hold-ms', type=float, default=10.0,
+            help="Durée pendant laquelle chaque transaction garde son verrou après le crédit "
+                 "(reste du règlement : transaction, agrégats…)",
+        )
+
+    def handle(self, *args, **options):
+        merchant = User.objects.create_user(
+            phone_number=f"bench-{uuid.uuid4().hex[:12]}",
+            full_name='Bench marchand',
+            user_type='merchant',
+        )
+        wallet = Wallet.objects.create(user=merchant)
+
+        def update_row():
+            Wallet.objects.filter(pk=wallet.pk).update(balance=F('balance') + 1)
+
+        try:
+            row = self.run(update_row, lambda: Wallet.objects.get(pk=wallet.pk).balance, options)
+            appended = self.run(
+                lambda: wallets.credit(merchant.id, Decimal('1')),
+                lambda: wallet.current_balance,
+                options,
+            )
+        finally:
+            journals = LedgerEntry.objects.filter(account=ledger.wallet_account(wallet.pk)).values('journal_id')
+            LedgerEntry.objects.filter(journal_id__in=journals).delete()
+            merchant.delete()
+
+        self.stdout.write(f"{'UPDATE de la ligne':<24} {row:8.0f} crédits/s")
+        self.stdout.write(f"{'Grand livre (INSERT)':<24} {appended:8.0f} crédits/s")
+        self.stdout.write(self.style.SUCCESS(f"Débit multiplié par {appended / row:.1f}"))
+
+    def run(self, credit, read_balance, options):
+        before = read_balance()
+        per_thread = options['credits'] // options['threads']
+        hold = options['hold_ms'] / 1000
+
+        def worker():
+            try:
+                for _ in range(per_thread):
+                    with db_transaction.atomic():
+                        credit()
+                        with connection.cursor() as cursor:
+                            cursor.execute('SELECT pg_sleep(%s)', [hold])
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        credited = read_balance() - before
+        expected = per_thread * options['threads']
+        if credited != expected:
+            raise RuntimeError(f"Crédits perdus : {credited} au lieu de {expected}")
+        return expected / elapsed
@@ -0,0 +1,30 @@
+# ===========================================
+# accounts/management/commands/compact_ledger.py
+# ===========================================
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import ledger
+
+
+class Command(BaseCommand):
+    help = "Écrit des instantanés de solde pour les comptes mouvementés du grand livre"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wait', type=float,
+                            help="Attente maximale des transactions d'écriture en cours (secondes)")
+        parser.add_argument('--prune', action='store_true', help="Supprimer les instantanés remplacés")
+        parser.add_argument('--interval', type=float, help="Répéter toutes les N secondes (tâche de fond)")
+
+    def handle(self, *args, **options):
+        while True:
+            snapshots, entry_id = ledger.compact(options['wait'])
+            message = f"{snapshots} instantanés jusqu'à l'écriture {entry_id}"
+            if options['prune']:
+                message += f", {ledger.prune_snapshots()} anciens supprimés"
+            self.stdout.write(self.style.SUCCESS(message))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:20
+
+from decimal import Decimal
+import uuid
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.utils.timezone
+
+
+def open_ledger(apps, schema_editor):
+    """Reprend chaque solde existant comme journal d'ouverture"""
+    Wallet = apps.get_model('accounts', 'Wallet')
+    LedgerEntry = apps.get_model('accounts', 'LedgerEntry')
+
+    now = django.utils.timezone.now()
+    entries = []
+    for wallet_id, balance in Wallet.objects.exclude(balance=0).values_list('id', 'balance'):
+        journal_id = uuid.uuid4()
+        entries += [
+            LedgerEntry(journal_id=journal_id, account=f'wallet:{wallet_id}', amount=balance,
+                        description='Solde initial', created_at=now),
+            LedgerEntry(journal_id=journal_id, account='equity:opening', amount=-balance,
+                        description='Solde initial', created_at=now),
+        ]
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+def close_ledger(apps, schema_editor):
+    Wallet = apps.get_model('accounts', 'Wallet')
+    LedgerEntry = apps.get_model('accounts', 'LedgerEntry')
+
+    balances = dict(
+        LedgerEntry.objects.filter(account__startswith='wallet:')
+        .values('account').annotate(total=Sum('amount')).values_list('account', 'total')
+    )
+    for wallet in Wallet.objects.all():
+        wallet.balance = balances.get(f'wallet:{wallet.id}', Decimal('0'))
+        wallet.save(update_fields=['balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(max_length=64)),
+                ('entry_id', models.BigIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=18)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'balance_snapshots',
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal_id', models.UUIDField(db_index=True)),
+                ('account', models.CharField(max_length=64)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('transaction_id', models.UUIDField(blank=True, null=True)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Écriture',
+                'verbose_name_plural': 'Écritures',
+                'db_table': 'ledger_entries',
+            },
+        ),
+        migrations.RunPython(open_ledger, close_ledger),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['account', 'id'], name='ledger_entry_account_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['transaction_id'], name='ledger_entry_transaction_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balancesnapshot',
+            index=models.Index(fields=['entry_id'], name='balance_snapshot_entry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='balancesnapshot',
+            constraint=models.UniqueConstraint(fields=('account', 'entry_id'), name='balance_snapshot_account_entry_uniq'),
+        ),
+    ]
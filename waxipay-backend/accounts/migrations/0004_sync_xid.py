@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+# xid de la transaction PostgreSQL qui écrit la ligne (xid8 ramené en bigint),
+# comme transactions.sync_xid. Les lignes antérieures gardent 0 : visibles
+# dans tout instantané, elles n'invalident aucun ETag.
+SYNC_XID_COLUMNS = """
+ALTER TABLE users ADD COLUMN sync_xid bigint NOT NULL DEFAULT 0;
+ALTER TABLE wallets ADD COLUMN sync_xid bigint NOT NULL DEFAULT 0;
+ALTER TABLE ledger_entries ADD COLUMN sync_xid bigint NOT NULL DEFAULT 0;
+-- Le grand livre est en ajout seul : un défaut de colonne suffit, sans trigger sur la table la plus écrite
+ALTER TABLE ledger_entries ALTER COLUMN sync_xid SET DEFAULT pg_current_xact_id()::text::bigint;
+"""
+
+DROP_SYNC_XID_COLUMNS = """
+ALTER TABLE ledger_entries DROP COLUMN sync_xid;
+ALTER TABLE wallets DROP COLUMN sync_xid;
+ALTER TABLE users DROP COLUMN sync_xid;
+"""
+
+# Le cache wallets.balance réécrit par la compaction n'est pas servi : seules
+# les colonnes lues par les vues changent le xid d'un portefeuille.
+SYNC_TRIGGERS = """
+CREATE FUNCTION accounts_stamp_sync_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.sync_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_sync_xid BEFORE INSERT OR UPDATE ON users
+FOR EACH ROW EXECUTE FUNCTION accounts_stamp_sync_xid();
+
+CREATE TRIGGER wallets_sync_xid BEFORE INSERT OR UPDATE OF user_id, currency, is_active ON wallets
+FOR EACH ROW EXECUTE FUNCTION accounts_stamp_sync_xid();
+"""
+
+DROP_SYNC_TRIGGERS = """
+DROP TRIGGER wallets_sync_xid ON wallets;
+DROP TRIGGER users_sync_xid ON users;
+DROP FUNCTION accounts_stamp_sync_xid();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_delete_otp'),
+    ]
+
+    operations = [
+        # Défauts conservés en base : les INSERT en SQL brut n'ont pas à nommer la colonne
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(SYNC_XID_COLUMNS, DROP_SYNC_XID_COLUMNS),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='ledgerentry',
+                    name='sync_xid',
+                    field=models.BigIntegerField(default=0, editable=False),
+                ),
+                migrations.AddField(
+                    model_name='user',
+                    name='sync_xid',
+                    field=models.BigIntegerField(default=0, editable=False),
+                ),
+                migrations.AddField(
+                    model_name='wallet',
+                    name='sync_xid',
+                    field=models.BigIntegerField(default=0, editable=False),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['account', 'sync_xid'], name='ledger_entry_account_sync_idx'),
+        ),
+        migrations.RunSQL(SYNC_TRIGGERS, DROP_SYNC_TRIGGERS),
+    ]
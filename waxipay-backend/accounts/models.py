@@ -3,6 +3,7 @@
 # ===========================================
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.utils import timezone
 import uuid
 
 class UserManager(BaseUserManager):
@@ -44,6 +45,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # xid de la dernière transaction PostgreSQL qui a écrit la ligne, posé par
+    # trigger (migration 0004) : validateur ETag (waxipay_backend/conditional.py)
+    sync_xid = models.BigIntegerField(default=0, editable=False)
+    
     objects = UserManager()
     
     USERNAME_FIELD = 'phone_number'
@@ -61,12 +66,17 @@ class User(AbstractBaseUser, PermissionsMixin):
 class Wallet(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wallet')
+    # Cache du solde au dernier instantané du grand livre (compact_ledger) ;
+    # le solde courant est current_balance
     balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     currency = models.CharField(max_length=3, default='XOF')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Comme User.sync_xid ; la mise à jour du cache `balance` par la compaction ne le change pas
+    sync_xid = models.BigIntegerField(default=0, editable=False)
+    
     class Meta:
         db_table = 'wallets'
         verbose_name = 'Portefeuille'
@@ -74,17 +84,63 @@ class Wallet(models.Model):
     
     def __str__(self):
         return f"Wallet {self.user.full_name}: {self.balance} {self.currency}"
+    
+    @property
+    def current_balance(self):
+        """Solde courant : dernier instantané plus les écritures postérieures du grand livre"""
+        from .ledger import wallet_balance
+        return wallet_balance(self.pk)
 
 
-class OTP(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='otps')
-    code = models.CharField(max_length=6)
-    is_used = models.BooleanField(default=False)
-    expires_at = models.DateTimeField()
-    created_at = models.DateTimeField(auto_now_add=True)
+class LedgerEntry(models.Model):
+    """
+    Écriture du grand livre, en ajout seul : un mouvement est un journal d'au
+    moins deux écritures (débit/crédit) de somme nulle.
+
+    `account` est « wallet:<id du portefeuille> » ou un compte système (voir accounts/ledger.py).
+    Les montants sont signés : positif = crédit du compte.
+    """
+    journal_id = models.UUIDField(db_index=True)
+    account = models.CharField(max_length=64)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    # Table des transactions partitionnée : pas de contrainte de clé étrangère
+    transaction_id = models.UUIDField(null=True, blank=True)
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # xid de la transaction qui a posté l'écriture, par défaut de colonne (migration 0004)
+    sync_xid = models.BigIntegerField(default=0, editable=False)
+    
+    class Meta:
+        db_table = 'ledger_entries'
+        verbose_name = 'Écriture'
+        verbose_name_plural = 'Écritures'
+        indexes = [
+            models.Index(fields=['account', 'id'], name='ledger_entry_account_idx'),
+            # Écritures postérieures à un ETag (waxipay_backend/conditional.py)
+            models.Index(fields=['account', 'sync_xid'], name='ledger_entry_account_sync_idx'),
+            models.Index(fields=['transaction_id'], name='ledger_entry_transaction_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.account} {self.amount:+}"
+
+
+class BalanceSnapshot(models.Model):
+    """Solde d'un compte incluant toutes ses écritures d'id <= entry_id (écrit par compact_ledger)"""
+    account = models.CharField(max_length=64)
+    entry_id = models.BigIntegerField()
+    balance = models.DecimalField(max_digits=18, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
-        db_table = 'otps'
-        ordering = ['-created_at']
-        verbose_name = 'Code OTP'
-        verbose_name_plural = 'Codes OTP'
\ No newline at end of file
+        db_table = 'balance_snapshots'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'entry_id'], name='balance_snapshot_account_entry_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['entry_id'], name='balance_snapshot_entry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.account} @{self.entry_id}: {self.balance}"
+
@@ -0,0 +1,64 @@
+# ===========================================
+# accounts/otp.py
+# ===========================================
+"""
+Codes OTP conservés dans le cache Django (settings.CACHES) plutôt qu'en base.
+
+Un code et son compteur d'essais sont deux clés de même durée de vie
+(OTP_TTL_SECONDS) : l'expiration est celle du cache, sans purge. Chaque
+vérification incrémente le compteur (incr atomique) ; au-delà de
+OTP_MAX_ATTEMPTS le code est révoqué. Un code juste n'est accepté qu'une fois :
+seule la vérification dont le delete supprime effectivement la clé l'emporte.
+
+En production, le cache doit être partagé entre processus (REDIS_URL) : avec
+le cache mémoire local, l'envoi et la vérification doivent passer par le même
+processus.
+"""
+import hmac
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+CODE_KEY = 'otp:code:{}'
+ATTEMPTS_KEY = 'otp:attempts:{}'
+
+
+class OTPError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def issue(phone_number):
+    """Génère un code à 6 chiffres pour ce numéro, remplace le précédent et le renvoie"""
+    code = f'{secrets.randbelow(900000) + 100000}'
+    cache.set_many(
+        {CODE_KEY.format(phone_number): code, ATTEMPTS_KEY.format(phone_number): 0},
+        timeout=settings.OTP_TTL_SECONDS,
+    )
+    return code
+
+
+def consume(phone_number, code):
+    """Valide et consomme le code ; lève OTPError s'il est faux, expiré, déjà utilisé ou révoqué"""
+    code_key, attempts_key = CODE_KEY.format(phone_number), ATTEMPTS_KEY.format(phone_number)
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:
+        # Compteur absent : aucun code en cours pour ce numéro
+        raise OTPError('Code OTP invalide ou expiré')
+
+    if attempts > settings.OTP_MAX_ATTEMPTS:
+        cache.delete(code_key)
+        raise OTPError('Trop de tentatives, demandez un nouveau code', status=429)
+
+    expected = cache.get(code_key)
+    if expected is None or not hmac.compare_digest(expected, str(code)):
+        raise OTPError('Code OTP invalide ou expiré')
+
+    if not cache.delete(code_key):
+        # Consommé entre-temps par une vérification concurrente
+        raise OTPError('Code OTP invalide ou expiré')
+    cache.delete(attempts_key)
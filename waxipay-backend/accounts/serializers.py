@@ -6,6 +6,7 @@ from django.contrib.auth.password_validation import validate_password
 from .models import User, Wallet
 
 class WalletSerializer(serializers.ModelSerializer):
+    balance = serializers.DecimalField(source='current_balance', max_digits=15, decimal_places=2, read_only=True)
     balance_formatted = serializers.SerializerMethodField()
     
     class Meta:
@@ -14,7 +15,7 @@ class WalletSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'balance', 'created_at']
     
     def get_balance_formatted(self, obj):
-        return f"{obj.balance:,.0f}".replace(',', ' ')
+        return f"{obj.current_balance:,.0f}".replace(',', ' ')
 
 
 class UserSerializer(serializers.ModelSerializer):
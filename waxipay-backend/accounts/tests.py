@@ -1,3 +1,242 @@
-from django.test import TestCase
+# ===========================================
+# accounts/tests.py
+# ===========================================
+import re
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction as db_transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from sms import queue as sms_queue
+from sms.backends import locmem
+from waxipay_backend.testing import PASSWORD, api_client, make_user
+from . import ledger, wallets
+from .models import BalanceSnapshot, User
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = make_user('+221770000101')
+        self.account = ledger.wallet_account(self.user.wallet.pk)
+
+    def test_unbalanced_journal_is_refused(self):
+        with self.assertRaises(ledger.UnbalancedJournal):
+            ledger.post([(self.account, Decimal('10')), (ledger.OPENING_BALANCE, Decimal('-9'))])
+        with self.assertRaises(ledger.UnbalancedJournal):
+            ledger.post([(self.account, Decimal('0'))])
+
+    def test_credit_with_fees_balances_every_account(self):
+        wallets.credit(self.user.pk, Decimal('1000'), fees=Decimal('15'))
+
+        self.assertEqual(ledger.balance(self.account), Decimal('1000'))
+        self.assertEqual(ledger.balance(ledger.FEES_REVENUE), Decimal('15'))
+        self.assertEqual(ledger.balance(ledger.PAYTECH_CLEARING), Decimal('-1015'))
+        self.assertFalse(wallets.credit(User.objects.create_user('+221770000199', password=PASSWORD).pk, 1))
+
+    def test_balance_survives_compaction(self):
+        for amount in ('1000', '250', '5'):
+            wallets.credit(self.user.pk, Decimal(amount))
+        ledger.post([(self.account, Decimal('-55')), (ledger.FEES_REVENUE, Decimal('55'))])
+
+        snapshots, horizon = ledger.compact(wait=5)
+
+        self.assertEqual(snapshots, 3)  # portefeuille, compensation PayTech, revenus
+        self.assertEqual(ledger.balance(self.account), Decimal('1200'))
+        snapshot = BalanceSnapshot.objects.get(account=self.account)
+        self.assertEqual((snapshot.entry_id, snapshot.balance), (horizon, Decimal('1200')))
+        self.user.wallet.refresh_from_db()
+        self.assertEqual(self.user.wallet.balance, Decimal('1200'))
+
+        # Écritures postérieures à l'instantané, puis nouvelle compaction
+        wallets.credit(self.user.pk, Decimal('300'))
+        self.assertEqual(ledger.balance(self.account), Decimal('1500'))
+        self.assertEqual(ledger.compact(wait=5)[0], 2)
+        self.assertEqual(ledger.prune_snapshots(), 2)
+        self.assertEqual(ledger.balance(self.account), Decimal('1500'))
+        self.assertEqual(ledger.balance(ledger.PAYTECH_CLEARING), Decimal('-1555'))
+
+    def test_compaction_without_new_entries_is_a_no_op(self):
+        wallets.credit(self.user.pk, Decimal('10'))
+        _, horizon = ledger.compact(wait=5)
+        self.assertEqual(ledger.compact(wait=5), (0, horizon))
+
+
+class ConcurrentCreditTests(TransactionTestCase):
+    """Crédits simultanés d'un même portefeuille marchand : des INSERT, sans verrou de ligne"""
+
+    def test_concurrent_credits_are_all_kept(self):
+        merchant = make_user('+221770000103', 'merchant')
+        holding = threading.Barrier(8)
+        errors = []
+
+        def settle():
+            try:
+                # Chaque crédit garde sa transaction ouverte jusqu'à ce que tous aient écrit :
+                # un verrou sur la ligne du portefeuille bloquerait la barrière
+                with db_transaction.atomic():
+                    for _ in range(5):
+                        wallets.credit(merchant.pk, Decimal('100'))
+                    holding.wait(10)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=settle) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(ledger.wallet_balance(merchant.wallet.pk), Decimal('4000'))
+
+
+class LedgerCompactionConcurrencyTests(TransactionTestCase):
+    """Une écriture encore en cours retarde l'instantané au lieu d'y manquer"""
+
+    def test_compaction_waits_for_open_writers(self):
+        user = make_user('+221770000102')
+        account = ledger.wallet_account(user.wallet.pk)
+        wallets.credit(user.pk, Decimal('100'))
+        posted, release = threading.Event(), threading.Event()
+
+        def writer():
+            try:
+                with db_transaction.atomic():
+                    wallets.credit(user.pk, Decimal('50'))
+                    posted.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        self.assertTrue(posted.wait(10))
+        try:
+            self.assertEqual(ledger.compact(wait=0.2), (0, 0))
+        finally:
+            release.set()
+            thread.join()
+
+        snapshots, _ = ledger.compact(wait=5)
+        self.assertEqual(snapshots, 2)
+        self.assertEqual(BalanceSnapshot.objects.get(account=account).balance, Decimal('150'))
+        self.assertEqual(ledger.balance(account), Decimal('150'))
+
+
+class ConditionalGetTests(TransactionTestCase):
+    def setUp(self):
+        self.user = make_user('+221770000104', balance=100)
+        self.client = api_client(self.user)
+
+    def test_wallet_changes_with_the_ledger_not_the_balance_cache(self):
+        etag = self.client.get('/api/auth/wallet/')['ETag']
+
+        ledger.compact(wait=5)
+        self.assertEqual(self.client.get('/api/auth/wallet/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        wallets.credit(self.user.pk, Decimal('50'))
+        response = self.client.get('/api/auth/wallet/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balance'], '150.00')
+
+    def test_profile_changes_with_the_user(self):
+        etag = self.client.get('/api/auth/profile/')['ETag']
+        self.assertEqual(self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        User.objects.filter(pk=self.user.pk).update(full_name='Awa Ndiaye')
+        response = self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['full_name'], 'Awa Ndiaye')
+
+
+@override_settings(SMS_BACKEND='sms.backends.locmem.SMSBackend')
+class OTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        locmem.outbox.clear()
+        self.user = make_user('+221770000104')
+        self.client = api_client()
+
+    def send_otp(self):
+        response = self.client.post('/api/auth/send-otp/', {'phone_number': self.user.phone_number}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNone(response.data['dev_code'])
+        # Travail du worker `send_sms`
+        sms_queue.deliver(sms_queue.get_backend(), sms_queue.claim(10))
+        return re.search(r'\d{6}', locmem.outbox[-1].body).group()
+
+    def verify(self, code):
+        return self.client.post(
+            '/api/auth/verify-otp/', {'phone_number': self.user.phone_number, 'code': code}, format='json'
+        )
+
+    def test_code_sent_by_sms_verifies_once(self):
+        code = self.send_otp()
+        self.assertEqual(locmem.outbox[-1].phone_number, self.user.phone_number)
+
+        response = self.verify(code)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIn('access', response.data['tokens'])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+
+        self.assertEqual(self.verify(code).status_code, 400)
+
+    @override_settings(OTP_MAX_ATTEMPTS=2)
+    def test_code_is_revoked_after_too_many_attempts(self):
+        code = self.send_otp()
+        wrong = '000000' if code != '000000' else '111111'
+        self.assertEqual(self.verify(wrong).status_code, 400)
+        self.assertEqual(self.verify(wrong).status_code, 400)
+        self.assertEqual(self.verify(code).status_code, 429)
+
+    def test_unknown_number(self):
+        response = self.client.post('/api/auth/send-otp/', {'phone_number': '+221779999999'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = make_user('+221770000105')
+
+    def login(self, password=PASSWORD):
+        response = api_client().post(
+            '/api/auth/login/', {'phone_number': self.user.phone_number, 'password': password}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['tokens']['access']
+
+    def profile(self, token):
+        client = api_client()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client.get('/api/auth/profile/')
+
+    def test_new_password_token_is_accepted_despite_cached_user(self):
+        old_token = self.login()
+        self.assertEqual(self.profile(old_token).status_code, 200)
+
+        # TestCase ne valide jamais : l'invalidation du cache (on_commit) n'a pas lieu,
+        # le cache garde l'empreinte de l'ancien mot de passe
+        self.user.set_password('new-pass-678!')
+        self.user.save()
+
+        new_token = self.login('new-pass-678!')
+        self.assertEqual(self.profile(new_token).status_code, 200)
+
+        response = self.profile(old_token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'password_changed')
+
+    def test_password_change_revokes_tokens(self):
+        old_token = self.login()
+        self.assertEqual(self.profile(old_token).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new-pass-678!')
+            self.user.save()
+
+        self.assertEqual(self.profile(old_token).status_code, 401)
@@ -6,18 +6,31 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.utils import timezone
-from datetime import timedelta
-import random
 import logging
 
-from .models import User, Wallet, OTP
+from sms import queue as sms_queue
+from waxipay_backend.conditional import conditional_get
+from . import ledger, otp
+from .models import User, Wallet
 from .serializers import RegisterSerializer, UserSerializer, WalletSerializer
 
 logger = logging.getLogger(__name__)
 
 
+def wallet_rows(request, *args, **kwargs):
+    """Lignes servies par WalletView : portefeuille et écritures du grand livre (solde)"""
+    wallets = Wallet.objects.filter(user=request.user)
+    return [wallets, ledger.wallet_entries(wallets)]
+
+
+def profile_rows(request, *args, **kwargs):
+    """Lignes servies par ProfileView, relues en base : request.user peut venir d'un cache en retard"""
+    wallets = Wallet.objects.filter(user=request.user)
+    return [User.objects.filter(pk=request.user.pk), wallets, ledger.wallet_entries(wallets)]
+
+
 class RegisterView(generics.CreateAPIView):
     """Inscription d'un nouvel utilisateur"""
     queryset = User.objects.all()
@@ -111,7 +124,12 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     
     def get_object(self):
-        return self.request.user
+        # Relu en base : servi avec un ETag tiré de la base, et jamais réécrit depuis un cache en retard
+        return User.objects.get(pk=self.request.user.pk)
+    
+    @conditional_get(profile_rows)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class WalletView(generics.RetrieveAPIView):
@@ -121,6 +139,10 @@ class WalletView(generics.RetrieveAPIView):
     
     def get_object(self):
         return self.request.user.wallet
+    
+    @conditional_get(wallet_rows)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class SendOTPView(APIView):
@@ -136,21 +158,19 @@ class SendOTPView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            user = User.objects.get(phone_number=phone_number)
-        except User.DoesNotExist:
+        if not User.objects.filter(phone_number=phone_number).exists():
             return Response(
                 {'success': False, 'error': 'Utilisateur introuvable'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        code = str(random.randint(100000, 999999))
-        expires_at = timezone.now() + timedelta(minutes=10)
-        
-        OTP.objects.create(user=user, code=code, expires_at=expires_at)
-        
-        # TODO: Intégrer un service SMS (ex: Twilio, Orange SMS API)
-        logger.info(f"OTP code for {phone_number}: {code}")
+        code = otp.issue(phone_number)
+        # Envoyé par le worker `send_sms` : la requête n'attend pas le fournisseur SMS
+        sms_queue.send(
+            phone_number,
+            f"Votre code WaxiPay : {code}. Il expire dans {settings.OTP_TTL_SECONDS // 60} minutes.",
+            ttl=settings.OTP_TTL_SECONDS,
+        )
         
         return Response({
             'success': True,
@@ -173,6 +193,12 @@ class VerifyOTPView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Code vérifié avant toute requête : un code faux ne coûte rien à la base
+        try:
+            otp.consume(phone_number, code)
+        except otp.OTPError as e:
+            return Response({'success': False, 'error': e.message}, status=e.status)
+        
         try:
             user = User.objects.get(phone_number=phone_number)
         except User.DoesNotExist:
@@ -181,24 +207,9 @@ class VerifyOTPView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        otp = OTP.objects.filter(
-            user=user,
-            code=code,
-            is_used=False,
-            expires_at__gt=timezone.now()
-        ).first()
-        
-        if not otp:
-            return Response(
-                {'success': False, 'error': 'Code OTP invalide ou expiré'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        otp.is_used = True
-        otp.save()
-        
-        user.is_verified = True
-        user.save()
+        if not user.is_verified:
+            user.is_verified = True
+            user.save(update_fields=['is_verified', 'updated_at'])
         
         refresh = RefreshToken.for_user(user)
         
@@ -0,0 +1,41 @@
+# ===========================================
+# accounts/wallets.py
+# ===========================================
+"""
+Mouvements des portefeuilles, passés comme journaux du grand livre (accounts/ledger.py).
+
+Un crédit n'est qu'un INSERT de deux écritures : les crédits concurrents vers
+un même portefeuille marchand ne se bloquent pas sur sa ligne. Le solde est
+relu par Wallet.current_balance.
+"""
+from . import ledger
+from .models import Wallet
+
+
+def credit(user_id, amount, transaction_id=None, source=ledger.PAYTECH_CLEARING, description='', fees=0):
+    """
+    Crédite le portefeuille de l'utilisateur par le compte `source` ; les frais
+    éventuels, payés en plus par la source, vont au compte de revenus.
+    Renvoie False si le portefeuille n'existe pas.
+    """
+    wallet_id = Wallet.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+    if wallet_id is None:
+        return False
+
+    legs = [(ledger.wallet_account(wallet_id), amount), (source, -(amount + fees))]
+    if fees:
+        legs.append((ledger.FEES_REVENUE, fees))
+    ledger.post(legs, transaction_id=transaction_id, description=description)
+    return True
+
+
+def lock_for_debit(user_ids):
+    """
+    Verrouille (SELECT ... FOR UPDATE) les portefeuilles à débiter, toujours
+    dans l'ordre de leur id : deux débits concurrents prennent les verrous dans
+    le même ordre et ne peuvent pas s'interbloquer. Les portefeuilles
+    seulement crédités ne sont pas verrouillés (un crédit est un INSERT).
+    Renvoie {user_id: wallet}.
+    """
+    wallets = Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by('id')
+    return {wallet.user_id: wallet for wallet in wallets}
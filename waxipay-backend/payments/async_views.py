@@ -0,0 +1,202 @@
+# ===========================================
+# payments/async_views.py
+# ===========================================
+"""
+Variante asynchrone de l'initiation de paiement et flux SSE du statut d'un
+paiement, servis par l'application ASGI (waxipay_backend/asgi.py,
+ex. `uvicorn waxipay_backend.asgi:application`).
+
+DRF 3.14 ne gère pas les vues async : ces vues sont de simples vues Django
+async qui reprennent l'authentification JWT et les réponses JSON de l'API.
+"""
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+
+from accounts.authentication import CachedJWTAuthentication
+from transactions.models import Transaction
+from . import idempotency, initiation, status_stream
+from .circuit_breaker import CircuitOpenError, get_breaker
+from .paytech_client import get_async_client, BREAKER_NAME
+
+logger = logging.getLogger(__name__)
+
+_jwt_authentication = CachedJWTAuthentication()
+
+
+async def authenticate(request):
+    """Utilisateur authentifié par le jeton JWT, ou JsonResponse 401"""
+    try:
+        result = await sync_to_async(_jwt_authentication.authenticate)(request)
+    except exceptions.AuthenticationFailed as e:
+        return None, JsonResponse({'detail': e.detail}, status=401)
+
+    if result is None:
+        return None, JsonResponse(
+            {'detail': "Informations d'authentification non fournies."}, status=401
+        )
+    return result[0], None
+
+
+def parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            raise initiation.InitiationError('JSON invalide')
+    return request.POST
+
+
+async def initiate_payment_async(request):
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Méthode « {request.method} » non autorisée.'}, status=405)
+
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    try:
+        amount, description = initiation.parse_request(parse_body(request))
+        key = idempotency.get_key(request)
+    except (initiation.InitiationError, idempotency.IdempotencyError) as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=e.status)
+
+    if key is None:
+        body, status, headers = await _initiate(user, amount, description)
+        return JsonResponse(body, status=status, headers=headers)
+
+    try:
+        record, replay = await idempotency.await_claim(
+            user, key, idempotency.fingerprint(amount, description)
+        )
+    except idempotency.IdempotencyError as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=e.status, headers=e.headers)
+
+    if replay:
+        body, status = replay
+        return JsonResponse(body, status=status, headers=idempotency.REPLAYED)
+
+    try:
+        body, status, headers = await _initiate(user, amount, description, record)
+    except BaseException:
+        await sync_to_async(idempotency.abort)(record)
+        raise
+    await sync_to_async(idempotency.complete)(record, body, status)
+    return JsonResponse(body, status=status, headers=headers)
+
+
+async def _initiate(user, amount, description, idempotency_record=None):
+    """Crée la transaction en attente et la demande PayTech ; renvoie (body, status, headers)"""
+    try:
+        get_breaker(BREAKER_NAME).check()
+        # L'insertion et la mise à jour des agrégats partagent une transaction SQL,
+        # ce que l'ORM async de Django 4.2 ne sait pas faire : un seul aller-retour
+        # vers le pool de threads pour les deux.
+        transaction_obj = await sync_to_async(initiation.create_pending_deposit)(
+            user, amount, description, idempotency_record
+        )
+        paytech_data = initiation.build_paytech_payload(transaction_obj)
+        paytech_response = await get_async_client().request_payment(paytech_data)
+    except CircuitOpenError as e:
+        return initiation.provider_unavailable(e)
+    except httpx.HTTPError as e:
+        logger.error(f"PayTech request error: {str(e)}")
+        return (*initiation.PAYTECH_UNREACHABLE, None)
+
+    body, status = initiation.build_response(
+        paytech_data,
+        paytech_response.status_code,
+        paytech_response.json() if paytech_response.status_code == 200 else None,
+        paytech_response.text
+    )
+    return body, status, None
+
+
+# csrf_exempt de Django 4.2 masquerait la coroutine : on pose l'attribut directement
+initiate_payment_async.csrf_exempt = True
+
+
+async def payment_events(request, transaction_id):
+    """
+    Flux SSE (text/event-stream) du statut d'une transaction de l'utilisateur.
+
+    Envoie le statut courant puis chaque changement, réveillé par le NOTIFY du
+    changement de statut (payments/status_stream.py) ; se ferme sur un statut
+    final ou après SSE_MAX_DURATION secondes (le client se reconnecte).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Méthode « {request.method} » non autorisée.'}, status=405)
+
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    # Abonnement avant la lecture du statut : aucun changement ne peut passer entre les deux
+    listener = status_stream.get_listener()
+    queue = await listener.subscribe(transaction_id)
+    try:
+        current = await _transaction_status(user, transaction_id)
+    except BaseException:
+        listener.unsubscribe(transaction_id, queue)
+        raise
+    if current is None:
+        listener.unsubscribe(transaction_id, queue)
+        return JsonResponse({'success': False, 'error': 'Transaction introuvable'}, status=404)
+
+    response = StreamingHttpResponse(
+        _status_events(user, transaction_id, current, listener, queue),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@sync_to_async
+def _transaction_status(user, transaction_id):
+    try:
+        return Transaction.objects.filter(id=transaction_id, user=user).values('reference', 'status').first()
+    finally:
+        # Le thread de la requête garderait sa connexion pendant toute la durée du flux :
+        # des milliers de flux épuiseraient max_connections de PostgreSQL
+        connection.close()
+
+
+async def _status_events(user, transaction_id, current, listener, queue):
+    deadline = time.monotonic() + settings.SSE_MAX_DURATION
+    try:
+        yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+        status = current['status']
+        yield _sse_status(transaction_id, current['reference'], status)
+
+        while status not in status_stream.FINAL_STATUSES:
+            timeout = min(settings.SSE_KEEPALIVE_SECONDS, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                new_status = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ': keepalive\n\n'
+                continue
+            if new_status is status_stream.RESYNC:
+                row = await _transaction_status(user, transaction_id)
+                new_status = row['status'] if row else status
+            if new_status != status:
+                status = new_status
+                yield _sse_status(transaction_id, current['reference'], status)
+    finally:
+        listener.unsubscribe(transaction_id, queue)
+
+
+def _sse_status(transaction_id, reference, status):
+    data = json.dumps({'id': str(transaction_id), 'reference': reference, 'status': status})
+    return f'event: status\ndata: {data}\n\n'
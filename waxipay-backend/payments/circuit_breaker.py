@@ -0,0 +1,206 @@
+# ===========================================
+# payments/circuit_breaker.py
+# ===========================================
+"""
+Disjoncteur par fournisseur avec limite de concurrence.
+
+Quand un fournisseur (PayTech) ralentit ou échoue, les appels sont refusés
+immédiatement au lieu d'attendre le délai réseau : seuls les endpoints de
+paiement sont dégradés, les workers restent disponibles pour le reste de l'API.
+
+États : fermé (appels normaux) → ouvert (refus immédiat pendant
+open_duration) → semi-ouvert (quelques appels de test) → fermé ou ouvert.
+
+L'état et la limite de concurrence sont propres à chaque processus : avec N
+processus web, le fournisseur reçoit jusqu'à N × max_concurrency appels
+(settings.PAYTECH_TOTAL_CONCURRENCY répartit le budget entre eux).
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans contacter le fournisseur (disjoncteur ouvert ou saturé)"""
+
+    def __init__(self, name, reason, retry_after):
+        super().__init__(f"{name}: {reason}")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Call:
+    def __init__(self):
+        self.failed = False
+
+    def record_failure(self):
+        """Compte l'appel comme un échec même sans exception (ex. réponse 5xx)"""
+        self.failed = True
+
+
+class CircuitBreaker:
+    def __init__(self, name, max_concurrency=100, failure_rate_threshold=0.5,
+                 slow_call_rate_threshold=0.5, slow_call_duration=5.0, window_size=20,
+                 minimum_calls=10, open_duration=30.0, half_open_max_calls=3):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = None
+        self._in_flight = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._rejected = 0
+        self._trips = 0
+
+    @contextmanager
+    def guard(self):
+        """
+        Encadre un appel au fournisseur : lève CircuitOpenError sans appeler si
+        le disjoncteur est ouvert ou la limite de concurrence atteinte.
+        Utilisable aussi autour d'un `await` dans une vue async.
+        """
+        probe = self._acquire()
+        call = _Call()
+        started = time.monotonic()
+        try:
+            yield call
+        except Exception:
+            call.failed = True
+            raise
+        finally:
+            self._release(probe, call.failed, time.monotonic() - started)
+
+    def check(self):
+        """Lève CircuitOpenError si un appel serait refusé, sans réserver de place"""
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._opened_at + self.open_duration - time.monotonic()
+                if remaining > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, 'open', max(1, round(remaining)))
+            if self._in_flight >= self.max_concurrency:
+                self._rejected += 1
+                raise CircuitOpenError(self.name, 'saturated', 1)
+
+    def _acquire(self):
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._opened_at + self.open_duration - time.monotonic()
+                if remaining > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, 'open', max(1, round(remaining)))
+                self._transition(HALF_OPEN)
+
+            if self._state == HALF_OPEN and self._probes_in_flight >= self.half_open_max_calls:
+                self._rejected += 1
+                raise CircuitOpenError(self.name, 'half_open', 1)
+
+            if self._in_flight >= self.max_concurrency:
+                self._rejected += 1
+                raise CircuitOpenError(self.name, 'saturated', 1)
+
+            self._in_flight += 1
+            probe = self._state == HALF_OPEN
+            if probe:
+                self._probes_in_flight += 1
+            return probe
+
+    def _release(self, probe, failed, duration):
+        slow = duration >= self.slow_call_duration
+        with self._lock:
+            self._in_flight -= 1
+            if probe:
+                self._probes_in_flight -= 1
+
+            if self._state == HALF_OPEN:
+                if not probe:
+                    return
+                if failed or slow:
+                    self._transition(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_max_calls:
+                        self._transition(CLOSED)
+                return
+
+            if self._state != CLOSED:
+                return
+
+            self._window.append((failed, slow))
+            if len(self._window) < self.minimum_calls:
+                return
+            failures = sum(1 for f, _ in self._window if f) / len(self._window)
+            slow_calls = sum(1 for _, s in self._window if s) / len(self._window)
+            if failures >= self.failure_rate_threshold or slow_calls >= self.slow_call_rate_threshold:
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        logger.warning(f"Circuit breaker {self.name}: {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._trips += 1
+        if state in (HALF_OPEN, CLOSED):
+            self._probe_successes = 0
+        if state == CLOSED:
+            self._window.clear()
+
+    def snapshot(self):
+        """État courant pour la supervision"""
+        with self._lock:
+            calls = len(self._window)
+            retry_after = None
+            if self._state == OPEN:
+                retry_after = max(0.0, self._opened_at + self.open_duration - time.monotonic())
+            return {
+                'name': self.name,
+                'state': self._state,
+                'in_flight': self._in_flight,
+                'max_concurrency': self.max_concurrency,
+                'window_calls': calls,
+                'failure_rate': sum(1 for f, _ in self._window if f) / calls if calls else 0.0,
+                'slow_call_rate': sum(1 for _, s in self._window if s) / calls if calls else 0.0,
+                'open_remaining_seconds': retry_after,
+                'rejected_calls': self._rejected,
+                'trips': self._trips,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Disjoncteur du fournisseur `name`, configuré par settings.CIRCUIT_BREAKERS[name]"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                config = getattr(settings, 'CIRCUIT_BREAKERS', {}).get(name, {})
+                breaker = _breakers[name] = CircuitBreaker(name, **config)
+    return breaker
+
+
+def all_breakers():
+    return list(_breakers.values())
@@ -0,0 +1,199 @@
+# ===========================================
+# payments/idempotency.py
+# ===========================================
+"""
+Support de l'en-tête Idempotency-Key pour l'initiation de paiement.
+
+La première requête d'un couple (utilisateur, clé) réserve la clé puis
+enregistre sa réponse ; les répétitions la rejouent après une seule lecture
+indexée, sans nouvelle transaction ni appel PayTech. Une répétition qui arrive
+pendant que la première est encore en cours attend brièvement sa réponse.
+
+La clé est liée à la transaction en attente dès son insertion (bind). Seul un
+échec antérieur (disjoncteur ouvert) libère la clé ; ensuite, toute réponse,
+erreurs 5xx comprises, est enregistrée et rejouée : PayTech a pu recevoir la
+demande, une nouvelle tentative avec la même clé ne doit pas en créer une autre.
+"""
+import asyncio
+import hashlib
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED = {'Idempotent-Replayed': 'true'}
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1
+
+
+class IdempotencyError(Exception):
+    def __init__(self, message, status, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        return {'Retry-After': str(self.retry_after)} if self.retry_after else None
+
+
+class KeyInProgress(IdempotencyError):
+    pass
+
+
+def get_key(request):
+    """Valeur de l'en-tête Idempotency-Key, ou None s'il est absent"""
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f'{HEADER} invalide', 400)
+    return key
+
+
+def fingerprint(amount, description):
+    """Empreinte de la requête validée : une même clé ne peut pas servir à un autre paiement"""
+    return hashlib.sha256(f'{amount.normalize()}|{description}'.encode()).hexdigest()
+
+
+def claim(user, key, request_hash):
+    """
+    Réserve la clé pour l'appelant et renvoie (record, None), ou (None, (body, status))
+    si une réponse est à rejouer. Lève KeyInProgress si la requête d'origine est
+    encore en cours, IdempotencyError si la clé a servi à une autre requête.
+    """
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+
+    if record is None:
+        try:
+            with db_transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    request_hash=request_hash,
+                    locked_at=now,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+            return record, None
+        except IntegrityError:
+            # Une requête concurrente vient de réserver la même clé
+            record = IdempotencyKey.objects.get(user=user, key=key)
+
+    stale = record.status == 'in_progress' and (
+        record.locked_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    )
+    if stale and record.transaction_id is not None and record.expires_at > now:
+        if record.request_hash != request_hash:
+            raise IdempotencyError(f'{HEADER} déjà utilisée pour une autre requête', 422)
+        # Requête d'origine interrompue après la création de sa transaction : pas de reprise
+        return None, interrupted(record)
+
+    if record.expires_at <= now or stale:
+        # Clé expirée ou abandonnée : reprise conditionnelle, un seul repreneur gagne
+        taken = IdempotencyKey.objects.filter(
+            pk=record.pk, status=record.status, locked_at=record.locked_at
+        ).update(
+            request_hash=request_hash,
+            status='in_progress',
+            response_status=None,
+            response_body=None,
+            transaction_id=None,
+            locked_at=now,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+        )
+        if not taken:
+            raise KeyInProgress('Requête identique déjà en cours de traitement', 409, retry_after=1)
+        record.request_hash = request_hash
+        record.status = 'in_progress'
+        record.transaction_id = None
+        record.locked_at = now
+        return record, None
+
+    if record.request_hash != request_hash:
+        raise IdempotencyError(f'{HEADER} déjà utilisée pour une autre requête', 422)
+
+    if record.status == 'completed':
+        return None, (record.response_body, record.response_status)
+
+    raise KeyInProgress('Requête identique déjà en cours de traitement', 409, retry_after=1)
+
+
+def wait_for_claim(user, key, request_hash):
+    """claim() en attendant jusqu'à IDEMPOTENCY_WAIT_SECONDS la fin d'une requête en cours"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        try:
+            return claim(user, key, request_hash)
+        except KeyInProgress:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(POLL_INTERVAL)
+
+
+async def await_claim(user, key, request_hash):
+    """Équivalent de wait_for_claim pour les vues async : l'attente ne bloque aucun thread"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        try:
+            return await sync_to_async(claim)(user, key, request_hash)
+        except KeyInProgress:
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+def bind(record, transaction_obj):
+    """Lie la clé à la transaction créée ; à appeler dans la transaction SQL de l'insertion"""
+    IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).update(transaction_id=transaction_obj.id)
+    record.transaction_id = transaction_obj.id
+
+
+def interrupted(record):
+    """Réponse rejouée quand la requête d'origine s'est interrompue après la création de sa transaction"""
+    return {
+        'success': False,
+        'error': "La requête d'origine a été interrompue, vérifiez le statut de la transaction",
+        'transaction_id': str(record.transaction_id),
+    }, 500
+
+
+def complete(record, body, status):
+    """
+    Enregistre la réponse à rejouer. Une erreur 5xx survenue avant toute
+    écriture (disjoncteur ouvert) libère la clé pour qu'une nouvelle tentative
+    soit réellement traitée ; après la création de la transaction, la réponse
+    est enregistrée quelle qu'elle soit.
+    """
+    if status >= 500 and record.transaction_id is None:
+        return release(record)
+    IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).update(
+        status='completed',
+        response_status=status,
+        response_body=body,
+    )
+
+
+def abort(record):
+    """Requête d'origine en échec inattendu : clé libérée, ou réponse d'interruption si la transaction existe"""
+    if record.transaction_id is None:
+        return release(record)
+    complete(record, *interrupted(record))
+
+
+def release(record):
+    IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).delete()
+
+
+def purge_expired():
+    """Supprime les clés expirées ; renvoie le nombre de lignes supprimées"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,121 @@
+# ===========================================
+# payments/initiation.py
+# ===========================================
+"""Étapes de l'initiation d'un paiement communes aux vues sync (WSGI) et async (ASGI)"""
+from decimal import Decimal, InvalidOperation
+import uuid
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from transactions.models import Transaction
+from transactions import fees, rollups
+
+from . import idempotency
+
+DEFAULT_DESCRIPTION = 'Dépôt WaxiPay'
+
+
+class InitiationError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_request(data):
+    """Valide le corps de la requête et renvoie (montant, description)"""
+    amount = data.get('amount')
+    description = data.get('description', DEFAULT_DESCRIPTION)
+
+    if not amount:
+        raise InitiationError('Montant requis')
+
+    try:
+        amount = Decimal(str(amount))
+        if not amount.is_finite() or amount <= 0:
+            raise ValueError()
+    except (InvalidOperation, ValueError):
+        raise InitiationError('Montant invalide')
+    if not fees.is_whole_francs(amount):
+        raise InitiationError(fees.NOT_WHOLE_FRANCS)
+
+    return amount, description
+
+
+def create_pending_deposit(user, amount, description, idempotency_record=None):
+    """
+    Insère la transaction en attente et l'ajoute aux agrégats, dans une même
+    transaction SQL qui lie aussi la clé d'idempotence éventuelle.
+    """
+    reference = f"WXP-{uuid.uuid4().hex[:12].upper()}"
+    fee = fees.compute_fee(amount, 'deposit', 'wave', user.user_type)
+
+    with db_transaction.atomic():
+        transaction_obj = Transaction.objects.create(
+            user=user,
+            transaction_type='deposit',
+            payment_method='wave',
+            amount=amount,
+            fees=fee,
+            reference=reference,
+            description=description,
+            status='pending'
+        )
+        rollups.record_created(transaction_obj)
+        if idempotency_record is not None:
+            idempotency.bind(idempotency_record, transaction_obj)
+    return transaction_obj
+
+
+def charged_amount(amount, fees):
+    """
+    Montant facturé par PayTech, en francs entiers : montant crédité plus frais,
+    tous deux entiers (parse_request, transactions/fees.py). C'est aussi le
+    débit du compte de compensation au règlement et le montant rapproché.
+    """
+    return int(amount + fees)
+
+
+def build_paytech_payload(transaction_obj):
+    return {
+        'item_name': transaction_obj.description,
+        # Le client paie le montant crédité plus les frais
+        'item_price': charged_amount(transaction_obj.amount, transaction_obj.fees),
+        'currency': 'XOF',
+        'ref_command': transaction_obj.reference,
+        'command_name': transaction_obj.description,
+        'env': settings.PAYTECH_ENV,
+        'custom_field': str(transaction_obj.id),
+        'success_url': settings.PAYTECH_SUCCESS_URL,
+        'cancel_url': settings.PAYTECH_CANCEL_URL,
+        'ipn_url': settings.PAYTECH_IPN_URL,
+    }
+
+
+def build_response(paytech_data, status_code, json_body, text):
+    """Corps et statut HTTP renvoyés au client à partir de la réponse PayTech"""
+    if status_code == 200:
+        return {
+            'payment_url': json_body.get('redirect_url'),
+            'token': json_body.get('token'),
+            'amount': paytech_data['item_price'],
+            'reference': paytech_data['ref_command']
+        }, 200
+
+    return {
+        'error': 'Erreur lors de la création du paiement PayTech',
+        'details': text
+    }, 500
+
+
+PAYTECH_UNREACHABLE = ({'error': 'PayTech est injoignable, veuillez réessayer'}, 502)
+
+
+def provider_unavailable(error):
+    """Corps, statut et en-têtes du refus rapide quand le disjoncteur PayTech est ouvert"""
+    return (
+        {'success': False, 'error': 'Service de paiement temporairement indisponible, veuillez réessayer'},
+        503,
+        {'Retry-After': str(error.retry_after)},
+    )
@@ -0,0 +1,71 @@
+# ===========================================
+# payments/management/commands/bench_paytech_client.py
+# ===========================================
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from payments.paytech_client import PaytechClient
+from payments.paytech_stub import PaytechStubServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence d'initiation PayTech avec une connexion neuve par appel "
+        "(requests.post) et avec le client à connexions persistantes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument(
+            '--base-url',
+            help="Cible existante (ex. https://…/api) ; par défaut un faux PayTech local est lancé",
+        )
+        parser.add_argument('--latency', type=float, default=0.0, help="Latence du faux PayTech")
+
+    def handle(self, *args, **options):
+        server = None
+        base_url = options['base_url']
+        if not base_url:
+            server = PaytechStubServer(latency=options['latency'])
+            base_url = server.start()
+
+        payload = {'item_name': 'Bench', 'item_price': 100, 'ref_command': 'WXP-BENCH'}
+        headers = {'API_KEY': 'bench', 'API_SECRET': 'bench'}
+        url = f"{base_url}{PaytechClient.REQUEST_PAYMENT_PATH}"
+        client = PaytechClient(base_url=base_url, api_key='bench', api_secret='bench')
+
+        try:
+            fresh = self.measure(
+                lambda: requests.post(url, json=payload, headers=headers, timeout=client.timeout),
+                options['requests'],
+            )
+            pooled = self.measure(lambda: client.request_payment(payload), options['requests'])
+        finally:
+            client.close()
+            if server:
+                server.stop()
+
+        self.report('requests.post (sans pool)', fresh)
+        self.report('PaytechClient (pool)', pooled)
+        self.stdout.write(self.style.SUCCESS(
+            f"Latence médiane divisée par {statistics.median(fresh) / statistics.median(pooled):.1f}"
+        ))
+
+    @staticmethod
+    def measure(call, count):
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            call().raise_for_status()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<28} médiane {statistics.median(timings):6.2f} ms   p95 {p95:6.2f} ms"
+        )
@@ -0,0 +1,82 @@
+# ===========================================
+# payments/management/commands/bench_reconciliation.py
+# ===========================================
+import csv
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from accounts.models import User
+from payments import reconciliation
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (lignes/s) du rapprochement d'un fichier de règlement PayTech"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000000)
+
+    def handle(self, *args, **options):
+        lines = options['lines']
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        user = User.objects.create_user(phone_number=prefix, full_name='Bench rapprochement')
+        # Jour sans autre activité, dans une partition déjà créée
+        day = timezone.localdate() + timedelta(days=30)
+        settled_at = timezone.make_aware(datetime.combine(day, dt_time(12)))
+
+        workdir = tempfile.mkdtemp(prefix='bench-reconcile-')
+        source = os.path.join(workdir, 'settlement.csv')
+        try:
+            rows = [
+                (uuid.uuid4(), user.pk, f"{prefix}-{index}", f"tok-{index}", 1000 + index % 5000, settled_at, settled_at, settled_at)
+                for index in range(lines)
+            ]
+            with connection.cursor() as cursor:
+                execute_values(
+                    cursor.cursor,
+                    f"""
+                    INSERT INTO {Transaction._meta.db_table}
+                        (id, user_id, reference, external_reference, amount, created_at,
+                         updated_at, completed_at, transaction_type, payment_method, currency, fees, status)
+                    VALUES %s
+                    """,
+                    rows,
+                    template="(%s, %s, %s, %s, %s, %s, %s, %s, 'deposit', 'wave', 'XOF', 0, 'completed')",
+                    page_size=5000,
+                )
+
+            # Écarts injectés : une ligne sur 1000 absente, doublée, au mauvais montant ou inconnue
+            with open(source, 'w', newline='') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['ref_command', 'token', 'item_price', 'date'])
+                for _, _, reference, token, amount, *_ in rows:
+                    index = int(reference.rsplit('-', 1)[1])
+                    if index % 1000 == 1:
+                        continue
+                    if index % 1000 == 2:
+                        amount += 5
+                    writer.writerow([reference, token, amount, day.isoformat()])
+                    if index % 1000 == 3:
+                        writer.writerow([reference, token, amount, day.isoformat()])
+                    if index % 1000 == 4:
+                        writer.writerow([f"{reference}-x", token, amount, day.isoformat()])
+
+            started = time.perf_counter()
+            report = reconciliation.reconcile(source, day, os.path.join(workdir, 'reports'))
+            elapsed = time.perf_counter() - started
+        finally:
+            Transaction.objects.filter(user=user).delete()
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.lines} lignes rapprochées en {elapsed:.2f}s : {report.lines / elapsed:.0f} lignes/s {report.counts}"
+        ))
+        self.stdout.write(f"Rapports : {workdir}/reports")
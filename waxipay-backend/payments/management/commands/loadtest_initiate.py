@@ -0,0 +1,75 @@
+# ===========================================
+# payments/management/commands/loadtest_initiate.py
+# ===========================================
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge de l'initiation de paiement sur un serveur lancé à part. "
+        "Exemple : PAYTECH_BASE_URL=http://127.0.0.1:8089/api avec run_paytech_stub --latency 0.5, "
+        "puis comparer `gunicorn waxipay_backend.wsgi -w 4` sur /api/payments/initiate/ et "
+        "`uvicorn waxipay_backend.asgi:application --workers 4` sur /api/payments/initiate-async/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="URL complète de l'endpoint d'initiation")
+        parser.add_argument('--phone', required=True, help="Numéro de l'utilisateur au nom duquel payer")
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--amount', default='100')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(phone_number=options['phone'])
+        except User.DoesNotExist:
+            raise CommandError("Utilisateur introuvable")
+        token = str(RefreshToken.for_user(user).access_token)
+
+        latencies, statuses, elapsed = asyncio.run(self.run(options, token))
+
+        ok = sum(1 for status in statuses if status == 200)
+        latencies.sort()
+        self.stdout.write(f"Requêtes        : {len(statuses)} ({ok} OK, {len(statuses) - ok} en erreur)")
+        self.stdout.write(f"Durée           : {elapsed:.2f} s")
+        self.stdout.write(self.style.SUCCESS(f"Débit           : {len(statuses) / elapsed:.1f} req/s"))
+        if latencies:
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            self.stdout.write(f"Latence médiane : {statistics.median(latencies):.1f} ms   p95 {p95:.1f} ms")
+
+    async def run(self, options, token):
+        queue = asyncio.Queue()
+        for _ in range(options['requests']):
+            queue.put_nowait(None)
+
+        latencies, statuses = [], []
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            async def worker():
+                while not queue.empty():
+                    queue.get_nowait()
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(
+                            options['url'],
+                            json={'amount': options['amount'], 'description': 'Test de charge'},
+                            headers={'Authorization': f'Bearer {token}'},
+                        )
+                        statuses.append(response.status_code)
+                    except httpx.HTTPError:
+                        statuses.append(None)
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+            elapsed = time.perf_counter() - started
+
+        return latencies, statuses, elapsed
@@ -0,0 +1,132 @@
+# ===========================================
+# payments/management/commands/loadtest_payment_events.py
+# ===========================================
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from payments import initiation
+from transactions import rollups, state_machine
+from transactions.models import Transaction
+from transactions.signals import status_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge des flux SSE de statut sur un serveur ASGI lancé à part "
+        "(ex. `uvicorn waxipay_backend.asgi:application`) : ouvre N flux sur des paiements "
+        "en attente, les annule par lots et mesure le délai de réveil de chaque flux."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="URL de base du serveur, ex. http://127.0.0.1:8000")
+        parser.add_argument('--phone', required=True, help="Numéro de l'utilisateur au nom duquel payer")
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--ramp', type=int, default=50,
+            help="Ouvertures simultanées : chaque ouverture occupe une connexion PostgreSQL le temps "
+                 "de l'authentification et de la lecture du statut",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(phone_number=options['phone'])
+        except User.DoesNotExist:
+            raise CommandError("Utilisateur introuvable")
+        token = str(RefreshToken.for_user(user).access_token)
+        transactions = [
+            initiation.create_pending_deposit(user, 100, 'Test de charge SSE')
+            for _ in range(options['connections'])
+        ]
+
+        opened, latencies, elapsed = asyncio.run(self.run(options, token, transactions))
+
+        latencies.sort()
+        self.stdout.write(f"Flux ouverts    : {opened} en {elapsed:.2f} s")
+        self.stdout.write(self.style.SUCCESS(
+            f"Flux réveillés  : {len(latencies)} / {len(transactions)}"
+        ))
+        if latencies:
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            self.stdout.write(f"Délai médian    : {statistics.median(latencies):.1f} ms   p95 {p95:.1f} ms")
+
+    async def run(self, options, token, transactions):
+        url = urlsplit(options['url'])
+        connected, opening = asyncio.Semaphore(0), asyncio.Semaphore(options['ramp'])
+        committed_at, latencies, refused = {}, [], []
+
+        async def stream(transaction_obj):
+            # Client HTTP minimal : des milliers de flux sans pool de connexions partagé
+            await opening.acquire()
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            writer.write(
+                f"GET /api/payments/{transaction_obj.id}/events/ HTTP/1.1\r\n"
+                f"Host: {url.netloc}\r\nAuthorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+            )
+            await writer.drain()
+            try:
+                status_line = await reader.readline()
+                if b' 200 ' not in status_line:
+                    refused.append(status_line.decode(errors='replace').strip())
+                    opening.release()
+                    connected.release()
+                    return
+                seen_pending = False
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        if not seen_pending:
+                            refused.append('Flux fermé avant le premier statut')
+                            opening.release()
+                            connected.release()
+                        return
+                    if not line.startswith(b'data: '):
+                        continue
+                    status = json.loads(line[6:])['status']
+                    if not seen_pending:
+                        seen_pending = True
+                        opening.release()
+                        connected.release()
+                    elif status == 'cancelled':
+                        latencies.append((time.perf_counter() - committed_at[transaction_obj.id]) * 1000)
+                        return
+            finally:
+                writer.close()
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(stream(transaction_obj)) for transaction_obj in transactions]
+        for _ in transactions:
+            await connected.acquire()
+        if refused:
+            for task in tasks:
+                task.cancel()
+            raise CommandError(f"{len(refused)} flux refusés, ex. {refused[0]}")
+        elapsed = time.perf_counter() - started
+
+        for start in range(0, len(transactions), options['batch_size']):
+            batch = transactions[start:start + options['batch_size']]
+            await asyncio.to_thread(self.cancel, batch, committed_at)
+        await asyncio.wait(tasks, timeout=30)
+        return len(transactions), latencies, elapsed
+
+    @staticmethod
+    def cancel(batch, committed_at):
+        with db_transaction.atomic():
+            transitions = [state_machine.transition(transaction_obj.id, 'cancelled') for transaction_obj in batch]
+            deltas = []
+            for transition in transitions:
+                deltas.extend(rollups.status_change_deltas(transition, transition.old_status, transition.status))
+            rollups.apply_deltas(deltas)
+            status_changed.send(sender=Transaction, transitions=transitions)
+            # Noté avant la validation : le NOTIFY peut réveiller un flux avant le retour de COMMIT
+            now = time.perf_counter()
+            for transaction_obj in batch:
+                committed_at[transaction_obj.id] = now
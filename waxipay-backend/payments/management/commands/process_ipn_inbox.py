@@ -0,0 +1,73 @@
+# ===========================================
+# payments/management/commands/process_ipn_inbox.py
+# ===========================================
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from payments import settlement
+
+
+def drain(batch_size, poll_interval, once, stop):
+    """Boucle d'un worker : règle des lots jusqu'à l'arrêt (ou jusqu'à ce que plus rien ne soit dû avec --once)"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    total = 0
+    try:
+        while not stop.is_set():
+            processed = settlement.process_batch(batch_size)
+            total += processed
+            if not processed:
+                if once:
+                    break
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+    return total
+
+
+def _worker(batch_size, poll_interval, once, stop, results):
+    results.put(drain(batch_size, poll_interval, once, stop))
+
+
+class Command(BaseCommand):
+    help = "Règle les IPN PayTech en attente avec un pool de processus (SELECT ... FOR UPDATE SKIP LOCKED)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IPN_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=settings.IPN_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help="Attente en secondes quand la boîte est vide")
+        parser.add_argument('--once', action='store_true', help="S'arrêter quand plus aucune notification n'est due")
+
+    def handle(self, *args, **options):
+        # Les processus fils ne doivent pas hériter des connexions du parent
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        results = context.Queue()
+        args = (options['batch_size'], options['poll_interval'], options['once'], stop, results)
+        workers = [context.Process(target=_worker, args=args, daemon=True) for _ in range(options['workers'])]
+
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        processed = sum(results.get() for worker in workers if worker.exitcode == 0)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} notifications traitées en {elapsed:.1f}s par {len(workers)} workers"
+        ))
@@ -0,0 +1,14 @@
+# ===========================================
+# payments/management/commands/purge_idempotency_keys.py
+# ===========================================
+from django.core.management.base import BaseCommand
+
+from payments import idempotency
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence expirées (à planifier, ex. toutes les heures)"
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} clés expirées supprimées"))
@@ -0,0 +1,34 @@
+# ===========================================
+# payments/management/commands/reconcile_paytech.py
+# ===========================================
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments import reconciliation
+
+
+class Command(BaseCommand):
+    help = "Rapproche un fichier de règlement PayTech (CSV) des transactions du jour"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Fichier de règlement CSV")
+        parser.add_argument('--day', type=date.fromisoformat, required=True, help="Jour réglé (AAAA-MM-JJ)")
+        parser.add_argument('--output', default='reconciliation', help="Dossier des rapports CSV")
+        parser.add_argument('--partitions', type=int, help="Nombre de partitions de hachage")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            report = reconciliation.reconcile(options['file'], options['day'], options['output'], options['partitions'])
+        except (OSError, reconciliation.ReconciliationError) as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        counts = ', '.join(f"{category}: {count}" for category, count in report.counts.items())
+        self.stdout.write(f"{report.lines} lignes rapprochées en {elapsed:.1f}s ({counts})")
+        if any(report.counts[category] for category in reconciliation.REPORT_CATEGORIES):
+            self.stdout.write(self.style.WARNING(f"Écarts détaillés dans {report.output_dir}/"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Aucun écart"))
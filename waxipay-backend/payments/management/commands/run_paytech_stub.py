@@ -0,0 +1,25 @@
+# ===========================================
+# payments/management/commands/run_paytech_stub.py
+# ===========================================
+from django.core.management.base import BaseCommand
+
+from payments.paytech_stub import PaytechStubServer
+
+
+class Command(BaseCommand):
+    help = "Lance un faux serveur PayTech local (utiliser PAYTECH_BASE_URL=http://127.0.0.1:<port>/api)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--latency', type=float, default=0.0, help="Latence simulée en secondes")
+
+    def handle(self, *args, **options):
+        server = PaytechStubServer(options['host'], options['port'], options['latency'])
+        self.stdout.write(self.style.SUCCESS(f"Faux PayTech à l'écoute sur {server.base_url}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IpnNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_event', models.CharField(max_length=50)),
+                ('ref_command', models.CharField(max_length=100)),
+                ('custom_field', models.CharField(blank=True, max_length=255)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('processed', 'Traitée'), ('failed', 'Échouée')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Notification IPN',
+                'verbose_name_plural': 'Notifications IPN',
+                'db_table': 'ipn_notifications',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='ipn_notification_pending_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ipnnotification',
+            constraint=models.UniqueConstraint(fields=('ref_command', 'type_event'), name='ipn_notification_event_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_ipnnotification_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='transaction_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
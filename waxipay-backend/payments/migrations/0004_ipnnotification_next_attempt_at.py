@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_idempotencykey_transaction_id'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ipnnotification',
+            name='ipn_notification_pending_idx',
+        ),
+        migrations.AddField(
+            model_name='ipnnotification',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='ipnnotification',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at', 'id'], name='ipn_notification_due_idx'),
+        ),
+    ]
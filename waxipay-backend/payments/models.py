@@ -1,3 +1,86 @@
+# ===========================================
+# payments/models.py
+# ===========================================
 from django.db import models
+from django.utils import timezone
+from accounts.models import User
+import uuid
 
-# Create your models here.
+
+class IdempotencyKey(models.Model):
+    """Première réponse d'une initiation de paiement, rejouée pour les requêtes répétées (en-tête Idempotency-Key)"""
+    STATUS_CHOICES = [
+        ('in_progress', 'En cours'),
+        ('completed', 'Terminée'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    # Transaction en attente créée pour cette clé : au-delà, la requête n'est plus rejouable à neuf
+    transaction_id = models.UUIDField(null=True, blank=True)
+
+    locked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+
+class IpnNotification(models.Model):
+    """
+    Boîte de réception durable des IPN PayTech.
+
+    Le webhook se contente d'y ajouter la notification (dédoublonnée sur
+    référence + événement) ; les workers de `process_ipn_inbox` appliquent
+    ensuite le règlement par lots.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('processed', 'Traitée'),
+        ('failed', 'Échouée'),
+    ]
+
+    type_event = models.CharField(max_length=50)
+    ref_command = models.CharField(max_length=100)
+    custom_field = models.CharField(max_length=255, blank=True)
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Reprise après échec différée avec un délai exponentiel (payments/settlement.py)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ipn_notifications'
+        verbose_name = 'Notification IPN'
+        verbose_name_plural = 'Notifications IPN'
+        constraints = [
+            models.UniqueConstraint(fields=['ref_command', 'type_event'], name='ipn_notification_event_uniq'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at', 'id'], condition=models.Q(status='pending'), name='ipn_notification_due_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type_event} {self.ref_command} ({self.status})"
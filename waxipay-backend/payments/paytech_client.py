@@ -0,0 +1,137 @@
+# ===========================================
+# payments/paytech_client.py
+# ===========================================
+import asyncio
+import threading
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import get_breaker
+
+BREAKER_NAME = 'paytech'
+
+
+class PaytechClient:
+    """
+    Client HTTP PayTech avec un pool de connexions persistantes (keep-alive).
+
+    Une instance par processus est partagée par tous les threads (voir
+    get_client) : chaque paiement réutilise une connexion TCP/TLS déjà
+    ouverte au lieu de refaire la poignée de main vers paytech.sn.
+    Les appels passent par le disjoncteur « paytech » (CircuitOpenError).
+    """
+    REQUEST_PAYMENT_PATH = '/payment/request-payment'
+
+    def __init__(self, base_url=None, api_key=None, api_secret=None,
+                 pool_size=None, connect_timeout=None, read_timeout=None):
+        self.base_url = (base_url or settings.PAYTECH_BASE_URL).rstrip('/')
+        self.timeout = (
+            connect_timeout or settings.PAYTECH_CONNECT_TIMEOUT,
+            read_timeout or settings.PAYTECH_READ_TIMEOUT,
+        )
+
+        pool_size = pool_size or settings.PAYTECH_POOL_SIZE
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'API_KEY': api_key or settings.PAYTECH_API_KEY,
+            'API_SECRET': api_secret or settings.PAYTECH_API_SECRET,
+            'Content-Type': 'application/json',
+        })
+
+    def request_payment(self, payload):
+        """POST /payment/request-payment ; lève requests.RequestException en cas d'échec réseau"""
+        with get_breaker(BREAKER_NAME).guard() as call:
+            response = self.session.post(
+                f'{self.base_url}{self.REQUEST_PAYMENT_PATH}',
+                json=payload,
+                timeout=self.timeout,
+            )
+            if response.status_code >= 500:
+                call.record_failure()
+            return response
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Client PayTech partagé du processus, créé à la première utilisation"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PaytechClient()
+    return _client
+
+
+def reset_client():
+    """Ferme le client partagé (changement de configuration, tests)"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+class AsyncPaytechClient:
+    """
+    Équivalent asynchrone (httpx) de PaytechClient pour les vues ASGI.
+
+    Les appels en attente de PayTech ne bloquent aucun thread : un seul
+    processus peut en garder des centaines en vol, dans la limite du pool
+    PAYTECH_ASYNC_POOL_SIZE.
+    """
+
+    def __init__(self, base_url=None, api_key=None, api_secret=None,
+                 pool_size=None, connect_timeout=None, read_timeout=None):
+        self.base_url = (base_url or settings.PAYTECH_BASE_URL).rstrip('/')
+        pool_size = pool_size or settings.PAYTECH_ASYNC_POOL_SIZE
+        self.client = httpx.AsyncClient(
+            headers={
+                'API_KEY': api_key or settings.PAYTECH_API_KEY,
+                'API_SECRET': api_secret or settings.PAYTECH_API_SECRET,
+            },
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(
+                read_timeout or settings.PAYTECH_READ_TIMEOUT,
+                connect=connect_timeout or settings.PAYTECH_CONNECT_TIMEOUT,
+            ),
+        )
+
+    async def request_payment(self, payload):
+        """POST /payment/request-payment ; lève httpx.HTTPError en cas d'échec réseau"""
+        with get_breaker(BREAKER_NAME).guard() as call:
+            response = await self.client.post(
+                f'{self.base_url}{PaytechClient.REQUEST_PAYMENT_PATH}',
+                json=payload,
+            )
+            if response.status_code >= 500:
+                call.record_failure()
+            return response
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# Un client httpx est lié à la boucle d'événements qui l'a créé
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Client PayTech asynchrone partagé pour la boucle d'événements courante"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncPaytechClient()
+    return client
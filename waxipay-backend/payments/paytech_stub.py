@@ -0,0 +1,83 @@
+# ===========================================
+# payments/paytech_stub.py
+# ===========================================
+"""
+Faux serveur PayTech local pour le développement, les tests et les benchmarks.
+
+Répond à POST /api/payment/request-payment comme l'API réelle, avec une
+latence configurable, en HTTP/1.1 keep-alive.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PaytechStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+
+        if self.path.rstrip('/') != '/api/payment/request-payment':
+            return self.reply(404, {'success': 0, 'message': 'Not found'})
+        if not self.headers.get('API_KEY') or not self.headers.get('API_SECRET'):
+            return self.reply(401, {'success': -1, 'errors': ['API_KEY et API_SECRET requis']})
+
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self.reply(400, {'success': -1, 'errors': ['JSON invalide']})
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        token = uuid.uuid4().hex
+        redirect_url = f"{self.server.base_url}/payment/checkout/{token}"
+        self.server.requests_received += 1
+        self.reply(200, {
+            'success': 1,
+            'token': token,
+            'redirect_url': redirect_url,
+            'redirectUrl': redirect_url,
+            'ref_command': payload.get('ref_command'),
+        })
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PaytechStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), PaytechStubHandler)
+        self.latency = latency
+        self.requests_received = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api'
+
+    def start(self):
+        """Démarre le serveur dans un thread et renvoie son URL de base"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
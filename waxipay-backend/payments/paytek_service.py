@@ -4,23 +4,21 @@ import json
 from django.conf import settings
 import logging
 
+from .paytech_client import get_client
+from .circuit_breaker import CircuitOpenError
+
 logger = logging.getLogger(__name__)
 
 
 class PaytechService:
-    BASE_URL = 'https://paytech.sn/api'
-
     @staticmethod
     def request_payment(item_name, item_price, ref_command, custom_field, payment_method, user):
         if custom_field is None:
             custom_field = {}
 
-        url = f'{PaytechService.BASE_URL}/payment/request-payment'
-
         try:
-            response = requests.post(
-                url,
-                json={
+            response = get_client().request_payment(
+                {
                     'item_name': item_name,
                     'item_price': item_price,
                     'currency': 'XOF',
@@ -32,12 +30,7 @@ class PaytechService:
                     'cancel_url': settings.PAYTECH_CANCEL_URL,
                     'ipn_url': settings.PAYTECH_IPN_URL,
                     'custom_field': custom_field or {},
-                },
-                headers={
-                    'API_KEY': settings.PAYTECH_API_KEY,
-                    'API_SECRET': settings.PAYTECH_API_SECRET,
-                },
-                timeout=30
+                }
             )
             logger.info(f"PayTech Request Payload: {response.request.body}")
             logger.info(f"PayTech Response ({response.status_code}): {response.text}")
@@ -64,6 +57,10 @@ class PaytechService:
 
             return json_response
 
+        except CircuitOpenError as e:
+            logger.warning(f"PayTech call rejected by circuit breaker: {e.reason}")
+            return {'success': 0, 'message': 'Service de paiement temporairement indisponible'}
+
         except requests.exceptions.RequestException as e:
             logger.error(f"PayTech request error: {str(e)}")
             return {'success': 0, 'message': str(e)}
@@ -0,0 +1,221 @@
+# ===========================================
+# payments/reconciliation.py
+# ===========================================
+"""
+Rapprochement des fichiers de règlement PayTech avec nos transactions.
+
+Jointure par hachage en deux passes (« grace hash join ») à mémoire constante :
+le fichier CSV du prestataire et nos dépôts de la période sont lus en flux et
+répartis par hachage de la référence dans N fichiers temporaires, puis chaque
+partition est jointe en mémoire (un dictionnaire de taille ~ lignes / N).
+Nos transactions sont exportées par COPY ; les écarts sont écrits au fil de
+l'eau dans des rapports CSV.
+"""
+import csv
+import os
+import tempfile
+import zlib
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from transactions.models import Transaction
+from .initiation import charged_amount
+
+REPORT_CATEGORIES = ('missing_in_ours', 'missing_in_provider', 'mismatched', 'duplicate', 'invalid')
+REPORT_HEADER = [
+    'reference', 'external_reference', 'provider_amount', 'our_amount',
+    'our_status', 'transaction_id', 'line', 'reason',
+]
+LOOKUP_CHUNK = 1000
+
+
+class ReconciliationError(Exception):
+    pass
+
+
+class Report:
+    """Compteurs par catégorie et un fichier CSV par catégorie d'écart, écrit en flux"""
+
+    def __init__(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.counts = dict.fromkeys(('matched', *REPORT_CATEGORIES), 0)
+        self._files, self._writers = {}, {}
+        for category in REPORT_CATEGORIES:
+            handle = open(os.path.join(output_dir, f'{category}.csv'), 'w', newline='')
+            self._files[category] = handle
+            self._writers[category] = csv.writer(handle)
+            self._writers[category].writerow(REPORT_HEADER)
+        self.lines = 0
+
+    def matched(self):
+        self.counts['matched'] += 1
+
+    def add(self, category, reference, external_reference='', provider_amount='', our_amount='',
+            our_status='', transaction_id='', line='', reason=''):
+        self.counts[category] += 1
+        self._writers[category].writerow([
+            reference, external_reference, provider_amount, our_amount,
+            our_status, transaction_id, line, reason,
+        ])
+
+    def close(self):
+        for handle in self._files.values():
+            handle.close()
+
+
+def reconcile(source, day, output_dir, partitions=None):
+    """
+    Rapproche le fichier de règlement `source` (chemin du CSV) du jour `day`
+    (date locale) avec nos dépôts. Renvoie le Report (compteurs, rapports dans `output_dir`).
+    """
+    partitions = partitions or settings.RECONCILIATION_PARTITIONS
+    report = Report(output_dir)
+    try:
+        with tempfile.TemporaryDirectory(prefix='reconcile-') as workdir:
+            provider_files = _partition(workdir, 'provider', partitions, _read_settlement(source, report))
+            ours_files = _partition(workdir, 'ours', partitions, _read_transactions(workdir, day))
+            for provider_path, ours_path in zip(provider_files, ours_files):
+                leftovers = _join(provider_path, ours_path, report)
+                _resolve_leftovers(leftovers, report)
+    finally:
+        report.close()
+    return report
+
+
+def _read_settlement(source, report):
+    """Lignes du fichier PayTech : (référence, token, montant, numéro de ligne), montant vérifié à la jointure"""
+    columns = settings.PAYTECH_SETTLEMENT_COLUMNS
+    with open(source, newline='') as handle:
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        try:
+            positions = [header.index(columns[field]) for field in ('reference', 'external_reference', 'amount')]
+        except (AttributeError, ValueError):
+            raise ReconciliationError(
+                f"Colonnes attendues dans le fichier : {', '.join(columns.values())}"
+            )
+        reference_at, token_at, amount_at = positions
+        width = max(positions)
+
+        for line, row in enumerate(reader, start=2):
+            if len(row) <= width or not row[reference_at]:
+                report.add('invalid', row[reference_at] if len(row) > reference_at else '',
+                           line=line, reason='Ligne incomplète')
+                continue
+            report.lines += 1
+            yield row[reference_at], row[token_at], row[amount_at], line
+
+
+def _read_transactions(workdir, day):
+    """
+    Nos dépôts PayTech de la période, exportés par COPY dans un fichier CSV :
+    (référence, référence externe, montant facturé, statut, réglé ce jour, id).
+    La période remonte de RECONCILIATION_LOOKBACK_DAYS pour inclure les paiements
+    initiés la veille et réglés ce jour (partitions mensuelles élaguées par created_at).
+    """
+    start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    end = start + timedelta(days=1)
+    path = os.path.join(workdir, 'transactions.csv')
+    with connection.cursor() as cursor, open(path, 'w') as handle:
+        # Montant facturé : voir payments/initiation.py, charged_amount (montant et frais entiers)
+        query = cursor.cursor.mogrify(
+            f"""
+            SELECT reference, COALESCE(external_reference, ''), (amount + fees)::bigint, status,
+                   (status = 'completed' AND completed_at >= %s AND completed_at < %s)::int, id
+            FROM {Transaction._meta.db_table}
+            WHERE transaction_type = 'deposit' AND payment_method <> 'wallet'
+              AND created_at >= %s AND created_at < %s
+            """,
+            [start, end, start - timedelta(days=settings.RECONCILIATION_LOOKBACK_DAYS), end],
+        ).decode()
+        cursor.cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT csv)', handle)
+
+    with open(path, newline='') as handle:
+        yield from csv.reader(handle)
+
+
+def _partition(workdir, name, partitions, rows):
+    """Répartit les lignes par hachage de la référence (1ʳᵉ colonne) ; renvoie les chemins"""
+    paths = [os.path.join(workdir, f'{name}-{index}.csv') for index in range(partitions)]
+    handles = [open(path, 'w', newline='') for path in paths]
+    try:
+        writers = [csv.writer(handle) for handle in handles]
+        for row in rows:
+            writers[zlib.crc32(row[0].encode()) % partitions].writerow(row)
+    finally:
+        for handle in handles:
+            handle.close()
+    return paths
+
+
+def _join(provider_path, ours_path, report):
+    """Joint une partition ; renvoie les lignes PayTech sans transaction dans la période"""
+    settled = {}
+    with open(provider_path, newline='') as handle:
+        for reference, token, amount, line in csv.reader(handle):
+            if reference in settled:
+                report.add('duplicate', reference, token, amount, line=line,
+                           reason=f'Déjà réglée ligne {settled[reference][2]}')
+                continue
+            settled[reference] = (token, amount, line)
+
+    with open(ours_path, newline='') as handle:
+        for reference, external_reference, charged, status, settled_today, transaction_id in csv.reader(handle):
+            provider = settled.pop(reference, None)
+            if provider is None:
+                if settled_today == '1':
+                    report.add('missing_in_provider', reference, external_reference, '', charged,
+                               status, transaction_id, reason='Absente du fichier de règlement')
+                continue
+            _compare(report, reference, provider, external_reference, charged, status, transaction_id)
+
+    return settled
+
+
+def _resolve_leftovers(leftovers, report):
+    """Cherche hors période (index unique sur la référence) les lignes PayTech restées sans correspondance"""
+    references = list(leftovers)
+    for offset in range(0, len(references), LOOKUP_CHUNK):
+        chunk = references[offset:offset + LOOKUP_CHUNK]
+        found = {
+            reference: rest
+            for reference, *rest in Transaction.objects.filter(reference__in=chunk).values_list(
+                'reference', 'external_reference', 'amount', 'fees', 'status', 'id'
+            )
+        }
+        for reference in chunk:
+            provider = leftovers[reference]
+            if reference not in found:
+                token, amount, line = provider
+                report.add('missing_in_ours', reference, token, amount, line=line,
+                           reason='Aucune transaction avec cette référence')
+                continue
+            external_reference, amount, fees, status, transaction_id = found[reference]
+            _compare(report, reference, provider, external_reference or '',
+                     charged_amount(amount, fees), status, transaction_id)
+
+
+def _compare(report, reference, provider, external_reference, charged, status, transaction_id):
+    token, amount, line = provider
+    try:
+        provider_amount = Decimal(amount)
+    except InvalidOperation:
+        report.add('invalid', reference, token, amount, line=line, reason='Montant illisible')
+        return
+    reasons = []
+    if provider_amount != Decimal(charged):
+        reasons.append('montant')
+    if status != 'completed':
+        reasons.append('statut')
+    if token and external_reference and token != external_reference:
+        reasons.append('token')
+    if reasons:
+        report.add('mismatched', reference, token, amount, charged, status, transaction_id, line,
+                   reason=', '.join(reasons))
+    else:
+        report.matched()
@@ -0,0 +1,121 @@
+# ===========================================
+# payments/settlement.py
+# ===========================================
+"""
+Règlement des notifications IPN mises en attente par payments.views.payment_ipn.
+
+Chaque worker réserve un lot avec SELECT ... FOR UPDATE SKIP LOCKED : plusieurs
+processus vident la boîte en parallèle sans jamais traiter la même notification.
+Une notification en échec est reprise après un délai exponentiel
+(IPN_BACKOFF_BASE, plafonné à IPN_BACKOFF_MAX secondes), jusqu'à IPN_MAX_ATTEMPTS.
+"""
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from accounts import wallets
+from transactions.models import Transaction
+from transactions import rollups, state_machine
+from transactions.signals import status_changed
+from .models import IpnNotification
+
+logger = logging.getLogger(__name__)
+
+
+class SettlementError(Exception):
+    """Notification impossible à régler : marquée en échec sans nouvel essai"""
+
+
+def process_batch(batch_size=None):
+    """Règle un lot de notifications en attente ; renvoie le nombre de notifications traitées"""
+    batch_size = batch_size or settings.IPN_BATCH_SIZE
+    now = timezone.now()
+
+    with db_transaction.atomic():
+        notifications = list(
+            IpnNotification.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not notifications:
+            return 0
+
+        processed, deltas = [], []
+        for notification in notifications:
+            try:
+                with db_transaction.atomic():
+                    deltas.extend(settle(notification))
+                processed.append(notification.id)
+            except SettlementError as e:
+                _mark_failed(notification, str(e), retry=False, now=now)
+            except Exception as e:
+                logger.exception(f"IPN settlement error for {notification.ref_command}")
+                _mark_failed(notification, str(e), retry=True, now=now)
+
+        rollups.apply_deltas(deltas)
+        IpnNotification.objects.filter(id__in=processed).update(status='processed', processed_at=now)
+
+    return len(notifications)
+
+
+def settle(notification):
+    """Applique une notification ; renvoie les deltas d'agrégats à appliquer pour le lot"""
+    try:
+        transaction_id = uuid.UUID(notification.custom_field)
+    except ValueError:
+        raise SettlementError('Transaction introuvable')
+
+    if notification.type_event == 'sale_complete':
+        transition = state_machine.transition(
+            transaction_id, 'completed', reference=notification.ref_command,
+            **_external_reference(notification)
+        )
+        if transition:
+            wallets.credit(
+                transition.user_id, transition.amount,
+                transaction_id=transition.id, description=transition.reference,
+                fees=transition.fees,
+            )
+
+    elif notification.type_event == 'sale_canceled':
+        transition = state_machine.transition(transaction_id, 'cancelled', reference=notification.ref_command)
+
+    else:
+        return []
+
+    if transition is None:
+        if not Transaction.objects.filter(id=transaction_id, reference=notification.ref_command).exists():
+            raise SettlementError('Transaction introuvable')
+        # Transaction déjà dans un état final : rien à appliquer
+        return []
+
+    status_changed.send(sender=Transaction, transitions=[transition])
+    return rollups.status_change_deltas(transition, transition.old_status, transition.status)
+
+
+def _external_reference(notification):
+    token = notification.payload.get('token')
+    return {'external_reference': token} if token else {}
+
+
+def _mark_failed(notification, error, retry, now):
+    attempts = notification.attempts + 1
+    exhausted = not retry or attempts >= settings.IPN_MAX_ATTEMPTS
+    IpnNotification.objects.filter(id=notification.id).update(
+        status='failed' if exhausted else 'pending',
+        attempts=attempts,
+        last_error=error,
+        next_attempt_at=now + retry_delay(attempts),
+    )
+
+
+def retry_delay(attempts):
+    """Délai avant la reprise suivante : exponentiel plafonné, ±25 % d'aléa pour étaler les reprises"""
+    delay = min(settings.IPN_BACKOFF_BASE * 2 ** (attempts - 1), settings.IPN_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.75, 1.25))
@@ -0,0 +1,177 @@
+# ===========================================
+# payments/status_stream.py
+# ===========================================
+"""
+Diffusion des changements de statut des transactions aux flux SSE
+(payments/async_views.py : payment_events).
+
+Chaque changement de statut publie un NOTIFY PostgreSQL dans sa propre
+transaction SQL (livré à la validation seulement). Chaque boucle d'événements
+ASGI garde une seule connexion LISTEN, surveillée par loop.add_reader : les
+milliers de flux en attente ne sont que des asyncio.Queue, sans connexion ni
+thread par client.
+
+La connexion est ouverte dans le pool de threads de la boucle (psycopg2.connect
+est bloquant) ; perdue, elle est rouverte par l'écouteur lui-même avec un délai
+exponentiel tant qu'il reste des abonnés, qui relisent leur statut (RESYNC) à
+la perte puis au retour de la connexion.
+"""
+import asyncio
+import logging
+import weakref
+from collections import defaultdict
+
+import psycopg2
+from django.db import connection, connections
+from django.dispatch import receiver
+
+from transactions.models import Transaction
+from transactions.signals import status_changed
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'transaction_status'
+FINAL_STATUSES = ('completed', 'failed', 'cancelled', 'expired')
+# Une charge utile NOTIFY est limitée à 8000 octets : ~150 entrées « uuid:statut »
+NOTIFY_CHUNK = 150
+# Valeur remise aux abonnés quand des notifications ont pu être perdues (reconnexion)
+RESYNC = None
+# Délai (secondes) entre deux tentatives de reconnexion, doublé à chaque échec
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
+
+
+@receiver(status_changed, sender=Transaction)
+def notify_status_changed(sender, transitions, **kwargs):
+    # Seules les transactions existantes changent de statut sous les yeux d'un client
+    entries = [f'{transition.id}:{transition.status}' for transition in transitions if transition.old_status]
+    if not entries:
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(entries), NOTIFY_CHUNK):
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, ','.join(entries[start:start + NOTIFY_CHUNK])])
+
+
+def open_listen_connection():
+    """Connexion autocommit abonnée au canal (bloquant : à exécuter hors de la boucle)"""
+    listen = psycopg2.connect(**connections['default'].get_connection_params())
+    try:
+        listen.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with listen.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+    except BaseException:
+        listen.close()
+        raise
+    return listen
+
+
+class StatusListener:
+    """Connexion LISTEN d'une boucle d'événements, partagée par tous ses flux"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.subscribers = defaultdict(set)  # id de transaction -> {asyncio.Queue}
+        self.connection = None
+        self.fileno = None
+        self.connecting = None  # tâche d'ouverture en cours, partagée par les appelants
+        self.reconnecting = None
+
+    async def subscribe(self, transaction_id):
+        """
+        File recevant les nouveaux statuts de la transaction (RESYNC après une
+        reconnexion), une fois l'écoute active ; lève l'erreur de connexion.
+        """
+        queue = asyncio.Queue()
+        self.subscribers[str(transaction_id)].add(queue)
+        try:
+            await self._connected()
+        except BaseException:
+            self.unsubscribe(transaction_id, queue)
+            raise
+        return queue
+
+    def unsubscribe(self, transaction_id, queue):
+        key = str(transaction_id)
+        queues = self.subscribers.get(key)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[key]
+
+    async def _connected(self):
+        if self.connection is not None:
+            return
+        if self.connecting is None:
+            self.connecting = self.loop.create_task(self._connect())
+        # shield : l'annulation d'un appelant n'interrompt pas l'ouverture partagée
+        await asyncio.shield(self.connecting)
+
+    async def _connect(self):
+        try:
+            listen = await self.loop.run_in_executor(None, open_listen_connection)
+        finally:
+            self.connecting = None
+        self.connection = listen
+        self.fileno = listen.fileno()
+        self.loop.add_reader(self.fileno, self._on_readable)
+
+    def _on_readable(self):
+        try:
+            self.connection.poll()
+        except psycopg2.Error as e:
+            logger.warning(f"Status listener connection lost: {e}")
+            self._reset()
+            return
+
+        notifies, self.connection.notifies = self.connection.notifies, []
+        for notify in notifies:
+            for entry in notify.payload.split(','):
+                transaction_id, _, status = entry.partition(':')
+                for queue in self.subscribers.get(transaction_id, ()):
+                    queue.put_nowait(status)
+
+    def _reset(self):
+        """Connexion perdue : les abonnés relisent leur statut, l'écouteur se reconnecte en tâche de fond"""
+        self.loop.remove_reader(self.fileno)
+        try:
+            self.connection.close()
+        except psycopg2.Error:
+            pass
+        self.connection = None
+        self._resync()
+        if self.subscribers and self.reconnecting is None:
+            self.reconnecting = self.loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = RECONNECT_DELAY
+        try:
+            while self.subscribers:
+                try:
+                    await self._connected()
+                except (psycopg2.Error, OSError) as e:
+                    logger.warning(f"Status listener reconnection failed, retrying in {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                    continue
+                # Notifications émises pendant la coupure : perdues
+                self._resync()
+                return
+        finally:
+            self.reconnecting = None
+
+    def _resync(self):
+        for queues in self.subscribers.values():
+            for queue in queues:
+                queue.put_nowait(RESYNC)
+
+
+_listeners = weakref.WeakKeyDictionary()
+
+
+def get_listener():
+    """Écouteur de la boucle d'événements courante"""
+    loop = asyncio.get_running_loop()
+    listener = _listeners.get(loop)
+    if listener is None:
+        listener = _listeners[loop] = StatusListener(loop)
+    return listener
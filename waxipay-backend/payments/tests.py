@@ -1,3 +1,468 @@
-from django.test import TestCase
+# ===========================================
+# payments/tests.py
+# ===========================================
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts import ledger
+from transactions import fees
+from transactions import state_machine
+from transactions.models import FeeRule, Transaction
+from transactions.signals import status_changed
+from waxipay_backend.testing import api_client, make_user
+from . import idempotency, initiation, paytech_client, reconciliation, settlement, status_stream
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
+from .models import IdempotencyKey, IpnNotification
+from .paytech_stub import PaytechStubServer
+
+
+def ipn(type_event, transaction_obj, **extra):
+    """Corps d'une IPN PayTech signée"""
+    return {
+        'type_event': type_event,
+        'ref_command': transaction_obj.reference,
+        'custom_field': str(transaction_obj.id),
+        'api_key_sha256': hashlib.sha256(settings.PAYTECH_API_KEY.encode()).hexdigest(),
+        'api_secret_sha256': hashlib.sha256(settings.PAYTECH_API_SECRET.encode()).hexdigest(),
+        **extra,
+    }
+
+
+class DepositFeeTestCase(TestCase):
+    """Frais de dépôt de 1,5 %, arrondis au franc"""
+
+    def setUp(self):
+        FeeRule.objects.create(transaction_type='deposit', percentage=Decimal('1.5'))
+        fees.invalidate()
+        self.addCleanup(fees.invalidate)
+        self.user = make_user('+221770000201')
+
+
+class InitiationTests(DepositFeeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = PaytechStubServer()
+        cls.paytech = override_settings(PAYTECH_BASE_URL=cls.stub.start())
+        cls.paytech.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.paytech.disable()
+        cls.stub.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.stub.latency = 0
+        self.stub.requests_received = 0
+        paytech_client.reset_client()
+        self.addCleanup(paytech_client.reset_client)
+        self.client = api_client(self.user)
+
+    def initiate(self, amount, key=None, **headers):
+        if key is not None:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        return self.client.post('/api/payments/initiate/', {'amount': amount}, format='json', **headers)
+
+    def test_customer_is_charged_amount_plus_rounded_fees(self):
+        response = self.initiate('1033')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['amount'], 1048)  # 1 033 + 15 (15,495 arrondi)
+        self.assertTrue(response.data['payment_url'].startswith(self.stub.base_url))
+        transaction_obj = Transaction.objects.get(reference=response.data['reference'])
+        self.assertEqual(
+            (transaction_obj.status, transaction_obj.amount, transaction_obj.fees),
+            ('pending', Decimal('1033'), Decimal('15')),
+        )
+        self.assertEqual(self.stub.requests_received, 1)
+
+    def test_invalid_amounts(self):
+        for amount in ('', '-5', 'abc', '100.50'):
+            self.assertEqual(self.initiate(amount).status_code, 400, amount)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_payments_share_one_keep_alive_connection(self):
+        client = paytech_client.get_client()
+        # Une connexion acceptée par le faux serveur = une poignée de main TCP
+        with mock.patch.object(PaytechStubServer, 'process_request', autospec=True,
+                               side_effect=PaytechStubServer.process_request) as accepted:
+            for _ in range(3):
+                self.assertEqual(self.initiate('1000').status_code, 200)
+
+        self.assertIs(paytech_client.get_client(), client)
+        self.assertEqual((self.stub.requests_received, accepted.call_count), (3, 1))
+
+    async def test_async_initiation(self):
+        client = AsyncClient()
+        url = '/api/payments/initiate-async/'
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+        response = await client.post(url, {'amount': '1033'}, content_type='application/json', headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['amount'], 1048)
+        transaction_obj = await Transaction.objects.aget(reference=response.json()['reference'])
+        self.assertEqual((transaction_obj.status, transaction_obj.fees), ('pending', Decimal('15')))
+        self.assertEqual(self.stub.requests_received, 1)
+
+        self.assertEqual((await client.post(url, {'amount': '1033'}, content_type='application/json')).status_code, 401)
+        self.assertEqual((await client.get(url, headers=headers)).status_code, 405)
+
+    def test_repeated_key_replays_the_first_response(self):
+        first = self.initiate('1000', key='order-1')
+        second = self.initiate('1000', key='order-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((second.status_code, second.data), (200, first.data))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(self.stub.requests_received, 1)
+
+    def test_key_reused_for_another_payment_is_refused(self):
+        self.initiate('1000', key='order-2')
+        response = self.initiate('2000', key='order-2')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_invalid_key(self):
+        self.assertEqual(self.initiate('1000', key=' ').status_code, 400)
+        self.assertEqual(self.initiate('1000', key='k' * 256).status_code, 400)
+
+    @override_settings(PAYTECH_READ_TIMEOUT=0.3)
+    def test_timeout_is_replayed_not_retried(self):
+        # PayTech a pu recevoir la demande : la même clé ne doit pas créer un second paiement
+        self.stub.latency = 1
+        first = self.initiate('1000', key='order-3')
+        self.stub.latency = 0
+        second = self.initiate('1000', key='order-3')
+
+        self.assertEqual(first.status_code, 502)
+        self.assertEqual((second.status_code, second.data), (502, first.data))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_open_breaker_releases_the_key(self):
+        breaker = type(get_breaker(paytech_client.BREAKER_NAME))
+        with mock.patch.object(breaker, 'check', side_effect=CircuitOpenError('paytech', 'open', 30)):
+            refused = self.initiate('1000', key='order-4')
+
+        self.assertEqual(refused.status_code, 503)
+        self.assertEqual(refused['Retry-After'], '30')
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.filter(key='order-4').exists())
+
+        retried = self.initiate('1000', key='order-4')
+        self.assertEqual(retried.status_code, 200)
+        self.assertFalse(retried.has_header('Idempotent-Replayed'))
+
+    def test_request_interrupted_after_insert_is_not_retried(self):
+        self.client.raise_request_exception = False
+        with mock.patch.object(initiation, 'build_paytech_payload', side_effect=RuntimeError('boom')):
+            self.assertEqual(self.initiate('1000', key='order-5').status_code, 500)
+
+        transaction_obj = Transaction.objects.get()
+        replay = self.initiate('1000', key='order-5')
+        self.assertEqual(replay.status_code, 500)
+        self.assertEqual(replay.data['transaction_id'], str(transaction_obj.id))
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(self.stub.requests_received, 0)
+
+    def test_stale_bound_key_replays_interruption(self):
+        record, _ = idempotency.claim(self.user, 'order-6', idempotency.fingerprint(Decimal('1000'), initiation.DEFAULT_DESCRIPTION))
+        transaction_obj = initiation.create_pending_deposit(self.user, Decimal('1000'), initiation.DEFAULT_DESCRIPTION, record)
+        # Processus d'origine tué sans réponse
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT + 1)
+        )
+
+        response = self.initiate('1000', key='order-6')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data['transaction_id'], str(transaction_obj.id))
+        self.assertEqual(self.stub.requests_received, 0)
+
+    async def test_async_initiation_replays_through_idempotency_key(self):
+        client = AsyncClient()
+        headers = {
+            'Authorization': f'Bearer {AccessToken.for_user(self.user)}',
+            'Idempotency-Key': 'order-7',
+        }
+        first = await client.post('/api/payments/initiate-async/', {'amount': '1033'}, content_type='application/json', headers=headers)
+        second = await client.post('/api/payments/initiate-async/', {'amount': '1033'}, content_type='application/json', headers=headers)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['amount'], 1048)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(await Transaction.objects.acount(), 1)
+        self.assertEqual(self.stub.requests_received, 1)
+
+
+class IpnSettlementTests(DepositFeeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.deposit = initiation.create_pending_deposit(self.user, Decimal('1000'), 'Dépôt')
+        self.account = ledger.wallet_account(self.user.wallet.pk)
+
+    def post_ipn(self, data):
+        return api_client().post('/api/payments/ipn/', data)
+
+    def test_signature_is_required(self):
+        data = ipn('sale_complete', self.deposit, api_secret_sha256='0' * 64)
+        self.assertEqual(self.post_ipn(data).status_code, 403)
+        self.assertFalse(IpnNotification.objects.exists())
+
+    def test_duplicate_ipn_is_stored_and_credited_once(self):
+        for _ in range(3):
+            self.assertEqual(self.post_ipn(ipn('sale_complete', self.deposit, token='tok-1')).status_code, 200)
+        self.assertEqual(IpnNotification.objects.count(), 1)
+
+        self.assertEqual(settlement.process_batch(), 1)
+        self.assertEqual(settlement.process_batch(), 0)
+
+        self.deposit.refresh_from_db()
+        self.assertEqual((self.deposit.status, self.deposit.external_reference), ('completed', 'tok-1'))
+        self.assertEqual(ledger.balance(self.account), Decimal('1000'))
+        self.assertEqual(ledger.balance(ledger.FEES_REVENUE), Decimal('15'))
+        self.assertEqual(ledger.balance(ledger.PAYTECH_CLEARING), Decimal('-1015'))
+        self.assertEqual(IpnNotification.objects.get().status, 'processed')
+
+    def test_cancel_after_completion_changes_nothing(self):
+        self.post_ipn(ipn('sale_complete', self.deposit))
+        self.post_ipn(ipn('sale_canceled', self.deposit))
+
+        self.assertEqual(settlement.process_batch(), 2)
+
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.status, 'completed')
+        self.assertEqual(ledger.balance(self.account), Decimal('1000'))
+
+    def test_cancellation_credits_nothing(self):
+        self.post_ipn(ipn('sale_canceled', self.deposit))
+        settlement.process_batch()
+
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.status, 'cancelled')
+        self.assertEqual(ledger.balance(self.account), Decimal('0'))
+
+    def test_unknown_transaction_fails_without_retry(self):
+        self.post_ipn(ipn('sale_complete', self.deposit, custom_field='not-a-uuid'))
+        settlement.process_batch()
+
+        notification = IpnNotification.objects.get()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 1))
+
+    @override_settings(IPN_BACKOFF_BASE=5, IPN_BACKOFF_MAX=300, IPN_MAX_ATTEMPTS=3)
+    def test_failed_settlement_is_retried_with_backoff(self):
+        self.post_ipn(ipn('sale_complete', self.deposit))
+
+        with mock.patch.object(settlement, 'settle', side_effect=RuntimeError('database hiccup')):
+            before = timezone.now()
+            self.assertEqual(settlement.process_batch(), 1)
+            notification = IpnNotification.objects.get()
+            self.assertEqual((notification.status, notification.attempts), ('pending', 1))
+            delay = (notification.next_attempt_at - before).total_seconds()
+            self.assertTrue(3.75 <= delay <= 6.25 + 1, delay)
+
+            # Pas encore dû : le worker ne le reprend pas
+            self.assertEqual(settlement.process_batch(), 0)
+
+            for _ in range(2):
+                IpnNotification.objects.update(next_attempt_at=timezone.now())
+                settlement.process_batch()
+            notification.refresh_from_db()
+            self.assertEqual((notification.status, notification.attempts), ('failed', 3))
+
+        self.assertEqual(ledger.balance(self.account), Decimal('0'))
+
+    def test_retry_delay_is_capped(self):
+        with self.settings(IPN_BACKOFF_BASE=5, IPN_BACKOFF_MAX=300):
+            self.assertLessEqual(settlement.retry_delay(1), timedelta(seconds=6.25))
+            self.assertGreaterEqual(settlement.retry_delay(3), timedelta(seconds=15))
+            self.assertLessEqual(settlement.retry_delay(20), timedelta(seconds=375))
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.user = make_user('+221770000210')
+        self.workdir = tempfile.mkdtemp(prefix='reconcile-test-')
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.day = timezone.localdate()
+
+    def deposit(self, reference, status='completed', age=timedelta(0), **fields):
+        transaction_obj = Transaction.objects.create(
+            user=self.user, transaction_type='deposit', payment_method='wave', amount=Decimal('1000'),
+            fees=Decimal('15'), status=status, reference=reference, external_reference=f'tok-{reference}',
+            completed_at=timezone.now() if status == 'completed' else None, **fields
+        )
+        if age:
+            Transaction.objects.filter(pk=transaction_obj.pk).update(created_at=timezone.now() - age)
+        return transaction_obj
+
+    def settlement_file(self, rows, header=('ref_command', 'token', 'item_price')):
+        path = os.path.join(self.workdir, 'settlement.csv')
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return path
+
+    def report_rows(self, category):
+        with open(os.path.join(self.workdir, 'out', f'{category}.csv'), newline='') as handle:
+            return list(csv.DictReader(handle))
+
+    def test_discrepancies_are_reported_by_category(self):
+        self.deposit('REC-1')
+        self.deposit('REC-2')
+        self.deposit('REC-3')
+        self.deposit('REC-4', status='pending')
+        self.deposit('REC-5', age=timedelta(days=10))  # hors période, retrouvée par sa référence
+        source = self.settlement_file([
+            ('REC-1', 'tok-REC-1', '1015'),
+            ('REC-2', 'tok-REC-2', '999'),
+            ('REC-5', 'tok-REC-5', '1015'),
+            ('REC-1', 'tok-REC-1', '1015'),
+            ('UNKNOWN', 'tok-x', '500'),
+            ('REC-6',),
+        ])
+
+        report = reconciliation.reconcile(source, self.day, os.path.join(self.workdir, 'out'), partitions=3)
+
+        self.assertEqual(report.counts, {
+            'matched': 2, 'missing_in_ours': 1, 'missing_in_provider': 1,
+            'mismatched': 1, 'duplicate': 1, 'invalid': 1,
+        })
+        self.assertEqual([row['reference'] for row in self.report_rows('missing_in_provider')], ['REC-3'])
+        self.assertEqual(self.report_rows('mismatched')[0]['reason'], 'montant')
+        self.assertEqual(self.report_rows('invalid')[0]['line'], '7')
+
+    def test_missing_columns(self):
+        source = self.settlement_file([], header=('reference', 'amount'))
+        with self.assertRaises(reconciliation.ReconciliationError):
+            reconciliation.reconcile(source, self.day, os.path.join(self.workdir, 'out'))
+
+
+class PaymentEventsTests(TransactionTestCase):
+    """Les NOTIFY ne sont livrés qu'à la validation : écritures réellement validées"""
+
+    def setUp(self):
+        self.user = make_user('+221770000220')
+        self.deposit = Transaction.objects.create(
+            user=self.user, transaction_type='deposit', payment_method='wave', amount=1000, reference='SSE-1',
+        )
+        self.url = f'/api/payments/{self.deposit.pk}/events/'
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def close_listener(self):
+        # Une boucle par test : sa connexion LISTEN ne doit pas survivre à la base de test
+        listener = status_stream.get_listener()
+        if listener.connection is not None:
+            listener.loop.remove_reader(listener.fileno)
+            listener.connection.close()
+            listener.connection = None
+
+    def complete(self):
+        transition = state_machine.transition(self.deposit.pk, 'completed')
+        status_changed.send(sender=Transaction, transitions=[transition])
+
+    async def events(self, response):
+        async for chunk in response.streaming_content:
+            chunk = chunk.decode()
+            if chunk.startswith('event: status'):
+                yield json.loads(chunk.split('data: ', 1)[1])['status']
+            elif chunk.startswith(':'):
+                yield 'keepalive'
+
+    async def test_status_change_is_pushed_and_closes_the_stream(self):
+        try:
+            response = await AsyncClient().get(self.url, headers=self.headers)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = self.events(response)
+
+            self.assertEqual(await anext(events), 'pending')
+            await sync_to_async(self.complete)()
+            self.assertEqual(await asyncio.wait_for(anext(events), 5), 'completed')
+            with self.assertRaises(StopAsyncIteration):
+                await anext(events)
+        finally:
+            self.close_listener()
+
+    @override_settings(SSE_KEEPALIVE_SECONDS=0.1, SSE_MAX_DURATION=0.25)
+    async def test_idle_stream_sends_keepalives_until_max_duration(self):
+        try:
+            response = await AsyncClient().get(self.url, headers=self.headers)
+            status, *idle = [event async for event in self.events(response)]
+            self.assertEqual(status, 'pending')
+            self.assertGreaterEqual(len(idle), 2)
+            self.assertEqual(set(idle), {'keepalive'})
+        finally:
+            self.close_listener()
+
+    async def test_lost_connection_resyncs_and_reconnects(self):
+        listener = status_stream.get_listener()
+        queue = await listener.subscribe(self.deposit.pk)
+        try:
+            listener._reset()
+            self.assertIs(await queue.get(), status_stream.RESYNC)
+            self.assertIs(await asyncio.wait_for(queue.get(), 5), status_stream.RESYNC)
+            self.assertIsNotNone(listener.connection)
+        finally:
+            listener.unsubscribe(self.deposit.pk, queue)
+            self.close_listener()
+
+    async def test_foreign_or_anonymous_requests(self):
+        other = await sync_to_async(make_user)('+221770000221')
+        foreign = {'Authorization': f'Bearer {AccessToken.for_user(other)}'}
+        try:
+            self.assertEqual((await AsyncClient().get(self.url, headers=foreign)).status_code, 404)
+            self.assertEqual((await AsyncClient().get(self.url)).status_code, 401)
+        finally:
+            self.close_listener()
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def breaker(self, **options):
+        return CircuitBreaker('test', **{'minimum_calls': 4, 'window_size': 4, 'open_duration': 30.0, **options})
+
+    def call(self, breaker, failed=False):
+        with breaker.guard() as call:
+            if failed:
+                call.record_failure()
+
+    def test_concurrency_is_capped_per_process(self):
+        breaker = self.breaker(max_concurrency=2)
+        with breaker.guard(), breaker.guard():
+            with self.assertRaises(CircuitOpenError) as raised:
+                self.call(breaker)
+            self.assertEqual(raised.exception.reason, 'saturated')
+        self.call(breaker)
+        self.assertEqual(breaker.snapshot()['rejected_calls'], 1)
+
+    def test_opens_on_failures_then_probes_before_closing(self):
+        breaker = self.breaker(half_open_max_calls=1)
+        for failed in (True, False, True, False):
+            self.call(breaker, failed)
+        self.assertEqual(breaker.snapshot()['state'], 'open')
+        with self.assertRaises(CircuitOpenError):
+            self.call(breaker)
+
+        with mock.patch('payments.circuit_breaker.time.monotonic', return_value=breaker._opened_at + 31):
+            self.call(breaker)
+        self.assertEqual(breaker.snapshot()['state'], 'closed')
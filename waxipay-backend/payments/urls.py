@@ -2,13 +2,16 @@
 # payments/urls.py
 # ===========================================
 from django.urls import path
-from . import views
+from . import views, async_views
 
 app_name = 'payments'
 
 urlpatterns = [
     path('initiate/', views.initiate_payment, name='initiate'),
+    path('initiate-async/', async_views.initiate_payment_async, name='initiate-async'),
     path('ipn/', views.payment_ipn, name='ipn'),
+    path('<uuid:transaction_id>/events/', async_views.payment_events, name='events'),
     path('success/', views.payment_success, name='success'),
     path('cancel/', views.payment_cancel, name='cancel'),
+    path('provider-status/', views.provider_status, name='provider-status'),
 ]
\ No newline at end of file
@@ -1,111 +1,103 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
-from django.db import transaction as db_transaction
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from decimal import Decimal
-import uuid
+import logging
 import requests
 
-from transactions.models import Transaction
-from accounts.models import Wallet
+from .models import IpnNotification
+from .paytek_service import PaytechService
+from .paytech_client import get_client, BREAKER_NAME
+from .circuit_breaker import CircuitOpenError, get_breaker, all_breakers
+from . import idempotency, initiation
+
+logger = logging.getLogger(__name__)
+
+def _initiate(user, amount, description, idempotency_record=None):
+    """Crée la transaction en attente et la demande PayTech ; renvoie (body, status, headers)"""
+    try:
+        # Refus immédiat, avant toute écriture, si PayTech est déjà jugé en panne
+        get_breaker(BREAKER_NAME).check()
+        transaction_obj = initiation.create_pending_deposit(user, amount, description, idempotency_record)
+        paytech_data = initiation.build_paytech_payload(transaction_obj)
+        paytech_response = get_client().request_payment(paytech_data)
+    except CircuitOpenError as e:
+        return initiation.provider_unavailable(e)
+    except requests.RequestException as e:
+        logger.error(f"PayTech request error: {str(e)}")
+        return (*initiation.PAYTECH_UNREACHABLE, None)
+    
+    body, status = initiation.build_response(
+        paytech_data,
+        paytech_response.status_code,
+        paytech_response.json() if paytech_response.status_code == 200 else None,
+        paytech_response.text
+    )
+    return body, status, None
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def initiate_payment(request):
-    amount = request.data.get('amount')
-    description = request.data.get('description', 'Dépôt WaxiPay')
-    
-    if not amount:
-        return Response({'success': False, 'error': 'Montant requis'}, status=400)
-    
     try:
-        amount = Decimal(amount)
-        if amount <= 0:
-            raise ValueError()
-    except:
-        return Response({'success': False, 'error': 'Montant invalide'}, status=400)
-    
-    reference = f"WXP-{uuid.uuid4().hex[:12].upper()}"
+        amount, description = initiation.parse_request(request.data)
+        key = idempotency.get_key(request)
+    except (initiation.InitiationError, idempotency.IdempotencyError) as e:
+        return Response({'success': False, 'error': e.message}, status=e.status)
     
-    transaction_obj = Transaction.objects.create(
-        user=request.user,
-        transaction_type='deposit',
-        payment_method='wave',
-        amount=amount,
-        reference=reference,
-        description=description,
-        status='pending'
-    )
-    
-    paytech_data = {
-        'item_name': description,
-        'item_price': int(amount),
-        'currency': 'XOF',
-        'ref_command': reference,
-        'command_name': description,
-        'env': 'test',
-        'custom_field': str(transaction_obj.id),
-        'success_url': 'https://072a8319c6bb.ngrok-free.app/payments/success/',
-        'cancel_url': 'https://072a8319c6bb.ngrok-free.app/payments/cancel/',
-        'ipn_url': 'https://072a8319c6bb.ngrok-free.app/payments/ipn/',
-    }
+    if key is None:
+        body, status, headers = _initiate(request.user, amount, description)
+        return Response(body, status=status, headers=headers)
     
-    paytech_response = requests.post(
-        'https://paytech.sn/api/payment/request-payment',
-        json=paytech_data,
-        headers={
-            'API_KEY': '99b49f75593e3466ed14d78001c23b3daf797e508a455aeec1d91aa702c05f16',
-            'API_SECRET': 'a2a1f1f2c64a5ff2a353fe6f07899797faafef71228be10343ffff53cea72e37',
-            'Content-Type': 'application/json'
-        }
-    )
+    try:
+        record, replay = idempotency.wait_for_claim(
+            request.user, key, idempotency.fingerprint(amount, description)
+        )
+    except idempotency.IdempotencyError as e:
+        return Response({'success': False, 'error': e.message}, status=e.status, headers=e.headers)
     
-    if paytech_response.status_code == 200:
-        response_data = paytech_response.json()
-        return Response({
-            'payment_url': response_data.get('redirect_url'),
-            'token': response_data.get('token'),
-            'amount': paytech_data['item_price'],
-            'reference': paytech_data['ref_command']
-        })
+    if replay:
+        body, status = replay
+        return Response(body, status=status, headers=idempotency.REPLAYED)
     
-    return Response({
-        'error': 'Erreur lors de la création du paiement PayTech',
-        'details': paytech_response.text
-    }, status=500)
+    try:
+        body, status, headers = _initiate(request.user, amount, description, record)
+    except BaseException:
+        idempotency.abort(record)
+        raise
+    idempotency.complete(record, body, status)
+    return Response(body, status=status, headers=headers)
 
 
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def payment_ipn(request):
+    """Vérifie l'IPN et l'ajoute à la boîte de réception ; le règlement est fait par process_ipn_inbox"""
+    if not PaytechService.verify_ipn(request):
+        logger.warning(f"Invalid IPN signature for {request.POST.get('ref_command')}")
+        return Response({'error': 'Signature IPN invalide'}, status=403)
+    
     type_event = request.POST.get('type_event')
-    custom_field = request.POST.get('custom_field', '')
-    transaction_id = custom_field
+    ref_command = request.POST.get('ref_command')
+    if not type_event or not ref_command:
+        return Response({'error': 'type_event et ref_command requis'}, status=400)
     
-    try:
-        transaction_obj = Transaction.objects.get(id=transaction_id)
-        
-        if type_event == 'sale_complete':
-            with db_transaction.atomic():
-                transaction_obj.status = 'completed'
-                transaction_obj.completed_at = timezone.now()
-                transaction_obj.save()
-                
-                wallet = transaction_obj.user.wallet
-                wallet.balance += transaction_obj.amount
-                wallet.save()
-        
-        elif type_event == 'sale_canceled':
-            transaction_obj.status = 'cancelled'
-            transaction_obj.save()
-        
-        return Response({'message': 'IPN OK'})
-        
-    except Transaction.DoesNotExist:
-        return Response({'error': 'Transaction introuvable'}, status=404)
+    payload = {
+        key: value for key, value in request.POST.items()
+        if key not in ('api_key_sha256', 'api_secret_sha256')
+    }
+    # Un seul INSERT ... ON CONFLICT DO NOTHING : une IPN répétée est ignorée
+    IpnNotification.objects.bulk_create([
+        IpnNotification(
+            type_event=type_event,
+            ref_command=ref_command,
+            custom_field=request.POST.get('custom_field', ''),
+            payload=payload,
+        )
+    ], ignore_conflicts=True)
+    
+    return Response({'message': 'IPN OK'})
 
 
 @api_view(['GET'])
@@ -117,4 +109,15 @@ def payment_success(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def payment_cancel(request):
-    return Response({'success': False, 'message': 'Paiement annulé'})
\ No newline at end of file
+    return Response({'success': False, 'message': 'Paiement annulé'})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def provider_status(request):
+    """État des disjoncteurs des fournisseurs de paiement (supervision)"""
+    get_breaker(BREAKER_NAME)
+    return Response({
+        'success': True,
+        'data': [breaker.snapshot() for breaker in all_breakers()]
+    })
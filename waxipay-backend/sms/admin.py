@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import SMSMessage
+
+
+@admin.register(SMSMessage)
+class SMSMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'phone_number', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('phone_number',)
+    exclude = ('body',)
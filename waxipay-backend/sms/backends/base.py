@@ -0,0 +1,33 @@
+# ===========================================
+# sms/backends/base.py
+# ===========================================
+"""
+Interface des fournisseurs SMS (settings.SMS_BACKEND), sur le modèle des
+backends e-mail de Django.
+
+Un fournisseur réel (Orange SMS API, Twilio…) sous-classe BaseSMSBackend et
+envoie le lot avec son API, en un appel si elle accepte plusieurs
+destinataires. Le worker `send_sms` appelle send_messages depuis ses threads :
+l'implémentation ne doit pas partager d'état non protégé entre appels.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+
+Message = namedtuple('Message', ['id', 'phone_number', 'body'])
+
+
+class BaseSMSBackend:
+    def __init__(self, sender=None):
+        self.sender = sender or settings.SMS_SENDER
+
+    def send_messages(self, messages):
+        """
+        Envoie une liste de Message ; renvoie, dans le même ordre, None pour
+        chaque message accepté ou le texte de l'erreur. Une exception fait
+        échouer tout le lot (elle est reprogrammée).
+        """
+        raise NotImplementedError('Les sous-classes de BaseSMSBackend doivent implémenter send_messages()')
+
+    def close(self):
+        pass
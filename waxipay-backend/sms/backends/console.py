@@ -0,0 +1,16 @@
+# ===========================================
+# sms/backends/console.py
+# ===========================================
+"""Fournisseur de développement : écrit les SMS dans les logs au lieu de les envoyer"""
+import logging
+
+from .base import BaseSMSBackend
+
+logger = logging.getLogger(__name__)
+
+
+class SMSBackend(BaseSMSBackend):
+    def send_messages(self, messages):
+        for message in messages:
+            logger.info(f"SMS from {self.sender} to {message.phone_number}: {message.body}")
+        return [None] * len(messages)
@@ -0,0 +1,33 @@
+# ===========================================
+# sms/backends/locmem.py
+# ===========================================
+"""
+Faux fournisseur local pour les tests et les benchmarks : les messages
+« envoyés » s'ajoutent à `outbox`, après une latence simulée par lot
+(SMS_LOCMEM_LATENCY) ; les numéros de `failing_numbers` sont refusés.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .base import BaseSMSBackend
+
+outbox = []
+failing_numbers = set()
+_lock = threading.Lock()
+
+
+class SMSBackend(BaseSMSBackend):
+    def send_messages(self, messages):
+        if settings.SMS_LOCMEM_LATENCY:
+            time.sleep(settings.SMS_LOCMEM_LATENCY)
+        results = []
+        with _lock:
+            for message in messages:
+                if message.phone_number in failing_numbers:
+                    results.append('Numéro refusé par le fournisseur')
+                    continue
+                outbox.append(message)
+                results.append(None)
+        return results
@@ -0,0 +1,17 @@
+# ===========================================
+# sms/management/commands/purge_sms_messages.py
+# ===========================================
+from django.core.management.base import BaseCommand
+
+from sms import queue
+
+
+class Command(BaseCommand):
+    help = "Supprime les SMS envoyés ou abandonnés (à planifier, ex. chaque jour)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Ancienneté minimale en jours (défaut : SMS_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        deleted = queue.purge(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} SMS supprimés"))
@@ -0,0 +1,30 @@
+# ===========================================
+# sms/management/commands/send_sms.py
+# ===========================================
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sms import queue
+
+
+class Command(BaseCommand):
+    help = "Envoie les SMS en file au fournisseur (settings.SMS_BACKEND), par lots, jusqu'à SIGINT / SIGTERM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SMS_BATCH_SIZE,
+                            help="Messages maximum par appel au fournisseur")
+        parser.add_argument('--concurrency', type=int, default=settings.SMS_CONCURRENCY,
+                            help="Appels simultanés au fournisseur (threads)")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Scrutation de repli en secondes si un NOTIFY est manqué")
+        parser.add_argument('--once', action='store_true', help="S'arrêter une fois la file vidée")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = queue.run(options['batch_size'], options['concurrency'], options['poll_interval'], options['once'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['sent']} SMS envoyés, {stats['failed']} en échec, {stats['batches']} lots en {elapsed:.1f}s"
+        ))
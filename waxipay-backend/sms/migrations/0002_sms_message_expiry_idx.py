@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['expires_at'], name='sms_message_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# ===========================================
+# sms/models.py
+# ===========================================
+from django.db import models
+
+
+class SMSMessage(models.Model):
+    """
+    File d'envoi des SMS.
+
+    `sms.queue.send` ajoute le message et réveille le worker `send_sms`, qui
+    l'envoie par lots au fournisseur (settings.SMS_BACKEND) hors du chemin des
+    requêtes. Le texte est effacé une fois le message envoyé, abandonné ou
+    expiré (codes OTP).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échoué'),
+    ]
+
+    phone_number = models.CharField(max_length=20)
+    body = models.TextField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    # Au-delà, le message n'a plus d'intérêt (code OTP expiré) : abandonné sans envoi
+    expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'sms_messages'
+        verbose_name = 'SMS'
+        verbose_name_plural = 'SMS'
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='sms_message_due_idx'),
+            # Abandon des messages expirés (sms.queue.expire)
+            models.Index(fields=['expires_at'], condition=models.Q(status='pending'), name='sms_message_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"SMS #{self.id} → {self.phone_number} ({self.status})"
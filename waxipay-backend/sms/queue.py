@@ -0,0 +1,251 @@
+# ===========================================
+# sms/queue.py
+# ===========================================
+"""
+File d'envoi des SMS.
+
+`send` ajoute le message en base et publie un NOTIFY : la requête ne paie
+qu'une insertion, quelle que soit la lenteur du fournisseur. Le worker
+`send_sms` écoute ce canal (repli sur une scrutation toutes les
+`poll_interval` secondes) et réserve les messages dus par lots (bail
+SMS_LEASE_SECONDS, FOR UPDATE SKIP LOCKED : plusieurs threads et processus
+peuvent tourner en parallèle). Chaque lot part en un appel au fournisseur ;
+un échec est reprogrammé avec un délai exponentiel, un message expiré est
+abandonné sans envoi et son texte effacé.
+"""
+import logging
+import os
+import select
+import signal
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .backends.base import Message
+from .models import SMSMessage
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'sms_queued'
+TABLE = SMSMessage._meta.db_table
+
+
+def get_backend():
+    return import_string(settings.SMS_BACKEND)()
+
+
+def send(phone_number, body, ttl=None):
+    """Met un SMS en file ; `ttl` en secondes au-delà duquel il n'est plus envoyé"""
+    now = timezone.now()
+    message = SMSMessage.objects.create(
+        phone_number=phone_number,
+        body=body,
+        next_attempt_at=now,
+        expires_at=now + timedelta(seconds=ttl) if ttl else None,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, ''])
+    return message.id
+
+
+def claim(limit):
+    """Réserve jusqu'à `limit` messages dus, après avoir abandonné ceux qui ont expiré"""
+    now = timezone.now()
+    expire(now)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH due AS (
+                SELECT id FROM {TABLE}
+                WHERE status = 'pending' AND next_attempt_at <= %s AND (expires_at IS NULL OR expires_at > %s)
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE {TABLE} AS message SET next_attempt_at = %s
+            FROM due
+            WHERE message.id = due.id
+            RETURNING message.id, message.phone_number, message.body
+            """,
+            [now, now, limit, now + timedelta(seconds=settings.SMS_LEASE_SECONDS)],
+        )
+        return [Message(*row) for row in cursor.fetchall()]
+
+
+def expire(now=None):
+    """
+    Abandonne les messages en attente dont l'échéance est passée, qu'ils soient
+    dus ou en attente de reprise, et efface leur texte : un code OTP ne reste
+    pas en clair en base au-delà de sa validité.
+    """
+    return SMSMessage.objects.filter(status='pending', expires_at__lte=now or timezone.now()).update(
+        status='failed', body='', last_error='Expiré avant envoi'
+    )
+
+
+def record(sent_ids, failures):
+    """Enregistre les envois réussis (texte effacé) et reprogramme les échecs ({erreur: [ids]})"""
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        if sent_ids:
+            cursor.execute(
+                f"""
+                UPDATE {TABLE}
+                SET status = 'sent', body = '', sent_at = %s, attempts = attempts + 1, last_error = ''
+                WHERE id = ANY(%s)
+                """,
+                [now, sent_ids],
+            )
+        for error, message_ids in failures.items():
+            # Délai exponentiel plafonné, ±25 % d'aléa pour étaler les reprises
+            cursor.execute(
+                f"""
+                UPDATE {TABLE} SET
+                    attempts = attempts + 1,
+                    last_error = %s,
+                    status = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE 'pending' END,
+                    body = CASE WHEN attempts + 1 >= %s THEN '' ELSE body END,
+                    next_attempt_at = %s + make_interval(
+                        secs => LEAST(%s * power(2, attempts), %s) * (0.75 + random() / 2)
+                    )
+                WHERE id = ANY(%s)
+                """,
+                [
+                    error[:1000], settings.SMS_MAX_ATTEMPTS, settings.SMS_MAX_ATTEMPTS, now,
+                    settings.SMS_BACKOFF_BASE, settings.SMS_BACKOFF_MAX, message_ids,
+                ],
+            )
+
+
+def purge(days=None):
+    """Supprime les messages envoyés ou abandonnés depuis plus de `days` jours"""
+    days = settings.SMS_RETENTION_DAYS if days is None else days
+    deleted, _ = SMSMessage.objects.filter(
+        status__in=['sent', 'failed'], created_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def deliver(backend, messages):
+    """Envoie un lot au fournisseur et enregistre le résultat ; renvoie (envoyés, échecs)"""
+    try:
+        results = backend.send_messages(messages)
+    except Exception as e:
+        logger.warning(f"SMS backend error for {len(messages)} messages: {e}")
+        results = [f'{type(e).__name__}: {e}'] * len(messages)
+
+    sent_ids, failures = [], defaultdict(list)
+    for message, error in zip(messages, results):
+        if error is None:
+            sent_ids.append(message.id)
+        else:
+            failures[error].append(message.id)
+    record(sent_ids, failures)
+    return len(sent_ids), len(messages) - len(sent_ids)
+
+
+class Worker:
+    """Threads d'envoi d'un processus, réveillés par le NOTIFY de `send`"""
+
+    def __init__(self, batch_size=None, concurrency=None, poll_interval=1.0):
+        self.batch_size = batch_size or settings.SMS_BATCH_SIZE
+        self.concurrency = concurrency or settings.SMS_CONCURRENCY
+        self.poll_interval = poll_interval
+        self.stop = threading.Event()
+        self.wake = threading.Condition()
+        # Réveille le select de _listen à l'arrêt (un signal ne l'interrompt pas)
+        self.stop_reader, self.stop_writer = os.pipe()
+        self.lock = threading.Lock()
+        self.stats = {'sent': 0, 'failed': 0, 'batches': 0}
+
+    def run(self, once=False):
+        """Envoie jusqu'à `stop` (ou jusqu'à file vide avec `once`) ; renvoie les compteurs"""
+        threads = [
+            threading.Thread(target=self._work, args=(once,), name=f'sms-{i}') for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            if not once:
+                self._listen()
+        finally:
+            self.stop.set()
+            self._notify()
+            for thread in threads:
+                thread.join()
+            os.close(self.stop_reader)
+            os.close(self.stop_writer)
+        return self.stats
+
+    def _work(self, once):
+        backend = get_backend()
+        errors = 0
+        try:
+            while not self.stop.is_set():
+                try:
+                    messages = claim(self.batch_size)
+                    if messages:
+                        sent, failed = deliver(backend, messages)
+                except Exception:
+                    # Base indisponible ou connexion rompue : le lot réservé repartira
+                    # à l'expiration de son bail, le thread reprend après un délai croissant
+                    errors += 1
+                    delay = min(self.poll_interval * 2 ** errors, settings.SMS_BACKOFF_MAX)
+                    logger.exception(f"SMS worker {threading.current_thread().name} failed ({errors} in a row)")
+                    connection.close()
+                    if once:
+                        break
+                    self.stop.wait(delay)
+                    continue
+                errors = 0
+                if messages:
+                    with self.lock:
+                        self.stats['sent'] += sent
+                        self.stats['failed'] += failed
+                        self.stats['batches'] += 1
+                    continue
+                if once:
+                    break
+                with self.wake:
+                    self.wake.wait(self.poll_interval)
+        finally:
+            backend.close()
+            connections.close_all()
+
+    def shutdown(self):
+        self.stop.set()
+        os.write(self.stop_writer, b'\0')
+
+    def _notify(self):
+        with self.wake:
+            self.wake.notify_all()
+
+    def _listen(self):
+        """Réveille les threads à chaque NOTIFY de `send`, jusqu'à l'arrêt"""
+        listener = psycopg2.connect(**connections['default'].get_connection_params())
+        listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            while not self.stop.is_set():
+                if listener in select.select([listener, self.stop_reader], [], [], self.poll_interval)[0]:
+                    listener.poll()
+                    if listener.notifies:
+                        listener.notifies.clear()
+                        self._notify()
+        finally:
+            listener.close()
+
+
+def run(batch_size=None, concurrency=None, poll_interval=1.0, once=False):
+    """Point d'entrée du worker : envoie jusqu'à SIGINT / SIGTERM (ou file vide avec `once`)"""
+    worker = Worker(batch_size, concurrency, poll_interval)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: worker.shutdown())
+    return worker.run(once)
@@ -0,0 +1,139 @@
+# ===========================================
+# sms/tests.py
+# ===========================================
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .backends import locmem
+from .models import SMSMessage
+
+NUMBER = '+221770000301'
+FAILING_NUMBER = '+221770000302'
+
+
+@override_settings(
+    SMS_BACKEND='sms.backends.locmem.SMSBackend', SMS_LOCMEM_LATENCY=0,
+    SMS_MAX_ATTEMPTS=3, SMS_BACKOFF_BASE=2, SMS_BACKOFF_MAX=60,
+)
+class QueueTests(TestCase):
+    def setUp(self):
+        locmem.outbox.clear()
+        locmem.failing_numbers.clear()
+        locmem.failing_numbers.add(FAILING_NUMBER)
+        self.addCleanup(locmem.failing_numbers.clear)
+        self.backend = queue.get_backend()
+
+    def work(self):
+        """Un passage du worker `send_sms`"""
+        messages = queue.claim(10)
+        return queue.deliver(self.backend, messages) if messages else (0, 0)
+
+    def test_queued_messages_are_sent_in_one_batch(self):
+        ids = [queue.send(NUMBER, f'Message {number}') for number in range(3)]
+
+        self.assertEqual(self.work(), (3, 0))
+        self.assertEqual([message.body for message in locmem.outbox], ['Message 0', 'Message 1', 'Message 2'])
+        for message in SMSMessage.objects.filter(id__in=ids):
+            # Texte effacé après envoi : les codes OTP ne restent pas en base
+            self.assertEqual((message.status, message.body, message.attempts), ('sent', '', 1))
+            self.assertIsNotNone(message.sent_at)
+        self.assertEqual(self.work(), (0, 0))
+
+    def test_claimed_messages_are_leased(self):
+        queue.send(NUMBER, 'Bonjour')
+        self.assertEqual(len(queue.claim(10)), 1)
+        self.assertEqual(queue.claim(10), [])
+
+    def test_failures_are_retried_with_backoff_then_abandoned(self):
+        queue.send(NUMBER, 'Bonjour')
+        message_id = queue.send(FAILING_NUMBER, 'Bonjour')
+
+        before = timezone.now()
+        self.assertEqual(self.work(), (1, 1))
+        message = SMSMessage.objects.get(id=message_id)
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertEqual(message.last_error, 'Numéro refusé par le fournisseur')
+        delay = (message.next_attempt_at - before).total_seconds()
+        self.assertTrue(1.5 <= delay <= 2.5 + 1, delay)
+
+        # Pas encore dû
+        self.assertEqual(self.work(), (0, 0))
+
+        for _ in range(2):
+            SMSMessage.objects.filter(id=message_id).update(next_attempt_at=timezone.now())
+            self.assertEqual(self.work(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.body), ('failed', 3, ''))
+        self.assertEqual(len(locmem.outbox), 1)
+
+    def test_backend_error_fails_the_whole_batch(self):
+        queue.send(NUMBER, 'Bonjour')
+        with mock.patch.object(locmem.SMSBackend, 'send_messages', side_effect=ConnectionError('down')):
+            self.assertEqual(self.work(), (0, 1))
+        message = SMSMessage.objects.get()
+        self.assertEqual((message.status, message.last_error), ('pending', 'ConnectionError: down'))
+
+    def test_expired_message_is_dropped_unsent(self):
+        message_id = queue.send(NUMBER, 'Votre code : 123456', ttl=60)
+        SMSMessage.objects.filter(id=message_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.work(), (0, 0))
+        message = SMSMessage.objects.get(id=message_id)
+        self.assertEqual((message.status, message.body), ('failed', ''))
+        self.assertEqual(locmem.outbox, [])
+
+    def test_message_expiring_while_awaiting_retry_is_blanked(self):
+        message_id = queue.send(FAILING_NUMBER, 'Votre code : 123456', ttl=60)
+        self.assertEqual(self.work(), (0, 1))
+        SMSMessage.objects.filter(id=message_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        # Pas encore dû, mais son texte ne survit pas à son échéance
+        self.assertEqual(queue.claim(10), [])
+        message = SMSMessage.objects.get(id=message_id)
+        self.assertEqual((message.status, message.body, message.last_error), ('failed', '', 'Expiré avant envoi'))
+
+    def test_purge_keeps_pending_and_recent_messages(self):
+        old, recent, pending = (queue.send(NUMBER, 'Bonjour') for _ in range(3))
+        SMSMessage.objects.filter(id__in=[old, recent]).update(status='sent')
+        SMSMessage.objects.filter(id__in=[old, pending]).update(created_at=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(queue.purge(days=7), 1)
+        self.assertEqual(set(SMSMessage.objects.values_list('id', flat=True)), {recent, pending})
+
+
+@override_settings(SMS_BACKEND='sms.backends.locmem.SMSBackend', SMS_LOCMEM_LATENCY=0)
+class WorkerTests(TransactionTestCase):
+    """Le worker ferme sa connexion après une erreur : hors de la transaction d'un TestCase"""
+
+    def setUp(self):
+        locmem.outbox.clear()
+        self.worker = queue.Worker(concurrency=1, poll_interval=0.01)
+        self.addCleanup(os.close, self.worker.stop_reader)
+        self.addCleanup(os.close, self.worker.stop_writer)
+
+    def test_worker_survives_database_errors(self):
+        queue.send(NUMBER, 'Bonjour')
+        claim, calls = queue.claim, []
+
+        def flaky_claim(limit):
+            calls.append(limit)
+            if len(calls) == 1:
+                raise OperationalError('server closed the connection unexpectedly')
+            messages = claim(limit)
+            if not messages:
+                self.worker.stop.set()
+            return messages
+
+        with mock.patch.object(queue, 'claim', side_effect=flaky_claim), self.assertLogs('sms.queue', 'ERROR'):
+            self.worker._work(once=False)
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.worker.stats, {'sent': 1, 'failed': 0, 'batches': 1})
+        self.assertEqual([message.body for message in locmem.outbox], ['Bonjour'])
+        self.assertEqual(SMSMessage.objects.get().status, 'sent')
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import FeeRule
+
+
+@admin.register(FeeRule)
+class FeeRuleAdmin(admin.ModelAdmin):
+    list_display = ('transaction_type', 'payment_method', 'user_type', 'min_amount',
+                    'percentage', 'fixed_fee', 'min_fee', 'max_fee', 'is_active')
+    list_filter = ('transaction_type', 'payment_method', 'user_type', 'is_active')
@@ -0,0 +1,91 @@
+# ===========================================
+# transactions/expiry.py
+# ===========================================
+"""
+Expiration des transactions en attente abandonnées (paiements PayTech jamais finalisés).
+
+Chaque lot est un UPDATE borné sur les plus anciennes transactions en attente
+d'un moyen de paiement (index partiel transaction_pending_idx), dans sa propre
+transaction SQL courte : les lignes verrouillées par un règlement d'IPN en cours
+sont sautées (SKIP LOCKED) et reprises au balayage suivant.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from .models import Transaction
+from .signals import status_changed
+from .state_machine import Transition
+from . import rollups
+
+logger = logging.getLogger(__name__)
+
+TABLE = Transaction._meta.db_table
+
+
+def ttl_for(payment_method):
+    """Délai d'expiration (secondes) d'une transaction en attente pour ce moyen de paiement"""
+    ttls = settings.PENDING_TRANSACTION_TTL
+    return ttls.get(payment_method, ttls['default'])
+
+
+def expire_batch(payment_method, cutoff, batch_size):
+    """Expire au plus `batch_size` transactions en attente créées avant `cutoff` ; renvoie leur nombre"""
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH stale AS (
+                SELECT id, created_at FROM {TABLE}
+                WHERE status = 'pending' AND payment_method = %s AND created_at < %s
+                ORDER BY created_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE {TABLE} AS t SET status = 'expired', updated_at = %s
+            FROM stale
+            WHERE t.id = stale.id AND t.created_at = stale.created_at
+            RETURNING t.id, t.reference, t.user_id, t.transaction_type, t.amount, t.fees, t.created_at,
+                      'pending', t.status
+            """,
+            [payment_method, cutoff, batch_size, timezone.now()],
+        )
+        expired = [Transition(*row) for row in cursor.fetchall()]
+
+        deltas = []
+        for row in expired:
+            deltas.extend(rollups.status_change_deltas(row, 'pending', 'expired'))
+        rollups.apply_deltas(deltas)
+        if expired:
+            status_changed.send(sender=Transaction, transitions=expired)
+    return len(expired)
+
+
+def sweep(batch_size=None, max_batches=None):
+    """
+    Expire les transactions en attente dépassées, moyen de paiement par moyen de paiement.
+    Renvoie {moyen de paiement: nombre expiré}.
+    """
+    batch_size = batch_size or settings.PENDING_EXPIRY_BATCH_SIZE
+    started = time.monotonic()
+    counts = {}
+    for payment_method, _ in Transaction.PAYMENT_METHODS:
+        # Date de coupure fixée au début : un balayage ne court pas après les nouvelles transactions
+        cutoff = timezone.now() - timedelta(seconds=ttl_for(payment_method))
+        total, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            expired = expire_batch(payment_method, cutoff, batch_size)
+            total += expired
+            batches += 1
+            if expired < batch_size:
+                break
+        if total:
+            counts[payment_method] = total
+
+    logger.info(
+        f"Pending expiry sweep: {sum(counts.values())} expired in {time.monotonic() - started:.2f}s {counts}"
+    )
+    return counts
@@ -0,0 +1,83 @@
+# ===========================================
+# transactions/exports.py
+# ===========================================
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .serializers import TransactionReadSerializer
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_ROWS = 500
+
+EXPORT_COLUMNS = TransactionReadSerializer.fields
+
+
+class _Echo:
+    """Pseudo-fichier dont write() renvoie la ligne au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def _iter_values(queryset):
+    """Parcourt les lignes via un curseur serveur, par blocs de EXPORT_CHUNK_SIZE"""
+    tz = timezone.get_current_timezone()
+    rows = TransactionReadSerializer.select(queryset, named=False).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for row in rows:
+        yield TransactionReadSerializer.to_values(row, tz)
+
+
+def _buffered(lines):
+    """Regroupe les lignes pour éviter un write() réseau par transaction"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= EXPORT_BUFFER_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv(queryset):
+    writer = csv.writer(_Echo())
+    lines = (writer.writerow(values) for values in _iter_values(queryset))
+    yield writer.writerow(EXPORT_COLUMNS)
+    yield from _buffered(lines)
+
+
+def stream_ndjson(queryset):
+    lines = (
+        json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False) + '\n'
+        for values in _iter_values(queryset)
+    )
+    yield from _buffered(lines)
+
+
+async def aiterate(chunks):
+    """
+    Itérateur asynchrone sur un flux d'export, pour StreamingHttpResponse sous
+    ASGI : Django y lirait un itérateur synchrone en entier avant d'envoyer le
+    premier octet. Chaque bloc est produit dans le thread de la requête
+    (thread_sensitive), celui de sa connexion et de son curseur serveur.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while True:
+            chunk = await next_chunk(chunks, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        # Client parti en cours de route : le curseur serveur est fermé dans son thread
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
@@ -0,0 +1,139 @@
+# ===========================================
+# transactions/fees.py
+# ===========================================
+"""
+Grille tarifaire compilée en mémoire.
+
+Les règles FeeRule sont chargées une fois par processus en tableaux de paliers
+triés par (type, moyen de paiement, type d'utilisateur) : le calcul des frais
+d'un paiement est une recherche dichotomique, sans requête SQL. Toute
+modification d'une règle publie une nouvelle version dans le cache partagé
+(settings.CACHES) ; chaque processus la relit au plus toutes les
+FEE_SCHEDULE_CHECK_INTERVAL secondes et recompile la grille si elle a changé.
+"""
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FeeRule
+
+VERSION_KEY = 'fees:schedule_version'
+# Le franc CFA (XOF) n'a pas de subdivision : les frais sont arrondis au franc
+XOF = Decimal('1')
+ZERO = Decimal('0')
+NOT_WHOLE_FRANCS = "Montant invalide : le franc CFA n'a pas de centimes"
+
+
+class FeeSchedule:
+    def __init__(self, rules, version=None):
+        self.version = version
+        tiers = {}
+        for rule in sorted(rules, key=lambda rule: rule.min_amount):
+            key = (rule.transaction_type, rule.payment_method, rule.user_type)
+            tiers.setdefault(key, []).append((
+                rule.min_amount,
+                rule.percentage / 100,
+                rule.fixed_fee,
+                rule.min_fee,
+                rule.max_fee,
+            ))
+        # Par clé : bornes inférieures triées (pour bisect) et paliers correspondants
+        self.tiers = {key: ([tier[0] for tier in values], values) for key, values in tiers.items()}
+
+    def candidates(self, transaction_type, payment_method, user_type):
+        """Clés applicables, de la plus spécifique à la plus générale (vide = toutes)"""
+        return [
+            self.tiers[key]
+            for key in (
+                (transaction_type, payment_method, user_type),
+                (transaction_type, payment_method, ''),
+                (transaction_type, '', user_type),
+                (transaction_type, '', ''),
+                ('', payment_method, user_type),
+                ('', payment_method, ''),
+                ('', '', user_type),
+                ('', '', ''),
+            )
+            if key in self.tiers
+        ]
+
+    def compute(self, amount, transaction_type, payment_method='', user_type=''):
+        return self.compute_many([amount], transaction_type, payment_method, user_type)[0]
+
+    def compute_many(self, amounts, transaction_type, payment_method='', user_type=''):
+        """Frais de plusieurs montants de même nature : la résolution des clés est faite une fois"""
+        candidates = self.candidates(transaction_type, payment_method, user_type)
+        return [self._fee(amount, candidates) for amount in amounts]
+
+    @staticmethod
+    def _fee(amount, candidates):
+        for bounds, tiers in candidates:
+            index = bisect_right(bounds, amount) - 1
+            if index < 0:
+                continue
+            _, rate, fixed_fee, min_fee, max_fee = tiers[index]
+            fee = max(amount * rate + fixed_fee, min_fee)
+            if max_fee is not None:
+                fee = min(fee, max_fee)
+            return fee.quantize(XOF, rounding=ROUND_HALF_UP)
+        return ZERO
+
+
+_schedule = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_schedule():
+    """Grille compilée du processus, recompilée si la version partagée a changé"""
+    global _schedule, _checked_at
+    now = time.monotonic()
+    if _schedule is not None and now - _checked_at < settings.FEE_SCHEDULE_CHECK_INTERVAL:
+        return _schedule
+
+    with _lock:
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # Cache vidé ou premier démarrage : publier une version pour tous les processus
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = cache.get(VERSION_KEY)
+        if _schedule is None or version != _schedule.version:
+            _schedule = FeeSchedule(FeeRule.objects.filter(is_active=True), version)
+        _checked_at = now
+    return _schedule
+
+
+def is_whole_francs(amount):
+    """Montants saisis (dépôt, transfert, paiement groupé) : des francs entiers, comme les frais"""
+    return amount == amount.to_integral_value()
+
+
+def compute_fee(amount, transaction_type, payment_method='', user_type=''):
+    return get_schedule().compute(amount, transaction_type, payment_method, user_type)
+
+
+def compute_fees(amounts, transaction_type, payment_method='', user_type=''):
+    """Mode lot (paiements groupés)"""
+    return get_schedule().compute_many(amounts, transaction_type, payment_method, user_type)
+
+
+def invalidate():
+    """Publie une nouvelle version de la grille ; ce processus la recompile dès le prochain calcul"""
+    global _schedule
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    with _lock:
+        _schedule = None
+
+
+@receiver(post_save, sender=FeeRule)
+@receiver(post_delete, sender=FeeRule)
+def fee_rule_changed(sender, **kwargs):
+    # Après validation : un autre processus ne doit pas recompiler l'ancienne grille sous la nouvelle version
+    db_transaction.on_commit(invalidate)
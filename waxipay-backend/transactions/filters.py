@@ -0,0 +1,57 @@
+# ===========================================
+# transactions/filters.py
+# ===========================================
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def filter_transactions(queryset, query_params):
+    """Applique les filtres type / payment_method / status / date_from / date_to de l'API"""
+    transaction_type = query_params.get('type')
+    payment_method = query_params.get('payment_method')
+    status_filter = query_params.get('status')
+    date_from = query_params.get('date_from')
+    date_to = query_params.get('date_to')
+
+    if transaction_type:
+        queryset = queryset.filter(transaction_type=transaction_type)
+    if payment_method:
+        queryset = queryset.filter(payment_method=payment_method)
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    # Des bornes datetime explicites permettent à PostgreSQL d'écarter
+    # les partitions mensuelles hors de la période demandée.
+    if date_from:
+        queryset = queryset.filter(created_at__gte=_parse_bound(date_from, 'date_from'))
+    if date_to:
+        bound = _parse_bound(date_to, 'date_to')
+        if _is_date_only(date_to):
+            # Une date seule inclut toute la journée
+            queryset = queryset.filter(created_at__lt=bound + timedelta(days=1))
+        else:
+            queryset = queryset.filter(created_at__lte=bound)
+
+    return queryset
+
+
+def _is_date_only(value):
+    return len(value) == 10 and parse_date(value) is not None
+
+
+def _parse_bound(value, param):
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            parsed = datetime.combine(day, time.min)
+    except ValueError:
+        raise ValidationError({param: 'Date invalide (AAAA-MM-JJ ou ISO 8601)'})
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
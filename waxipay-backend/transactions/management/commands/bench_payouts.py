@@ -0,0 +1,51 @@
+# ===========================================
+# transactions/management/commands/bench_payouts.py
+# ===========================================
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from accounts import ledger, wallets
+from accounts.models import LedgerEntry, User, Wallet
+from transactions import payouts
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (lignes/s) d'un paiement groupé de commerçant"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=5000)
+        parser.add_argument('--recipients', type=int, default=500)
+
+    def handle(self, *args, **options):
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        merchant = User.objects.create_user(phone_number=f"{prefix}-m", full_name='Bench marchand', user_type='merchant')
+        Wallet.objects.create(user=merchant)
+        wallets.credit(merchant.id, Decimal(options['lines']) * 100, source=ledger.OPENING_BALANCE)
+
+        recipients = User.objects.bulk_create([
+            User(phone_number=f"{prefix}-{index}", full_name=f"Bench {index}", user_type='driver')
+            for index in range(options['recipients'])
+        ])
+        Wallet.objects.bulk_create([Wallet(user=user) for user in recipients])
+        lines = [
+            {'phone': recipients[index % len(recipients)].phone_number, 'amount': '25.50'}
+            for index in range(options['lines'])
+        ]
+
+        try:
+            started = time.perf_counter()
+            report = payouts.payout(merchant, lines, 'Bench')
+            elapsed = time.perf_counter() - started
+        finally:
+            accounts = [ledger.wallet_account(wallet_id) for wallet_id in
+                        Wallet.objects.filter(user__phone_number__startswith=prefix).values_list('id', flat=True)]
+            journals = LedgerEntry.objects.filter(account__in=accounts).values('journal_id')
+            LedgerEntry.objects.filter(journal_id__in=journals).delete()
+            User.objects.filter(phone_number__startswith=prefix).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['paid']} lignes payées en {elapsed:.2f}s : {report['paid'] / elapsed:.0f} lignes/s"
+        ))
@@ -0,0 +1,83 @@
+# ===========================================
+# transactions/management/commands/bench_transaction_serializers.py
+# ===========================================
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.utils import create_namedtuple_class
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import User
+from transactions.models import Transaction
+from transactions.serializers import TransactionSerializer, TransactionReadSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare le débit (lignes/s) de TransactionSerializer et TransactionReadSerializer, sans base de données"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        instances, rows = self.build_page(options['rows'])
+
+        renderer = JSONRenderer()
+        expected = renderer.render(TransactionSerializer(instances, many=True).data)
+        if renderer.render(TransactionReadSerializer.serialize_many(rows)) != expected:
+            raise CommandError("Les deux sérialiseurs ne produisent pas la même sortie")
+
+        drf = self.measure(lambda: TransactionSerializer(instances, many=True).data, options['repeat'])
+        fast = self.measure(lambda: TransactionReadSerializer.serialize_many(rows), options['repeat'])
+
+        count = len(rows)
+        self.stdout.write(f"TransactionSerializer     : {count / drf:>12,.0f} lignes/s ({drf * 1000:.1f} ms)")
+        self.stdout.write(f"TransactionReadSerializer : {count / fast:>12,.0f} lignes/s ({fast * 1000:.1f} ms)")
+        self.stdout.write(self.style.SUCCESS(f"Gain : x{drf / fast:.1f}"))
+
+    @staticmethod
+    def measure(func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    @staticmethod
+    def build_page(size):
+        """Une page d'instances (utilisateur déjà joint) et les tuples équivalents de select()"""
+        user = User(phone_number='+221770000000', full_name='Bench Commerçant')
+        row_class = create_namedtuple_class(*TransactionReadSerializer.query_fields)
+        types = [choice for choice, _ in Transaction.TRANSACTION_TYPES]
+        methods = [choice for choice, _ in Transaction.PAYMENT_METHODS]
+        statuses = [choice for choice, _ in Transaction.STATUS_CHOICES]
+        now = timezone.now()
+
+        instances, rows = [], []
+        for i in range(size):
+            transaction_obj = Transaction(
+                user=user,
+                transaction_type=types[i % len(types)],
+                payment_method=methods[i % len(methods)],
+                amount=Decimal(1000 + i).quantize(Decimal('0.01')),
+                fees=Decimal('0.00'),
+                status=statuses[i % len(statuses)],
+                reference=f"WXP-{uuid.uuid4().hex[:12].upper()}",
+                description='Paiement',
+                created_at=now,
+                completed_at=now if i % 2 else None,
+            )
+            instances.append(transaction_obj)
+            rows.append(row_class(*(
+                transaction_obj.id, user.id, user.full_name, transaction_obj.transaction_type,
+                transaction_obj.payment_method, transaction_obj.amount, transaction_obj.currency,
+                transaction_obj.fees, transaction_obj.status, transaction_obj.reference,
+                transaction_obj.external_reference, transaction_obj.recipient_phone,
+                transaction_obj.description, transaction_obj.created_at, transaction_obj.completed_at,
+            )))
+        return instances, rows
@@ -0,0 +1,82 @@
+# ===========================================
+# transactions/management/commands/bench_transfers.py
+# ===========================================
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from accounts import ledger, wallets
+from accounts.models import LedgerEntry, User, Wallet
+from transactions import transfers
+
+
+class Command(BaseCommand):
+    help = "Mesure les transferts/s entre paires d'utilisateurs qui se recouvrent, en concurrence"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--transfers', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        users = []
+        for index in range(options['users']):
+            user = User.objects.create_user(phone_number=f"{prefix}-{index}", full_name=f"Bench {index}")
+            Wallet.objects.create(user=user)
+            wallets.credit(user.id, Decimal('1000000'), source=ledger.OPENING_BALANCE)
+            users.append(user)
+        accounts = [ledger.wallet_account(user.wallet.pk) for user in users]
+        initial_total = sum(ledger.balance(account) for account in accounts)
+
+        per_thread = options['transfers'] // options['threads']
+        counters = {'ok': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker():
+            rng = random.Random()
+            try:
+                for _ in range(per_thread):
+                    sender, recipient = rng.sample(users, 2)
+                    try:
+                        transfers.transfer(sender, recipient.phone_number, Decimal('1'))
+                        outcome = 'ok'
+                    except transfers.TransferError:
+                        outcome = 'rejected'
+                    except DatabaseError as e:
+                        self.stderr.write(str(e))
+                        outcome = 'errors'
+                    with lock:
+                        counters[outcome] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        final_total = sum(ledger.balance(account) for account in accounts)
+        try:
+            journals = LedgerEntry.objects.filter(account__in=accounts).values('journal_id')
+            LedgerEntry.objects.filter(journal_id__in=journals).delete()
+        finally:
+            User.objects.filter(phone_number__startswith=prefix).delete()
+
+        self.stdout.write(
+            f"{counters['ok']} transferts en {elapsed:.1f}s entre {len(users)} utilisateurs "
+            f"({options['threads']} threads) : {counters['ok'] / elapsed:.0f} transferts/s, "
+            f"{counters['rejected']} refusés, {counters['errors']} erreurs SQL (interblocages…)"
+        )
+        if final_total != initial_total:
+            self.stderr.write(self.style.ERROR(f"Total des soldes modifié : {initial_total} -> {final_total}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Total des soldes conservé"))
@@ -0,0 +1,31 @@
+# ===========================================
+# transactions/management/commands/expire_pending_transactions.py
+# ===========================================
+import time
+
+from django.core.management.base import BaseCommand
+
+from transactions import expiry
+
+
+class Command(BaseCommand):
+    help = "Expire les transactions en attente abandonnées, par lots bornés (à planifier ou avec --interval)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Transactions expirées par UPDATE")
+        parser.add_argument('--max-batches', type=int, help="Lots maximum par moyen de paiement et par passage")
+        parser.add_argument('--interval', type=float, help="Répéter toutes les N secondes (tâche de fond)")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            counts = expiry.sweep(options['batch_size'], options['max_batches'])
+            detail = ', '.join(f"{method}: {count}" for method, count in counts.items())
+            self.stdout.write(self.style.SUCCESS(
+                f"{sum(counts.values())} transactions expirées en {time.monotonic() - started:.2f}s"
+                + (f" ({detail})" if detail else '')
+            ))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,62 @@
+# ===========================================
+# transactions/management/commands/manage_transaction_partitions.py
+# ===========================================
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from transactions import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Crée à l'avance les partitions mensuelles de la table transactions "
+        "et archive celles qui dépassent la durée de rétention"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=3,
+            help="Nombre de mois futurs à préparer (défaut : 3)",
+        )
+        parser.add_argument(
+            '--retain', type=int, default=None,
+            help="Nombre de mois conservés dans la table active ; les plus anciens sont archivés",
+        )
+        parser.add_argument(
+            '--archive-schema', default='archive',
+            help="Schéma recevant les partitions détachées (défaut : archive)",
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Le partitionnement nécessite PostgreSQL")
+
+        current_month = timezone.now().date().replace(day=1)
+        existing = set(partitions.list_partitions())
+
+        for offset in range(options['ahead'] + 1):
+            month = partitions.add_months(current_month, offset)
+            if month in existing:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"[dry-run] création de {partitions.partition_name(month)}")
+            else:
+                name = partitions.create_partition(month)
+                self.stdout.write(self.style.SUCCESS(f"Partition {name} créée"))
+
+        if options['retain'] is None:
+            return
+        if options['retain'] < 1:
+            raise CommandError("--retain doit être au moins 1")
+
+        oldest_kept = partitions.add_months(current_month, -(options['retain'] - 1))
+        for month in sorted(existing):
+            if month >= oldest_kept:
+                break
+            if options['dry_run']:
+                self.stdout.write(f"[dry-run] archivage de {partitions.partition_name(month)}")
+            else:
+                name = partitions.archive_partition(month, options['archive_schema'])
+                self.stdout.write(self.style.SUCCESS(f"Partition archivée dans {name}"))
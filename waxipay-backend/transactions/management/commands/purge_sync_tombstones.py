@@ -0,0 +1,14 @@
+# ===========================================
+# transactions/management/commands/purge_sync_tombstones.py
+# ===========================================
+from django.core.management.base import BaseCommand
+
+from transactions import sync
+
+
+class Command(BaseCommand):
+    help = "Supprime les tombstones de synchronisation plus anciens que la durée de vie des jetons (à planifier, ex. chaque jour)"
+
+    def handle(self, *args, **options):
+        deleted = sync.purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} tombstones supprimés"))
@@ -0,0 +1,20 @@
+# ===========================================
+# transactions/management/commands/rebuild_transaction_rollups.py
+# ===========================================
+from django.core.management.base import BaseCommand
+
+from transactions import rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats journaliers des transactions (backfill ou réparation)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='users', metavar='USER_ID',
+            help="Limiter le recalcul à cet utilisateur (option répétable)",
+        )
+
+    def handle(self, *args, **options):
+        buckets = rollups.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(f"{buckets} agrégats recalculés"))
@@ -0,0 +1,104 @@
+from datetime import date
+
+from django.db import migrations
+
+# Les index reprennent les noms générés par Django dans 0001_initial pour que
+# l'état des migrations reste cohérent avec la base.
+INDEXES = [
+    'CREATE INDEX transaction_created_cf5536_idx ON transactions (created_at DESC)',
+    'CREATE INDEX transaction_user_id_ced08a_idx ON transactions (user_id, created_at DESC)',
+    'CREATE INDEX transaction_referen_c33c6b_idx ON transactions (reference)',
+    'CREATE INDEX transaction_status_505a2f_idx ON transactions (status)',
+    'CREATE INDEX transactions_reference_4f5021e8_like ON transactions (reference varchar_pattern_ops)',
+    'CREATE INDEX transactions_user_id_766cc893 ON transactions (user_id)',
+]
+
+USER_FK = (
+    'ALTER TABLE transactions ADD CONSTRAINT transactions_user_id_766cc893_fk_users_id '
+    'FOREIGN KEY (user_id) REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED'
+)
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT date_trunc('month', MIN(created_at))::date, "
+            "date_trunc('month', now())::date FROM transactions"
+        )
+        first_month, current_month = cursor.fetchone()
+
+        cursor.execute(
+            'CREATE TABLE transactions_partitioned '
+            '(LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute('CREATE TABLE transactions_default PARTITION OF transactions_partitioned DEFAULT')
+
+        month = first_month or current_month
+        last_month = _add_months(current_month, MONTHS_AHEAD)
+        while month <= last_month:
+            upper = _add_months(month, 1)
+            cursor.execute(
+                f'CREATE TABLE transactions_p{month:%Y%m} PARTITION OF transactions_partitioned '
+                'FOR VALUES FROM (%s) TO (%s)',
+                [month, upper],
+            )
+            month = upper
+
+        cursor.execute('INSERT INTO transactions_partitioned SELECT * FROM transactions')
+        cursor.execute('DROP TABLE transactions')
+        cursor.execute('ALTER TABLE transactions_partitioned RENAME TO transactions')
+
+        # La clé de partition doit figurer dans toute contrainte d'unicité :
+        # (reference, created_at) n'empêche pas deux transactions de mois
+        # différents de partager une référence. L'unicité globale est tenue
+        # par la table transaction_references (migration 0009).
+        cursor.execute('ALTER TABLE transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (id, created_at)')
+        cursor.execute(
+            'ALTER TABLE transactions ADD CONSTRAINT transactions_reference_key '
+            'UNIQUE (reference, created_at)'
+        )
+        cursor.execute(USER_FK)
+        for statement in INDEXES:
+            cursor.execute(statement)
+
+
+def unpartition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE transactions_unpartitioned '
+            '(LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute('INSERT INTO transactions_unpartitioned SELECT * FROM transactions')
+        cursor.execute('DROP TABLE transactions CASCADE')
+        cursor.execute('ALTER TABLE transactions_unpartitioned RENAME TO transactions')
+
+        cursor.execute('ALTER TABLE transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (id)')
+        cursor.execute('ALTER TABLE transactions ADD CONSTRAINT transactions_reference_key UNIQUE (reference)')
+        cursor.execute(USER_FK)
+        for statement in INDEXES:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_transactiondailyrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
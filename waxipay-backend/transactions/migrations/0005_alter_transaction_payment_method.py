@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_transaction_user_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='payment_method',
+            field=models.CharField(choices=[('wave', 'Wave'), ('orange_money', 'Orange Money'), ('free_money', 'Free Money'), ('bank_card', 'Carte Bancaire'), ('wallet', 'Portefeuille WaxiPay')], max_length=20),
+        ),
+    ]
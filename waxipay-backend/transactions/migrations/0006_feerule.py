@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:26
+
+from django.db import migrations, models
+import django.db.models.functions.math
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_alter_transaction_payment_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeeRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(blank=True, choices=[('payment_in', 'Paiement reçu'), ('payment_out', 'Paiement envoyé'), ('withdrawal', 'Retrait'), ('deposit', 'Dépôt')], max_length=20)),
+                ('payment_method', models.CharField(blank=True, choices=[('wave', 'Wave'), ('orange_money', 'Orange Money'), ('free_money', 'Free Money'), ('bank_card', 'Carte Bancaire'), ('wallet', 'Portefeuille WaxiPay')], max_length=20)),
+                ('user_type', models.CharField(blank=True, choices=[('driver', 'Chauffeur'), ('merchant', 'Commerçant'), ('deliverer', 'Livreur'), ('individual', 'Particulier')], max_length=20)),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('percentage', models.DecimalField(decimal_places=3, default=0.0, max_digits=5)),
+                ('fixed_fee', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('min_fee', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('max_fee', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Règle de frais',
+                'verbose_name_plural': 'Règles de frais',
+                'db_table': 'fee_rules',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feerule',
+            constraint=models.UniqueConstraint(fields=('transaction_type', 'payment_method', 'user_type', 'min_amount'), name='fee_rule_tier_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='feerule',
+            constraint=models.CheckConstraint(check=models.Q(('fixed_fee', django.db.models.functions.math.Floor('fixed_fee')), ('min_fee', django.db.models.functions.math.Floor('min_fee')), models.Q(('max_fee__isnull', True), ('max_fee', django.db.models.functions.math.Floor('max_fee')), _connector='OR')), name='fee_rule_whole_francs'),
+        ),
+    ]
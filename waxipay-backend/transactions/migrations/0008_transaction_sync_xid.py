@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:16
+
+from django.db import migrations, models
+
+# xid de la transaction PostgreSQL qui écrit la ligne (xid8 ramené en bigint).
+# Les lignes antérieures gardent 0 : visibles dans tout instantané, elles ne
+# sont servies qu'à une resynchronisation complète.
+SYNC_XID_COLUMN = 'ALTER TABLE transactions ADD COLUMN sync_xid bigint NOT NULL DEFAULT 0'
+
+SYNC_TRIGGERS = """
+CREATE FUNCTION transactions_stamp_sync_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.sync_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_sync_xid BEFORE INSERT OR UPDATE ON transactions
+FOR EACH ROW EXECUTE FUNCTION transactions_stamp_sync_xid();
+
+-- waxipay.moving_rows : lignes déplacées d'une partition à l'autre (transactions/partitions.py), pas supprimées
+CREATE FUNCTION transactions_record_tombstone() RETURNS trigger AS $$
+BEGIN
+    IF coalesce(current_setting('waxipay.moving_rows', true), '') <> 'on' THEN
+        INSERT INTO transaction_tombstones (transaction_id, user_id, sync_xid, deleted_at)
+        VALUES (OLD.id, OLD.user_id, pg_current_xact_id()::text::bigint, now());
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_tombstone AFTER DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION transactions_record_tombstone();
+"""
+
+DROP_SYNC_TRIGGERS = """
+DROP TRIGGER transactions_tombstone ON transactions;
+DROP FUNCTION transactions_record_tombstone();
+DROP TRIGGER transactions_sync_xid ON transactions;
+DROP FUNCTION transactions_stamp_sync_xid();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_transaction_expired_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.UUIDField()),
+                ('user_id', models.UUIDField()),
+                ('sync_xid', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Transaction supprimée',
+                'verbose_name_plural': 'Transactions supprimées',
+                'db_table': 'transaction_tombstones',
+            },
+        ),
+        # Défaut conservé en base : les INSERT en SQL brut n'ont pas à nommer la colonne
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(SYNC_XID_COLUMN, 'ALTER TABLE transactions DROP COLUMN sync_xid'),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='transaction',
+                    name='sync_xid',
+                    field=models.BigIntegerField(default=0, editable=False),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'sync_xid', 'id'], name='transaction_user_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactiontombstone',
+            index=models.Index(fields=['user_id', 'sync_xid', 'transaction_id'], name='transaction_tombstone_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactiontombstone',
+            index=models.Index(fields=['deleted_at'], name='transaction_tombstone_age_idx'),
+        ),
+        migrations.RunSQL(SYNC_TRIGGERS, DROP_SYNC_TRIGGERS),
+    ]
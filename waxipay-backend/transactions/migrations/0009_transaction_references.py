@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+# Les partitions déjà archivées (détachées) ne sont pas reprises : leurs
+# références ont été générées avant cette table et ne sont plus servies.
+BACKFILL = 'INSERT INTO transaction_references (reference) SELECT reference FROM transactions'
+
+# Les triggers d'une table partitionnée sont clonés sur chaque partition attachée.
+# Un doublon lève unique_violation (IntegrityError) et annule l'écriture entière.
+REFERENCE_TRIGGERS = """
+CREATE FUNCTION transactions_reserve_reference() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM transaction_references WHERE reference = OLD.reference;
+    END IF;
+    INSERT INTO transaction_references (reference) VALUES (NEW.reference);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_reference AFTER INSERT ON transactions
+FOR EACH ROW EXECUTE FUNCTION transactions_reserve_reference();
+
+CREATE TRIGGER transactions_reference_change AFTER UPDATE OF reference ON transactions
+FOR EACH ROW WHEN (OLD.reference IS DISTINCT FROM NEW.reference)
+EXECUTE FUNCTION transactions_reserve_reference();
+
+-- waxipay.moving_rows : lignes déplacées d'une partition à l'autre (transactions/partitions.py)
+CREATE FUNCTION transactions_release_reference() RETURNS trigger AS $$
+BEGIN
+    IF coalesce(current_setting('waxipay.moving_rows', true), '') <> 'on' THEN
+        DELETE FROM transaction_references WHERE reference = OLD.reference;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_reference_release AFTER DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION transactions_release_reference();
+"""
+
+DROP_REFERENCE_TRIGGERS = """
+DROP TRIGGER transactions_reference_release ON transactions;
+DROP FUNCTION transactions_release_reference();
+DROP TRIGGER transactions_reference_change ON transactions;
+DROP TRIGGER transactions_reference ON transactions;
+DROP FUNCTION transactions_reserve_reference();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_transaction_sync_xid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionReference',
+            fields=[
+                ('reference', models.CharField(max_length=100, primary_key=True, serialize=False)),
+            ],
+            options={
+                'verbose_name': 'Référence de transaction',
+                'verbose_name_plural': 'Références de transaction',
+                'db_table': 'transaction_references',
+            },
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunSQL(REFERENCE_TRIGGERS, DROP_REFERENCE_TRIGGERS),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_transaction_references'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_user_updated_idx',
+        ),
+    ]
@@ -2,9 +2,13 @@
 # transactions/models.py
 # ===========================================
 from django.db import models
+from django.db.models.functions import Floor
 from accounts.models import User
 import uuid
 
+# La table est partitionnée par mois sur created_at (migration 0003) :
+# la clé primaire réelle est (id, created_at), les clés étrangères vers
+# Transaction doivent donc être déclarées avec db_constraint=False.
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
         ('payment_in', 'Paiement reçu'),
@@ -19,6 +23,7 @@ class Transaction(models.Model):
         ('completed', 'Complété'),
         ('failed', 'Échoué'),
         ('cancelled', 'Annulé'),
+        ('expired', 'Expiré'),
     ]
     
     PAYMENT_METHODS = [
@@ -26,6 +31,7 @@ class Transaction(models.Model):
         ('orange_money', 'Orange Money'),
         ('free_money', 'Free Money'),
         ('bank_card', 'Carte Bancaire'),
+        ('wallet', 'Portefeuille WaxiPay'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -38,6 +44,8 @@ class Transaction(models.Model):
     fees = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Unicité globale tenue par transaction_references (TransactionReference) :
+    # la contrainte sur la table partitionnée ne porte que sur (reference, created_at)
     reference = models.CharField(max_length=100, unique=True, db_index=True)
     external_reference = models.CharField(max_length=255, null=True, blank=True)
     
@@ -48,6 +56,10 @@ class Transaction(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
+    # Identifiant (xid) de la transaction PostgreSQL qui a écrit la ligne en
+    # dernier, posé par trigger (migration 0008) : curseur de transactions/sync.py
+    sync_xid = models.BigIntegerField(default=0, editable=False)
+    
     class Meta:
         db_table = 'transactions'
         ordering = ['-created_at']
@@ -58,7 +70,120 @@ class Transaction(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['reference']),
             models.Index(fields=['status']),
+            # Curseur de synchronisation (transactions/sync.py) et ETag (waxipay_backend/conditional.py)
+            models.Index(fields=['user', 'sync_xid', 'id'], name='transaction_user_sync_idx'),
+            # Balayage des transactions en attente abandonnées (transactions/expiry.py)
+            models.Index(
+                fields=['payment_method', 'created_at'],
+                condition=models.Q(status='pending'),
+                name='transaction_pending_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_transaction_type_display()} - {self.amount} {self.currency} ({self.get_status_display()})"
+
+class TransactionTombstone(models.Model):
+    """Transaction supprimée, écrite par trigger et signalée aux clients de synchronisation"""
+    transaction_id = models.UUIDField()
+    user_id = models.UUIDField()
+    sync_xid = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'transaction_tombstones'
+        verbose_name = 'Transaction supprimée'
+        verbose_name_plural = 'Transactions supprimées'
+        indexes = [
+            models.Index(fields=['user_id', 'sync_xid', 'transaction_id'], name='transaction_tombstone_sync_idx'),
+            models.Index(fields=['deleted_at'], name='transaction_tombstone_age_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.transaction_id} supprimée le {self.deleted_at}"
+
+class TransactionReference(models.Model):
+    """
+    Référence réservée par une transaction, écrite par trigger dans la même
+    transaction que la ligne (migration 0009). Table non partitionnée : sa clé
+    primaire rend reference unique sur toutes les partitions, archivées comprises.
+    """
+    reference = models.CharField(max_length=100, primary_key=True)
+    
+    class Meta:
+        db_table = 'transaction_references'
+        verbose_name = 'Référence de transaction'
+        verbose_name_plural = 'Références de transaction'
+    
+    def __str__(self):
+        return self.reference
+
+class TransactionDailyRollup(models.Model):
+    """Agrégats journaliers par utilisateur, type et statut, tenus à jour à chaque changement de statut"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transaction_rollups')
+    day = models.DateField()
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    status = models.CharField(max_length=20, choices=Transaction.STATUS_CHOICES)
+    
+    total_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0.00)
+    count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'transaction_daily_rollups'
+        verbose_name = 'Agrégat journalier'
+        verbose_name_plural = 'Agrégats journaliers'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'transaction_type', 'status'],
+                name='transaction_rollup_bucket_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.transaction_type}/{self.status}: {self.total_amount} ({self.count})"
+
+
+class FeeRule(models.Model):
+    """
+    Palier de la grille tarifaire : s'applique à partir de `min_amount` pour le
+    type, le moyen de paiement et le type d'utilisateur donnés (vide = tous).
+    Frais = montant × percentage / 100 + fixed_fee, bornés par min_fee / max_fee.
+    Compilée en mémoire par transactions/fees.py.
+    """
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES, blank=True)
+    payment_method = models.CharField(max_length=20, choices=Transaction.PAYMENT_METHODS, blank=True)
+    user_type = models.CharField(max_length=20, choices=User.USER_TYPES, blank=True)
+    min_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    
+    percentage = models.DecimalField(max_digits=5, decimal_places=3, default=0.000)
+    fixed_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    min_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    max_fee = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'fee_rules'
+        verbose_name = 'Règle de frais'
+        verbose_name_plural = 'Règles de frais'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['transaction_type', 'payment_method', 'user_type', 'min_amount'],
+                name='fee_rule_tier_uniq'
+            ),
+            # Le franc CFA n'a pas de subdivision : frais fixes et bornes en francs entiers
+            models.CheckConstraint(
+                check=(
+                    models.Q(fixed_fee=Floor('fixed_fee')) & models.Q(min_fee=Floor('min_fee'))
+                    & (models.Q(max_fee__isnull=True) | models.Q(max_fee=Floor('max_fee')))
+                ),
+                name='fee_rule_whole_francs'
+            ),
         ]
     
     def __str__(self):
-        return f"{self.get_transaction_type_display()} - {self.amount} {self.currency} ({self.get_status_display()})"
\ No newline at end of file
+        scope = '/'.join(value or '*' for value in (self.transaction_type, self.payment_method, self.user_type))
+        return f"{scope} ≥ {self.min_amount} : {self.percentage}% + {self.fixed_fee}"
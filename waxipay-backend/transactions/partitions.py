@@ -0,0 +1,90 @@
+# ===========================================
+# transactions/partitions.py
+# ===========================================
+import re
+from datetime import date
+
+from django.db import connection, transaction as db_transaction
+
+from .models import Transaction
+
+PARENT_TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_PATTERN = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month:%Y%m}'
+
+
+def list_partitions():
+    """Mois (1er du mois) des partitions mensuelles attachées, triés"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    months = []
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_partition(month):
+    """
+    Crée la partition du mois donné.
+    Les lignes déjà tombées dans la partition par défaut pour ce mois y sont
+    déplacées avant l'attachement, sans quoi PostgreSQL refuserait la partition.
+    """
+    name = partition_name(month)
+    upper = add_months(month, 1)
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        # Déplacement, pas suppression : pas de tombstone de synchronisation ni de
+        # référence à libérer (migrations 0008 et 0009)
+        cursor.execute("SET LOCAL waxipay.moving_rows = 'on'")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE created_at >= %s AND created_at < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            [month, upper],
+        )
+        # SET LOCAL dure jusqu'à la fin de la transaction englobante, pas du bloc atomic
+        cursor.execute("SET LOCAL waxipay.moving_rows = 'off'")
+        cursor.execute(
+            f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+            [month, upper],
+        )
+    return name
+
+
+def archive_partition(month, schema):
+    """Détache la partition du mois et la déplace dans le schéma d'archive"""
+    name = partition_name(month)
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {connection.ops.quote_name(schema)}')
+        cursor.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}')
+        cursor.execute(f'ALTER TABLE {name} SET SCHEMA {connection.ops.quote_name(schema)}')
+    return f'{schema}.{name}'
@@ -0,0 +1,177 @@
+# ===========================================
+# transactions/payouts.py
+# ===========================================
+"""
+Paiements groupés d'un marchand vers ses chauffeurs et livreurs.
+
+Un lot de milliers de lignes (téléphone, montant) est réglé dans une seule
+transaction SQL avec un nombre constant de requêtes : une pour résoudre les
+destinataires, une pour verrouiller le portefeuille du marchand, puis des
+INSERT groupés pour les transactions, les écritures du grand livre et les agrégats.
+"""
+from decimal import Decimal, InvalidOperation
+import uuid
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from accounts import ledger, wallets
+from accounts.models import User
+from .models import Transaction
+from .signals import status_changed
+from .state_machine import Transition
+from .transfers import TransferError, new_reference
+from . import fees, rollups
+
+# Seuls les chauffeurs et livreurs peuvent être payés par lot
+RECIPIENT_TYPES = ('driver', 'deliverer')
+
+
+class NothingPayable(TransferError):
+    """Aucune ligne du lot n'est payable ; `lines` porte le rapport des rejets"""
+
+    def __init__(self, lines):
+        super().__init__('Aucun paiement valide dans le lot')
+        self.lines = lines
+
+
+def parse_lines(lines):
+    """Valide les lignes ; renvoie [(numéro, téléphone, montant ou None, erreur ou None)]"""
+    if not isinstance(lines, list) or not lines:
+        raise TransferError('Liste de paiements requise')
+    if len(lines) > settings.PAYOUT_MAX_LINES:
+        raise TransferError(f'{settings.PAYOUT_MAX_LINES} paiements maximum par lot')
+
+    parsed = []
+    for number, line in enumerate(lines, start=1):
+        if not isinstance(line, dict):
+            parsed.append((number, None, None, 'Ligne invalide'))
+            continue
+        phone = str(line.get('phone') or '').strip()
+        try:
+            amount = Decimal(str(line.get('amount')))
+            if not amount.is_finite() or amount <= 0:
+                raise ValueError()
+        except (InvalidOperation, ValueError):
+            parsed.append((number, phone, None, 'Montant invalide'))
+            continue
+        if not fees.is_whole_francs(amount):
+            parsed.append((number, phone, None, fees.NOT_WHOLE_FRANCS))
+            continue
+        if not phone:
+            parsed.append((number, phone, amount, 'Numéro de téléphone requis'))
+            continue
+        parsed.append((number, phone, amount, None))
+    return parsed
+
+
+def payout(merchant, lines, description=''):
+    """
+    Règle les lignes valides du lot, toutes ou aucune (solde insuffisant).
+    Renvoie le rapport par ligne ; lève NothingPayable si aucune ligne n'est valide.
+    """
+    parsed = parse_lines(lines)
+
+    phones = {phone for _, phone, _, error in parsed if not error}
+    recipients = {
+        phone: (user_id, wallet_id, user_type)
+        for phone, user_id, wallet_id, user_type in User.objects.filter(
+            phone_number__in=phones, is_active=True, wallet__is_active=True
+        ).values_list('phone_number', 'id', 'wallet__id', 'user_type')
+    }
+
+    results, payable = [], []
+    for number, phone, amount, error in parsed:
+        if not error:
+            recipient = recipients.get(phone)
+            if recipient is None:
+                error = 'Destinataire introuvable'
+            elif recipient[0] == merchant.pk:
+                error = 'Impossible de se payer soi-même'
+            elif recipient[2] not in RECIPIENT_TYPES:
+                error = 'Destinataire non éligible : chauffeurs et livreurs uniquement'
+        if error:
+            results.append({'line': number, 'phone': phone, 'amount': _str(amount), 'status': 'rejected', 'error': error})
+        else:
+            payable.append((number, phone, amount, *recipient[:2]))
+
+    if not payable:
+        raise NothingPayable(results)
+
+    # Mode lot de la grille tarifaire : une seule résolution pour tout le lot
+    line_fees = fees.compute_fees(
+        [amount for _, _, amount, _, _ in payable], 'payment_out', 'wallet', merchant.user_type
+    )
+    total = sum((amount for _, _, amount, _, _ in payable), Decimal('0'))
+    total_fees = sum(line_fees, Decimal('0'))
+
+    with db_transaction.atomic():
+        merchant_wallet = wallets.lock_for_debit([merchant.pk]).get(merchant.pk)
+        if merchant_wallet is None or not merchant_wallet.is_active:
+            raise TransferError('Portefeuille inactif')
+        balance = ledger.wallet_balance(merchant_wallet.pk)
+        if balance < total + total_fees:
+            raise TransferError(
+                f'Solde insuffisant : {_str(total + total_fees)} requis, {_str(balance)} disponible'
+            )
+
+        now = timezone.now()
+        day = timezone.localdate(now)
+        merchant_account = ledger.wallet_account(merchant_wallet.pk)
+        rows, legs, deltas, transitions = [], [], [], []
+        for (_, phone, amount, user_id, wallet_id), fee in zip(payable, line_fees):
+            outgoing = Transition(uuid.uuid4(), new_reference(), merchant.pk, 'payment_out', amount, fee, now, None, 'completed')
+            incoming = Transition(uuid.uuid4(), new_reference(), user_id, 'payment_in', amount, 0, now, None, 'completed')
+            transitions += [outgoing, incoming]
+            for transaction_obj in (outgoing, incoming):
+                rows.append((
+                    transaction_obj.id, transaction_obj.user_id, transaction_obj.transaction_type,
+                    transaction_obj.amount, transaction_obj.fees, transaction_obj.reference,
+                    phone, description, now, now, now,
+                ))
+            legs.append((merchant_account, -(amount + fee), outgoing.id))
+            legs.append((ledger.wallet_account(wallet_id), amount, incoming.id))
+            deltas.append((merchant.pk, day, 'payment_out', 'completed', amount, 1))
+            deltas.append((user_id, day, 'payment_in', 'completed', amount, 1))
+        if total_fees:
+            legs.append((ledger.FEES_REVENUE, total_fees))
+
+        # Plusieurs milliers de lignes : INSERT multi-lignes direct, sans instances de modèle
+        with connection.cursor() as cursor:
+            execute_values(
+                cursor.cursor,
+                f"""
+                INSERT INTO {Transaction._meta.db_table}
+                    (id, user_id, transaction_type, amount, fees, reference, recipient_phone, description,
+                     created_at, updated_at, completed_at, payment_method, currency, status)
+                VALUES %s
+                """,
+                rows,
+                template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'wallet', 'XOF', 'completed')",
+                page_size=settings.PAYOUT_BATCH_SIZE,
+            )
+        if legs:
+            ledger.post(legs, description=description)
+        rollups.apply_deltas(deltas)
+        status_changed.send(sender=Transaction, transitions=transitions)
+
+    for (number, phone, amount, _, _), outgoing in zip(payable, transitions[::2]):
+        results.append({
+            'line': number, 'phone': phone, 'amount': _str(amount), 'fees': _str(outgoing.fees),
+            'status': 'paid', 'reference': outgoing.reference,
+        })
+    results.sort(key=lambda result: result['line'])
+
+    return {
+        'paid': len(payable),
+        'rejected': len(results) - len(payable),
+        'total': _str(total),
+        'total_fees': _str(total_fees),
+        'lines': results,
+    }
+
+
+def _str(amount):
+    return None if amount is None else f'{amount:.2f}'
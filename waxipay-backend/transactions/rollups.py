@@ -0,0 +1,114 @@
+# ===========================================
+# transactions/rollups.py
+# ===========================================
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from .models import Transaction, TransactionDailyRollup
+
+ROLLUP_TABLE = TransactionDailyRollup._meta.db_table
+
+
+def record_created(*transaction_objs):
+    """Comptabilise des transactions nouvellement créées dans leurs agrégats (un seul INSERT)"""
+    apply_deltas([_delta(obj, obj.status, 1) for obj in transaction_objs])
+
+
+def record_status_change(transaction_obj, old_status, new_status):
+    """Déplace une transaction de l'agrégat de son ancien statut vers le nouveau"""
+    apply_deltas(status_change_deltas(transaction_obj, old_status, new_status))
+
+
+def status_change_deltas(transaction_obj, old_status, new_status):
+    """Deltas d'un changement de statut, à regrouper avec d'autres dans un seul apply_deltas"""
+    if old_status == new_status:
+        return []
+    return [
+        _delta(transaction_obj, old_status, -1),
+        _delta(transaction_obj, new_status, 1),
+    ]
+
+
+def _delta(transaction_obj, status, sign):
+    return (
+        transaction_obj.user_id,
+        timezone.localdate(transaction_obj.created_at),
+        transaction_obj.transaction_type,
+        status,
+        sign * transaction_obj.amount,
+        sign,
+    )
+
+
+def apply_deltas(deltas):
+    """
+    Applique des deltas (user_id, day, type, statut, montant, nombre)
+    en un seul INSERT ... ON CONFLICT DO UPDATE.
+    Les clés sont fusionnées puis triées pour que deux écritures
+    concurrentes verrouillent les lignes dans le même ordre.
+    """
+    merged = defaultdict(lambda: [Decimal('0'), 0])
+    for user_id, day, transaction_type, status, amount, count in deltas:
+        bucket = merged[(user_id, day, transaction_type, status)]
+        bucket[0] += amount
+        bucket[1] += count
+
+    rows = [
+        (*key, amount, count)
+        for key, (amount, count) in sorted(merged.items(), key=lambda item: tuple(map(str, item[0])))
+        if amount or count
+    ]
+    if not rows:
+        return
+
+    now = timezone.now()
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+    params = [value for row in rows for value in (*row, now)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {ROLLUP_TABLE}
+                (user_id, day, transaction_type, status, total_amount, count, updated_at)
+            VALUES {placeholders}
+            ON CONFLICT (user_id, day, transaction_type, status) DO UPDATE SET
+                total_amount = {ROLLUP_TABLE}.total_amount + EXCLUDED.total_amount,
+                count = {ROLLUP_TABLE}.count + EXCLUDED.count,
+                updated_at = EXCLUDED.updated_at
+            """,
+            params,
+        )
+
+
+def rebuild(user_ids=None):
+    """Recalcule les agrégats depuis la table transactions (tous les utilisateurs ou une sélection)"""
+    transactions_table = Transaction._meta.db_table
+    user_filter = ''
+    params = [settings.TIME_ZONE, timezone.now()]
+    if user_ids:
+        user_filter = 'WHERE user_id = ANY(%s::uuid[])'
+        params.append([str(user_id) for user_id in user_ids])
+
+    with db_transaction.atomic():
+        rollups = TransactionDailyRollup.objects.all()
+        if user_ids:
+            rollups = rollups.filter(user_id__in=user_ids)
+        rollups.delete()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {ROLLUP_TABLE}
+                    (user_id, day, transaction_type, status, total_amount, count, updated_at)
+                SELECT user_id, (created_at AT TIME ZONE %s)::date, transaction_type, status,
+                       SUM(amount), COUNT(*), %s
+                FROM {transactions_table}
+                {user_filter}
+                GROUP BY 1, 2, 3, 4
+                """,
+                params,
+            )
+            return cursor.rowcount
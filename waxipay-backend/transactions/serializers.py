@@ -2,7 +2,9 @@
 # transactions/serializers.py
 # ===========================================
 from rest_framework import serializers
+from django.utils import timezone
 from .models import Transaction
+from . import fees
 
 class TransactionSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.full_name', read_only=True)
@@ -24,4 +26,78 @@ class TransactionSerializer(serializers.ModelSerializer):
                            'external_reference', 'created_at', 'completed_at']
     
     def get_amount_formatted(self, obj):
-        return f"{obj.amount:,.0f}".replace(',', ' ')
\ No newline at end of file
+        return f"{obj.amount:,.0f}".replace(',', ' ')
+
+class TransferSerializer(serializers.Serializer):
+    recipient_phone = serializers.CharField(max_length=20)
+    amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=1)
+    description = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+    def validate_amount(self, value):
+        if not fees.is_whole_francs(value):
+            raise serializers.ValidationError(fees.NOT_WHOLE_FRANCS)
+        return value
+
+class TransactionReadSerializer:
+    """
+    Chemin de lecture rapide (liste, détail, export).
+    
+    Produit la même sortie que TransactionSerializer à partir des tuples
+    de `select()` : une seule requête (jointure sur l'utilisateur), aucune
+    instance de modèle ni champ DRF par ligne, libellés lus dans des tables
+    précalculées.
+    """
+    fields = TransactionSerializer.Meta.fields
+    query_fields = (
+        'id', 'user_id', 'user__full_name', 'transaction_type', 'payment_method',
+        'amount', 'currency', 'fees', 'status', 'reference', 'external_reference',
+        'recipient_phone', 'description', 'created_at', 'completed_at',
+    )
+    
+    transaction_type_labels = dict(Transaction.TRANSACTION_TYPES)
+    payment_method_labels = dict(Transaction.PAYMENT_METHODS)
+    status_labels = dict(Transaction.STATUS_CHOICES)
+    
+    @classmethod
+    def select(cls, queryset, named=True):
+        """Restreint le queryset aux seules colonnes nécessaires"""
+        return queryset.values_list(*cls.query_fields, named=named)
+    
+    @classmethod
+    def to_values(cls, row, tz=None):
+        """Valeurs d'une ligne dans l'ordre de `fields`"""
+        (pk, user_id, user_name, transaction_type, payment_method, amount, currency,
+         fees, status, reference, external_reference, recipient_phone, description,
+         created_at, completed_at) = row
+        tz = tz or timezone.get_current_timezone()
+        return (
+            str(pk), str(user_id), user_name,
+            transaction_type, cls.transaction_type_labels.get(transaction_type, transaction_type),
+            payment_method, cls.payment_method_labels.get(payment_method, payment_method),
+            f"{amount:f}", f"{amount:,.0f}".replace(',', ' '),
+            currency, f"{fees:f}",
+            status, cls.status_labels.get(status, status),
+            reference, external_reference, recipient_phone, description,
+            _format_datetime(created_at, tz), _format_datetime(completed_at, tz),
+        )
+    
+    @classmethod
+    def to_representation(cls, row, tz=None):
+        return dict(zip(cls.fields, cls.to_values(row, tz)))
+    
+    @classmethod
+    def serialize_many(cls, rows):
+        tz = timezone.get_current_timezone()
+        fields = cls.fields
+        to_values = cls.to_values
+        return [dict(zip(fields, to_values(row, tz))) for row in rows]
+
+
+def _format_datetime(value, tz):
+    """Même rendu ISO 8601 que serializers.DateTimeField"""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
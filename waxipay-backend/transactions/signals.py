@@ -0,0 +1,9 @@
+# ===========================================
+# transactions/signals.py
+# ===========================================
+from django.dispatch import Signal
+
+# Envoyé dans la transaction SQL qui change le statut, une fois par lot :
+# transitions = [state_machine.Transition] (old_status None pour une transaction
+# créée directement dans son statut final : virement, paiement groupé).
+status_changed = Signal()
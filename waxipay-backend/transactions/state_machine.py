@@ -0,0 +1,100 @@
+# ===========================================
+# transactions/state_machine.py
+# ===========================================
+"""
+Transitions de statut des transactions : pending → processing → completed / failed / cancelled.
+Une transaction en attente abandonnée passe à expired (transactions/expiry.py) ;
+un paiement confirmé après coup la fait encore passer à completed.
+
+Chaque transition est un seul UPDATE conditionnel (compare-and-swap) qui
+n'écrit que les colonnes modifiées et ne réussit que si le statut courant
+l'autorise : deux notifications concurrentes ne peuvent pas l'appliquer deux fois.
+"""
+from collections import namedtuple
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Transaction
+
+TABLE = Transaction._meta.db_table
+
+# Statut cible -> statuts depuis lesquels la transition est permise
+ALLOWED_TRANSITIONS = {
+    'processing': ('pending',),
+    'completed': ('pending', 'processing', 'expired'),
+    'failed': ('pending', 'processing'),
+    'cancelled': ('pending', 'processing'),
+    'expired': ('pending',),
+}
+
+# Colonnes supplémentaires qu'une transition peut renseigner
+EXTRA_FIELDS = ('external_reference', 'fees')
+
+Transition = namedtuple('Transition', [
+    'id', 'reference', 'user_id', 'transaction_type', 'amount', 'fees', 'created_at',
+    'old_status', 'status',
+])
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def transition(transaction_id, status, reference=None, **fields):
+    """
+    Fait passer la transaction au statut `status` si son statut courant le permet.
+
+    Renvoie un Transition (avec l'ancien statut) si la transition a gagné, None
+    sinon (transaction absente, déjà terminée ou modifiée par une requête concurrente).
+    L'appelant met à jour les agrégats (rollups.status_change_deltas) dans la même transaction SQL.
+    """
+    if status not in ALLOWED_TRANSITIONS:
+        raise InvalidTransition(f"Statut cible invalide : {status}")
+    unknown = set(fields) - set(EXTRA_FIELDS)
+    if unknown:
+        raise InvalidTransition(f"Champs non modifiables par une transition : {', '.join(sorted(unknown))}")
+
+    now = timezone.now()
+    assignments = {'status': status, 'updated_at': now}
+    if status == 'completed':
+        assignments['completed_at'] = now
+    assignments.update(fields)
+
+    set_clause = ', '.join(f'{column} = %s' for column in assignments)
+    conditions = ['id = %s', 'status = ANY(%s)']
+    params = [transaction_id, list(ALLOWED_TRANSITIONS[status])]
+    if reference is not None:
+        conditions.append('reference = %s')
+        params.append(reference)
+
+    # FOR UPDATE dans la CTE : une transition concurrente attend puis réévalue
+    # la condition sur le statut, elle ne peut donc pas gagner une seconde fois.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH locked AS (
+                SELECT id, created_at, status FROM {TABLE}
+                WHERE {' AND '.join(conditions)}
+                FOR UPDATE
+            )
+            UPDATE {TABLE} AS t SET {set_clause}
+            FROM locked
+            WHERE t.id = locked.id AND t.created_at = locked.created_at
+            RETURNING t.id, t.reference, t.user_id, t.transaction_type, t.amount, t.fees, t.created_at,
+                      locked.status, t.status
+            """,
+            [*params, *assignments.values()],
+        )
+        row = cursor.fetchone()
+
+    return Transition(*row) if row else None
+
+
+def created(transaction_obj):
+    """Transition d'une transaction créée directement dans son statut (pour signals.status_changed)"""
+    return Transition(
+        transaction_obj.id, transaction_obj.reference, transaction_obj.user_id,
+        transaction_obj.transaction_type, transaction_obj.amount, transaction_obj.fees,
+        transaction_obj.created_at, None, transaction_obj.status,
+    )
@@ -0,0 +1,151 @@
+# ===========================================
+# transactions/sync.py
+# ===========================================
+"""
+Synchronisation incrémentale du cache mobile des transactions.
+
+Chaque ligne porte le xid de la dernière transaction PostgreSQL qui l'a
+écrite (sync_xid, posé par trigger) ; une suppression laisse une
+TransactionTombstone avec le xid de la transaction qui l'a faite. Un tour de
+synchronisation est borné par deux instantanés PostgreSQL (pg_snapshot) : il
+sert les écritures validées dans le second et pas dans le premier. L'ordre des
+validations est donc celui de la base, quelle que soit la durée des
+transactions d'écriture : une transaction encore en cours au début du tour
+sera servie au tour suivant, jamais sautée.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from waxipay_backend.snapshots import current_snapshot, snapshot_bounds
+from .models import TransactionTombstone
+from .serializers import TransactionReadSerializer
+
+SYNC_TOKEN_SALT = 'transactions.sync'
+SYNC_PAGE_SIZE = 200
+
+# Les jetons plus anciens que cette durée (ou que la rétention des partitions)
+# déclenchent une resynchronisation complète côté mobile. Les tombstones plus
+# anciens sont purgés (purge_tombstones).
+SYNC_TOKEN_MAX_AGE = getattr(settings, 'TRANSACTION_SYNC_TOKEN_MAX_AGE', timedelta(days=30))
+
+
+class SyncReset(Exception):
+    """Le jeton est absent, invalide ou trop ancien : le client repart de zéro"""
+
+
+def make_token(user, since, until=None, changes_after=None, deleted_after=None):
+    """
+    `since` : instantané déjà synchronisé (None : tout l'historique) ; en cours
+    de pagination, `until` borne le tour et `changes_after` / `deleted_after`
+    sont les derniers (xid, id) servis.
+    """
+    return signing.dumps(
+        {
+            'u': str(user.pk),
+            's': since,
+            't': until,
+            'c': _cursor(changes_after),
+            'd': _cursor(deleted_after),
+        },
+        salt=SYNC_TOKEN_SALT,
+        compress=True,
+    )
+
+
+def _cursor(position):
+    return [position[0], str(position[1])] if position else None
+
+
+def read_token(user, token):
+    try:
+        payload = signing.loads(token, salt=SYNC_TOKEN_SALT, max_age=SYNC_TOKEN_MAX_AGE)
+        if payload['u'] != str(user.pk):
+            raise SyncReset()
+        since, until = payload['s'], payload['t']
+        for snapshot in (since, until):
+            if snapshot is not None:
+                snapshot_bounds(snapshot)
+        changes_after, deleted_after = (
+            (int(position[0]), uuid.UUID(position[1])) if position else None
+            for position in (payload['c'], payload['d'])
+        )
+    except (signing.BadSignature, KeyError, TypeError, ValueError, IndexError):
+        raise SyncReset()
+    return since, until, changes_after, deleted_after
+
+
+def in_round(queryset, since, until, after, key='pk'):
+    """Lignes écrites par une transaction validée dans `until` et pas dans `since`, après le curseur (xid, key)"""
+    column = f'{connection.ops.quote_name(queryset.model._meta.db_table)}.sync_xid'
+    _, until_max = snapshot_bounds(until)
+    queryset = queryset.filter(sync_xid__lt=until_max)
+    condition, params = f'pg_visible_in_snapshot({column}::text::xid8, %s::pg_snapshot)', [until]
+    if since is not None:
+        # Tout xid inférieur au xmin de `since` y était déjà validé (ou annulé)
+        queryset = queryset.filter(sync_xid__gte=snapshot_bounds(since)[0])
+        condition += f' AND NOT pg_visible_in_snapshot({column}::text::xid8, %s::pg_snapshot)'
+        params.append(since)
+    if after is not None:
+        queryset = queryset.filter(Q(sync_xid__gt=after[0]) | Q(sync_xid=after[0], **{f'{key}__gt': after[1]}))
+    return queryset.alias(
+        in_round=RawSQL(condition, params, output_field=BooleanField())
+    ).filter(in_round=True).order_by('sync_xid', key)
+
+
+def changes_since(user, queryset, token=None, page_size=SYNC_PAGE_SIZE):
+    """
+    Transactions créées ou modifiées et identifiants supprimés depuis le jeton.
+
+    Renvoie (reset, lignes sérialisées, ids supprimés, has_more, jeton suivant).
+    Sans jeton valide, l'historique complet est renvoyé page par page avec
+    reset=True. Le client applique les suppressions après les lignes.
+    """
+    reset = False
+    since, until, changes_after, deleted_after = None, None, None, None
+    if token:
+        try:
+            since, until, changes_after, deleted_after = read_token(user, token)
+        except SyncReset:
+            reset = True
+    else:
+        reset = True
+    if until is None:
+        until = current_snapshot()
+
+    fields = TransactionReadSerializer.query_fields
+    rows = list(
+        in_round(queryset, since, until, changes_after)
+        .values_list(*fields, 'sync_xid', named=True)[:page_size + 1]
+    )
+    deleted = list(
+        in_round(TransactionTombstone.objects.filter(user_id=user.pk), since, until, deleted_after,
+                 key='transaction_id')
+        .values_list('sync_xid', 'transaction_id')[:page_size + 1]
+    )
+    has_more = len(rows) > page_size or len(deleted) > page_size
+    rows, deleted = rows[:page_size], deleted[:page_size]
+
+    if has_more:
+        next_token = make_token(
+            user, since, until,
+            (rows[-1].sync_xid, rows[-1].id) if rows else changes_after,
+            deleted[-1] if deleted else deleted_after,
+        )
+    else:
+        next_token = make_token(user, until)
+
+    changes = TransactionReadSerializer.serialize_many(row[:len(fields)] for row in rows)
+    return reset, changes, [str(transaction_id) for _, transaction_id in deleted], has_more, next_token
+
+
+def purge_tombstones(max_age=SYNC_TOKEN_MAX_AGE):
+    """Supprime les tombstones que plus aucun jeton valide ne peut réclamer"""
+    deleted, _ = TransactionTombstone.objects.filter(deleted_at__lt=timezone.now() - max_age).delete()
+    return deleted
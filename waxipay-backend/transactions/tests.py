@@ -1,3 +1,692 @@
-from django.test import TestCase
+# ===========================================
+# transactions/tests.py
+# ===========================================
+import json
+import threading
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connection, transaction as db_transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils.timezone import localdate, now
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts import ledger, wallets
+from accounts.models import Wallet
+from waxipay_backend.testing import api_client, balance, make_user
+from . import exports, expiry, fees, partitions, rollups, state_machine, sync
+from .models import FeeRule, Transaction, TransactionDailyRollup, TransactionReference, TransactionTombstone
+from .signals import status_changed
+
+
+class FeeScheduleTests(SimpleTestCase):
+    def schedule(self, *rules):
+        # Les défauts du modèle sont des float : règles telles que relues en base
+        zero = {'min_amount': fees.ZERO, 'percentage': fees.ZERO, 'fixed_fee': fees.ZERO, 'min_fee': fees.ZERO}
+        return fees.FeeSchedule([FeeRule(**{**zero, **rule}) for rule in rules])
+
+    def test_fees_are_rounded_half_up_to_the_franc(self):
+        schedule = self.schedule({'percentage': Decimal('1.5')})
+        self.assertEqual(schedule.compute(Decimal('1033'), 'deposit'), Decimal('15'))   # 15,495
+        self.assertEqual(schedule.compute(Decimal('1100'), 'deposit'), Decimal('17'))   # 16,5
+        self.assertEqual(schedule.compute(Decimal('1099'), 'deposit'), Decimal('16'))   # 16,485
+
+    def test_min_and_max_fee_bound_the_rounded_fee(self):
+        schedule = self.schedule({'percentage': Decimal('1'), 'min_fee': Decimal('50'), 'max_fee': Decimal('500')})
+        self.assertEqual(schedule.compute(Decimal('100'), 'deposit'), Decimal('50'))
+        self.assertEqual(schedule.compute(Decimal('10000'), 'deposit'), Decimal('100'))
+        self.assertEqual(schedule.compute(Decimal('1000000'), 'deposit'), Decimal('500'))
+
+    def test_tier_and_most_specific_rule_win(self):
+        schedule = self.schedule(
+            {'fixed_fee': Decimal('10')},
+            {'transaction_type': 'payment_out', 'percentage': Decimal('1')},
+            {'transaction_type': 'payment_out', 'min_amount': Decimal('5000'), 'percentage': Decimal('2')},
+            {'transaction_type': 'payment_out', 'user_type': 'merchant', 'fixed_fee': Decimal('1')},
+        )
+        self.assertEqual(schedule.compute(Decimal('1000'), 'deposit'), Decimal('10'))
+        self.assertEqual(schedule.compute(Decimal('1000'), 'payment_out', 'wallet', 'driver'), Decimal('10'))
+        self.assertEqual(schedule.compute(Decimal('6000'), 'payment_out', 'wallet', 'driver'), Decimal('120'))
+        self.assertEqual(schedule.compute(Decimal('6000'), 'payment_out', 'wallet', 'merchant'), Decimal('1'))
+
+    def test_batch_mode_matches_single_computation(self):
+        schedule = self.schedule({'percentage': Decimal('0.75'), 'fixed_fee': Decimal('2')})
+        amounts = [Decimal('1'), Decimal('333'), Decimal('12345')]
+        self.assertEqual(
+            schedule.compute_many(amounts, 'payment_out'),
+            [schedule.compute(amount, 'payment_out') for amount in amounts],
+        )
+
+    def test_no_rule_means_no_fee(self):
+        self.assertEqual(self.schedule().compute(Decimal('1000'), 'deposit'), Decimal('0'))
+
+
+class FeeTestCase(TestCase):
+    """Grille de 1 % sur les paiements sortants par portefeuille"""
+
+    def setUp(self):
+        FeeRule.objects.create(transaction_type='payment_out', payment_method='wallet', percentage=Decimal('1'))
+        # Le signal recompile après validation, ce que TestCase ne fait jamais
+        fees.invalidate()
+        self.addCleanup(fees.invalidate)
+
+
+class WholeFrancTests(FeeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.merchant = make_user('+221770000030', 'merchant', balance=10000)
+        self.driver = make_user('+221770000031', 'driver')
+
+    def test_transfer_amount_has_no_centimes(self):
+        response = api_client(self.merchant).post(
+            '/api/transactions/transfer/', {'recipient_phone': self.driver.phone_number, 'amount': '100.50'},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['amount'], [fees.NOT_WHOLE_FRANCS])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_payout_line_has_no_centimes(self):
+        response = api_client(self.merchant).post('/api/transactions/payouts/', {'lines': [
+            {'phone': self.driver.phone_number, 'amount': '100.50'},
+            {'phone': self.driver.phone_number, 'amount': '100.00'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        lines = response.data['data']['lines']
+        self.assertEqual((lines[0]['status'], lines[0]['error']), ('rejected', fees.NOT_WHOLE_FRANCS))
+        self.assertEqual((lines[1]['status'], lines[1]['fees']), ('paid', '1.00'))
+        self.assertEqual(balance(self.merchant), Decimal('9899'))
+
+    def test_fee_rule_amounts_are_whole_francs(self):
+        with self.assertRaises(IntegrityError):
+            FeeRule.objects.create(transaction_type='deposit', fixed_fee=Decimal('2.50'))
+
+
+class PartitionTests(TestCase):
+    """Mois lointains : les lignes tombent dans la partition par défaut"""
+
+    def setUp(self):
+        self.user = make_user('+221770000040')
+
+    def create(self, reference, month=None):
+        transaction_obj = Transaction.objects.create(
+            user=self.user, transaction_type='deposit', payment_method='wave', amount=100, reference=reference,
+        )
+        if month:
+            Transaction.objects.filter(pk=transaction_obj.pk).update(
+                created_at=datetime(month.year, month.month, 15, tzinfo=timezone.utc),
+            )
+        return transaction_obj
+
+    def count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {table}')
+            return cursor.fetchone()[0]
+
+    def test_reference_is_unique_across_partitions(self):
+        self.create('DUP-1', month=date(2031, 1, 1))
+        with self.assertRaises(IntegrityError), db_transaction.atomic():
+            self.create('DUP-1')
+
+    def test_deleted_transaction_releases_its_reference(self):
+        self.create('FREE-1').delete()
+        self.assertFalse(TransactionReference.objects.filter(reference='FREE-1').exists())
+        self.create('FREE-1')
+
+    def test_create_partition_moves_default_rows(self):
+        month = date(2031, 1, 1)
+        transaction_obj = self.create('MOVE-1', month=month)
+        self.assertEqual(self.count(partitions.DEFAULT_PARTITION), 1)
+        tombstones = TransactionTombstone.objects.count()
+
+        name = partitions.create_partition(month)
+
+        self.assertIn(month, partitions.list_partitions())
+        self.assertEqual((self.count(partitions.DEFAULT_PARTITION), self.count(name)), (0, 1))
+        self.assertTrue(Transaction.objects.filter(pk=transaction_obj.pk).exists())
+        # Un déplacement n'est ni une suppression pour la synchronisation ni une référence libérée
+        self.assertEqual(TransactionTombstone.objects.count(), tombstones)
+        self.assertTrue(TransactionReference.objects.filter(reference='MOVE-1').exists())
+
+    def test_archive_partition_keeps_references_reserved(self):
+        month = date(2031, 2, 1)
+        partitions.create_partition(month)
+        self.create('ARCH-1', month=month)
+
+        archived = partitions.archive_partition(month, 'transactions_archive_test')
+
+        self.assertEqual(archived, f'transactions_archive_test.{partitions.partition_name(month)}')
+        self.assertNotIn(month, partitions.list_partitions())
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(self.count(archived), 1)
+        with self.assertRaises(IntegrityError), db_transaction.atomic():
+            self.create('ARCH-1')
+
+
+class ConditionalGetTests(TransactionTestCase):
+    """Les ETags sont des instantanés PostgreSQL : écritures réellement validées"""
+
+    def setUp(self):
+        self.user = make_user('+221770000050', balance=1000)
+        self.client = api_client(self.user)
+
+    def create(self, reference):
+        return Transaction.objects.create(
+            user=self.user, transaction_type='deposit', payment_method='wave', amount=100, reference=reference,
+        )
+
+    def get(self, etag=None, path='/api/transactions/'):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(path)
+
+    def test_not_modified_until_a_write(self):
+        self.create('ETAG-1')
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+        self.assertEqual(self.get('W/"forged"').status_code, 200)
+
+        self.create('ETAG-2')
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(self.get(response['ETag']).status_code, 304)
+
+    def test_delete_is_a_change(self):
+        self.create('ETAG-1')
+        doomed = self.create('ETAG-2')
+        etag = self.get()['ETag']
+
+        doomed.delete()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_out_of_order_commit_is_a_change(self):
+        # Une transaction ouverte avant une autre, validée après elle : son
+        # updated_at est plus ancien que celui de la réponse déjà servie
+        written, release = threading.Event(), threading.Event()
+
+        def slow_writer():
+            try:
+                with db_transaction.atomic():
+                    self.create('SLOW-1')
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=slow_writer)
+        thread.start()
+        self.assertTrue(written.wait(10))
+        try:
+            self.create('FAST-1')
+            response = self.get()
+            self.assertEqual([row['reference'] for row in response.data['results']], ['FAST-1'])
+        finally:
+            release.set()
+            thread.join()
+
+        response = self.get(response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_etag_is_bound_to_user_and_url(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag, '/api/transactions/?status=completed').status_code, 200)
+        other = api_client(make_user('+221770000051'))
+        self.assertEqual(other.get('/api/transactions/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stats_follow_balance_and_day(self):
+        etag = self.get(path='/api/transactions/stats/')['ETag']
+        self.assertEqual(self.get(etag, '/api/transactions/stats/').status_code, 304)
+
+        wallets.credit(self.user.pk, Decimal('10'))
+        response = self.get(etag, '/api/transactions/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['wallet_balance'], 1010.0)
+
+        etag = response['ETag']
+        with mock.patch('transactions.views.timezone.localdate', return_value=date(2031, 1, 1)):
+            self.assertEqual(self.get(etag, '/api/transactions/stats/').status_code, 200)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = make_user('+221770000060')
+        for index, status in enumerate(['completed', 'pending', 'completed']):
+            Transaction.objects.create(
+                user=self.user, transaction_type='deposit', payment_method='wave', amount=100 * (index + 1),
+                status=status, reference=f'EXP-{index}',
+            )
+        Transaction.objects.create(
+            user=make_user('+221770000061'), transaction_type='deposit', payment_method='wave', amount=1,
+            reference='EXP-OTHER',
+        )
+
+    def test_csv_streams_the_filtered_history(self):
+        response = api_client(self.user).get('/api/transactions/export/', {'status': 'completed'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), list(exports.EXPORT_COLUMNS))
+        reference_at = exports.EXPORT_COLUMNS.index('reference')
+        self.assertEqual([line.split(',')[reference_at] for line in lines[1:]], ['EXP-2', 'EXP-0'])
+
+    def test_ndjson_one_object_per_line(self):
+        response = api_client(self.user).get('/api/transactions/export/', {'output': 'ndjson'})
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['reference'] for row in rows], ['EXP-2', 'EXP-1', 'EXP-0'])
+        self.assertEqual(rows[0]['amount'], '300.00')
+
+    def test_unknown_format(self):
+        self.assertEqual(api_client(self.user).get('/api/transactions/export/', {'output': 'xml'}).status_code, 400)
+
+    async def test_asgi_streams_an_async_iterator(self):
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.user)))()
+        response = await self.async_client.get(
+            '/api/transactions/export/', {'output': 'ndjson'}, headers={'Authorization': f'Bearer {token}'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user('+221770000070')
+        self.client = api_client(self.user)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, transaction_type='deposit', payment_method='wave', amount=index + 1,
+                        reference=f'PAGE-{index}')
+            for index in range(45)
+        ])
+        # Ex-aequo sur created_at : le départage se fait sur id
+        tied = Transaction.objects.order_by('reference').values_list('pk', flat=True)[:10]
+        Transaction.objects.filter(pk__in=list(tied)).update(created_at=datetime(2026, 1, 5, tzinfo=timezone.utc))
+
+    def test_cursor_pages_cover_every_row_once_in_order(self):
+        params, seen, pages = {'pagination': 'cursor'}, [], 0
+        while True:
+            data = self.client.get('/api/transactions/', params).data
+            self.assertNotIn('count', data)
+            seen += [row['id'] for row in data['results']]
+            pages += 1
+            if not data['next_cursor']:
+                break
+            params = {'cursor': data['next_cursor']}
+
+        self.assertEqual(pages, 3)
+        expected = Transaction.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('pk', flat=True)
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+    def test_next_link_keeps_filters(self):
+        data = self.client.get('/api/transactions/', {'pagination': 'cursor', 'status': 'pending'}).data
+        self.assertIn('status=pending', data['next'])
+        self.assertIn(f"cursor={data['next_cursor']}", data['next'])
+
+    def test_page_numbers_are_unchanged_without_cursor(self):
+        data = self.client.get('/api/transactions/', {'page': 3}).data
+        self.assertEqual((data['count'], len(data['results'])), (45, 5))
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'MjAyNi0wMS0wNXxub3QtYS11dWlk'):
+            self.assertEqual(self.client.get('/api/transactions/', {'cursor': cursor}).status_code, 404)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = make_user('+221770000080')
+
+    def create(self, transaction_type, amount, status='pending', **fields):
+        transaction_obj = Transaction.objects.create(
+            user=self.user, transaction_type=transaction_type, payment_method='wave',
+            amount=Decimal(amount), status=status,
+            reference=f'ROLLUP-{Transaction.objects.count()}', **fields
+        )
+        rollups.record_created(transaction_obj)
+        return transaction_obj
+
+    def buckets(self, user=None):
+        return set(
+            TransactionDailyRollup.objects.filter(user=user or self.user)
+            .values_list('day', 'transaction_type', 'status', 'total_amount', 'count')
+        )
+
+    def test_incremental_rollups_match_rebuild(self):
+        deposit = self.create('deposit', '1000')
+        self.create('deposit', '500')
+        self.create('payment_out', '300', status='completed')
+        Transaction.objects.filter(pk=deposit.pk).update(status='completed')
+        rollups.record_status_change(deposit, 'pending', 'completed')
+        rollups.record_status_change(deposit, 'completed', 'completed')
+
+        today = localdate(deposit.created_at)
+        incremental = self.buckets()
+        self.assertIn((today, 'deposit', 'completed', Decimal('1000'), 1), incremental)
+        self.assertIn((today, 'deposit', 'pending', Decimal('500'), 1), incremental)
+
+        rollups.rebuild()
+        self.assertEqual(self.buckets(), incremental)
+
+    def test_apply_deltas_merges_keys_and_skips_empty_buckets(self):
+        day = date(2026, 3, 1)
+        rollups.apply_deltas([
+            (self.user.pk, day, 'deposit', 'pending', Decimal('100'), 1),
+            (self.user.pk, day, 'deposit', 'pending', Decimal('-100'), -1),
+            (self.user.pk, day, 'deposit', 'completed', Decimal('100'), 1),
+            (self.user.pk, day, 'deposit', 'completed', Decimal('50'), 1),
+        ])
+        self.assertEqual(self.buckets(), {(day, 'deposit', 'completed', Decimal('150'), 2)})
+
+    def test_rebuild_only_touches_selected_users(self):
+        other = make_user('+221770000081')
+        self.create('deposit', '1000')
+        TransactionDailyRollup.objects.filter(user=self.user).update(count=99)
+        Transaction.objects.create(
+            user=other, transaction_type='deposit', payment_method='wave', amount=700, reference='ROLLUP-OTHER'
+        )
+
+        rollups.rebuild([self.user.pk])
+
+        self.assertEqual([bucket[4] for bucket in self.buckets()], [1])
+        self.assertFalse(self.buckets(other))
+
+    def test_stats_read_rollups(self):
+        self.create('payment_in', '2000', status='completed')
+        self.create('payment_out', '300', status='completed')
+        self.create('withdrawal', '200', status='completed')
+        self.create('deposit', '5000')
+
+        data = api_client(self.user).get('/api/transactions/stats/').data['data']
+
+        self.assertEqual((data['total_received'], data['total_sent']), (2000.0, 500.0))
+        self.assertEqual(data['month_transactions'], 3)
+        self.assertEqual([day['count'] for day in data['weekly_data']], [3])
+
+
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.deposit = Transaction.objects.create(
+            user=make_user('+221770000090'), transaction_type='deposit', payment_method='wave',
+            amount=1000, reference='CAS-1',
+        )
+
+    def test_allowed_transitions_report_the_previous_status(self):
+        processing = state_machine.transition(self.deposit.pk, 'processing')
+        completed = state_machine.transition(self.deposit.pk, 'completed', external_reference='tok-1', fees=15)
+
+        self.assertEqual((processing.old_status, processing.status), ('pending', 'processing'))
+        self.assertEqual((completed.old_status, completed.fees), ('processing', Decimal('15')))
+        self.deposit.refresh_from_db()
+        self.assertEqual((self.deposit.status, self.deposit.external_reference), ('completed', 'tok-1'))
+        self.assertIsNotNone(self.deposit.completed_at)
+
+    def test_second_terminal_transition_loses(self):
+        self.assertIsNotNone(state_machine.transition(self.deposit.pk, 'completed'))
+        self.assertIsNone(state_machine.transition(self.deposit.pk, 'failed'))
+        self.assertIsNone(state_machine.transition(self.deposit.pk, 'completed'))
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.status, 'completed')
+
+    def test_reference_must_match(self):
+        self.assertIsNone(state_machine.transition(self.deposit.pk, 'completed', reference='CAS-2'))
+        self.assertIsNotNone(state_machine.transition(self.deposit.pk, 'completed', reference='CAS-1'))
+
+    def test_invalid_status_or_fields(self):
+        with self.assertRaises(state_machine.InvalidTransition):
+            state_machine.transition(self.deposit.pk, 'pending')
+        with self.assertRaises(state_machine.InvalidTransition):
+            state_machine.transition(self.deposit.pk, 'completed', amount=1)
+
+
+class ConcurrentTransitionTests(TransactionTestCase):
+    """Deux notifications simultanées : la seconde attend le verrou puis perd"""
+
+    def test_concurrent_transition_loses_after_the_winner_commits(self):
+        deposit = Transaction.objects.create(
+            user=make_user('+221770000091'), transaction_type='deposit', payment_method='wave',
+            amount=1000, reference='CAS-3',
+        )
+        results = []
+
+        def cancel():
+            try:
+                results.append(state_machine.transition(deposit.pk, 'cancelled'))
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=cancel)
+        with db_transaction.atomic():
+            self.assertIsNotNone(state_machine.transition(deposit.pk, 'completed'))
+            thread.start()
+            thread.join(0.3)
+            self.assertTrue(thread.is_alive())
+        thread.join(10)
+
+        self.assertEqual(results, [None])
+        deposit.refresh_from_db()
+        self.assertEqual(deposit.status, 'completed')
+
+
+class SyncTests(TransactionTestCase):
+    """Les tours de synchronisation reposent sur les instantanés PostgreSQL : écritures réellement validées"""
+
+    def setUp(self):
+        self.user = make_user('+221770000020')
+        self.client = api_client(self.user)
+
+    def create(self, amount):
+        return Transaction.objects.create(
+            user=self.user, transaction_type='deposit', payment_method='wave',
+            amount=amount, reference=f'SYNC-{amount}',
+        )
+
+    def drain(self, token=None):
+        changes, deleted = [], []
+        while True:
+            data = self.client.get('/api/transactions/sync/', {'since': token} if token else {}).data
+            changes += [change['id'] for change in data['changes']]
+            deleted += data['deleted']
+            token = data['sync_token']
+            if not data['has_more']:
+                return token, changes, deleted
+
+    def test_rounds_serve_changes_and_deletions_once(self):
+        first, second = self.create(100), self.create(200)
+        token, changes, deleted = self.drain()
+        self.assertEqual(sorted(changes), sorted([str(first.pk), str(second.pk)]))
+
+        first.status = 'completed'
+        first.save()
+        third = self.create(300)
+        deleted_id = str(second.pk)
+        second.delete()
+        token, changes, deleted = self.drain(token)
+        self.assertEqual(sorted(changes), sorted([str(first.pk), str(third.pk)]))
+        self.assertEqual(deleted, [deleted_id])
+
+        self.assertEqual(self.drain(token)[1:], ([], []))
+
+    def test_pagination_covers_every_row(self):
+        created = {str(self.create(amount).pk) for amount in range(1, 8)}
+        queryset = Transaction.objects.filter(user=self.user)
+        token, changes, pages = None, [], 0
+        while True:
+            _, page, _, has_more, token = sync.changes_since(self.user, queryset, token, page_size=3)
+            changes += [change['id'] for change in page]
+            pages += 1
+            if not has_more:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(changes), sorted(created))
+
+    def test_invalid_or_foreign_token_resets(self):
+        other = make_user('+221770000021')
+        token = sync.make_token(other, sync.current_snapshot())
+        for since in ('garbage', token):
+            self.assertTrue(self.client.get('/api/transactions/sync/', {'since': since}).data['reset'])
+
+
+class TransferTests(FeeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sender = make_user('+221770000001', balance=10000)
+        self.recipient = make_user('+221770000002')
+
+    def post(self, **data):
+        return api_client(self.sender).post('/api/transactions/transfer/', data, format='json')
+
+    def test_transfer_moves_amount_and_fee(self):
+        response = self.post(recipient_phone=self.recipient.phone_number, amount='1055')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['data']['fees'], '11.00')  # 10,55 arrondi au franc
+        self.assertEqual(balance(self.sender), Decimal('8934'))
+        self.assertEqual(balance(self.recipient), Decimal('1055'))
+        self.assertEqual(ledger.balance(ledger.FEES_REVENUE), Decimal('11'))
+        incoming = Transaction.objects.get(user=self.recipient)
+        self.assertEqual((incoming.transaction_type, incoming.status), ('payment_in', 'completed'))
+
+    def test_insufficient_balance_writes_nothing(self):
+        # 9 901 + 99 de frais > 10 000
+        response = self.post(recipient_phone=self.recipient.phone_number, amount='9950')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Solde insuffisant')
+        self.assertEqual(balance(self.sender), Decimal('10000'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_whole_balance_can_be_spent(self):
+        response = self.post(recipient_phone=self.recipient.phone_number, amount='9900')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(balance(self.sender), Decimal('1'))
+
+    def test_recipient_errors(self):
+        self.assertEqual(self.post(recipient_phone='+221779999999', amount='10').status_code, 404)
+        self.assertEqual(self.post(recipient_phone=self.sender.phone_number, amount='10').status_code, 400)
+        Wallet.objects.filter(user=self.recipient).update(is_active=False)
+        self.assertEqual(self.post(recipient_phone=self.recipient.phone_number, amount='10').status_code, 400)
+
+
+class PayoutTests(FeeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.merchant = make_user('+221770000010', 'merchant', balance=100000)
+        self.driver = make_user('+221770000011', 'driver')
+        self.deliverer = make_user('+221770000012', 'deliverer')
+        self.individual = make_user('+221770000013', 'individual')
+
+    def post(self, lines, user=None):
+        return api_client(user or self.merchant).post('/api/transactions/payouts/', {'lines': lines}, format='json')
+
+    def test_pays_drivers_and_deliverers_and_reports_rejections(self):
+        response = self.post([
+            {'phone': self.driver.phone_number, 'amount': '1050'},
+            {'phone': self.deliverer.phone_number, 'amount': '2000'},
+            {'phone': self.individual.phone_number, 'amount': '500'},
+            {'phone': '+221779999999', 'amount': '500'},
+            {'phone': self.driver.phone_number, 'amount': '-1'},
+        ])
+
+        self.assertEqual(response.status_code, 201, response.data)
+        report = response.data['data']
+        self.assertEqual((report['paid'], report['rejected']), (2, 3))
+        self.assertEqual((report['total'], report['total_fees']), ('3050.00', '31.00'))  # 10,50 → 11 ; 20
+        self.assertEqual([line['status'] for line in report['lines']], ['paid', 'paid', 'rejected', 'rejected', 'rejected'])
+        self.assertEqual(report['lines'][2]['error'], 'Destinataire non éligible : chauffeurs et livreurs uniquement')
+
+        self.assertEqual(balance(self.merchant), Decimal('96919'))
+        self.assertEqual(balance(self.driver), Decimal('1050'))
+        self.assertEqual(balance(self.deliverer), Decimal('2000'))
+        self.assertEqual(balance(self.individual), Decimal('0'))
+        self.assertEqual(ledger.balance(ledger.FEES_REVENUE), Decimal('31'))
+        self.assertEqual(Transaction.objects.filter(user=self.merchant, transaction_type='payment_out').count(), 2)
+
+    def test_nothing_payable_is_rejected_before_any_write(self):
+        response = self.post([
+            {'phone': self.individual.phone_number, 'amount': '500'},
+            {'phone': self.merchant.phone_number, 'amount': '500'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+        self.assertEqual([line['status'] for line in response.data['lines']], ['rejected', 'rejected'])
+        self.assertEqual(balance(self.merchant), Decimal('100000'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_insufficient_balance_pays_nobody(self):
+        response = self.post([
+            {'phone': self.driver.phone_number, 'amount': '60000'},
+            {'phone': self.deliverer.phone_number, 'amount': '40000'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['error'].startswith('Solde insuffisant'))
+        self.assertEqual(balance(self.driver), Decimal('0'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_merchants_only(self):
+        response = self.post([{'phone': self.deliverer.phone_number, 'amount': '10'}], user=self.driver)
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(PENDING_TRANSACTION_TTL={'default': 3600, 'wave': 1800})
+class ExpiryTests(TestCase):
+    def setUp(self):
+        self.user = make_user('+221770000100')
+
+    def create(self, age, payment_method='wave', status='pending'):
+        transaction_obj = Transaction.objects.create(
+            user=self.user, transaction_type='deposit', payment_method=payment_method, amount=1000,
+            status=status, reference=f'EXP-{Transaction.objects.count()}',
+        )
+        Transaction.objects.filter(pk=transaction_obj.pk).update(created_at=now() - timedelta(seconds=age))
+        transaction_obj.refresh_from_db()
+        rollups.record_created(transaction_obj)
+        return transaction_obj
+
+    def statuses(self):
+        return list(Transaction.objects.order_by('reference').values_list('status', flat=True))
+
+    def test_only_stale_pending_rows_expire_per_method_ttl(self):
+        self.create(2000)                                     # Wave : 30 min
+        self.create(1000)
+        self.create(2000, payment_method='orange_money')      # défaut : 1 h
+        self.create(4000, payment_method='orange_money')
+        self.create(4000, status='completed')
+        sent = []
+        status_changed.connect(lambda transitions, **kwargs: sent.extend(transitions), weak=False,
+                               dispatch_uid='expiry-test')
+        self.addCleanup(status_changed.disconnect, dispatch_uid='expiry-test')
+
+        self.assertEqual(expiry.sweep(), {'wave': 1, 'orange_money': 1})
+
+        self.assertEqual(self.statuses(), ['expired', 'pending', 'pending', 'expired', 'completed'])
+        self.assertEqual([(row.old_status, row.status) for row in sent], [('pending', 'expired')] * 2)
+        self.assertEqual(expiry.sweep(), {})
+
+    def test_batches_are_bounded(self):
+        for _ in range(5):
+            self.create(2000)
+
+        self.assertEqual(expiry.sweep(batch_size=2, max_batches=2), {'wave': 4})
+        self.assertEqual(expiry.sweep(batch_size=2), {'wave': 1})
+
+    def test_rollups_follow_and_late_payment_still_completes(self):
+        transaction_obj = self.create(2000)
+        expiry.sweep()
+        self.assertEqual(
+            list(TransactionDailyRollup.objects.filter(count__gt=0).values_list('status', flat=True)), ['expired']
+        )
+
+        self.assertIsNotNone(state_machine.transition(transaction_obj.pk, 'completed'))
@@ -0,0 +1,92 @@
+# ===========================================
+# transactions/transfers.py
+# ===========================================
+"""Transferts entre portefeuilles WaxiPay (payment_out chez l'émetteur, payment_in chez le destinataire)"""
+import uuid
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from accounts import ledger, wallets
+from accounts.models import User
+from .models import Transaction
+from .signals import status_changed
+from . import fees, rollups, state_machine
+
+
+class TransferError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def new_reference():
+    return f"WXP-{uuid.uuid4().hex[:12].upper()}"
+
+
+def transfer(sender, recipient_phone, amount, description=''):
+    """
+    Débite l'émetteur et crédite le destinataire dans une seule transaction SQL.
+    Renvoie la transaction payment_out de l'émetteur.
+    """
+    recipient = (
+        User.objects.filter(phone_number=recipient_phone, is_active=True)
+        .select_related('wallet').first()
+    )
+    if recipient is None or not hasattr(recipient, 'wallet'):
+        raise TransferError('Destinataire introuvable', 404)
+    if recipient.pk == sender.pk:
+        raise TransferError('Impossible de transférer vers son propre compte')
+    if not recipient.wallet.is_active:
+        raise TransferError('Portefeuille du destinataire inactif')
+
+    fee = fees.compute_fee(amount, 'payment_out', 'wallet', sender.user_type)
+
+    with db_transaction.atomic():
+        sender_wallet = wallets.lock_for_debit([sender.pk]).get(sender.pk)
+        if sender_wallet is None or not sender_wallet.is_active:
+            raise TransferError('Portefeuille inactif')
+        if ledger.wallet_balance(sender_wallet.pk) < amount + fee:
+            raise TransferError('Solde insuffisant')
+
+        now = timezone.now()
+        outgoing, incoming = Transaction.objects.bulk_create([
+            Transaction(
+                user=sender,
+                transaction_type='payment_out',
+                payment_method='wallet',
+                amount=amount,
+                fees=fee,
+                status='completed',
+                reference=new_reference(),
+                recipient_phone=recipient.phone_number,
+                description=description,
+                created_at=now,
+                completed_at=now,
+            ),
+            Transaction(
+                user=recipient,
+                transaction_type='payment_in',
+                payment_method='wallet',
+                amount=amount,
+                status='completed',
+                reference=new_reference(),
+                recipient_phone=recipient.phone_number,
+                description=description,
+                created_at=now,
+                completed_at=now,
+            ),
+        ])
+        legs = [
+            (ledger.wallet_account(sender_wallet.pk), -(amount + fee), outgoing.id),
+            (ledger.wallet_account(recipient.wallet.pk), amount, incoming.id),
+        ]
+        if fee:
+            legs.append((ledger.FEES_REVENUE, fee, outgoing.id))
+        ledger.post(legs, description=description)
+        rollups.record_created(outgoing, incoming)
+        status_changed.send(
+            sender=Transaction, transitions=[state_machine.created(outgoing), state_machine.created(incoming)]
+        )
+    return outgoing
@@ -10,4 +10,8 @@ urlpatterns = [
     path('', views.TransactionListView.as_view(), name='list'),
     path('<uuid:pk>/', views.TransactionDetailView.as_view(), name='detail'),
     path('stats/', views.TransactionStatsView.as_view(), name='stats'),
+    path('export/', views.TransactionExportView.as_view(), name='export'),
+    path('sync/', views.TransactionSyncView.as_view(), name='sync'),
+    path('transfer/', views.TransferView.as_view(), name='transfer'),
+    path('payouts/', views.PayoutView.as_view(), name='payouts'),
 ]
\ No newline at end of file
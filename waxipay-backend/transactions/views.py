@@ -2,43 +2,73 @@
 # transactions/views.py
 # ===========================================
 from rest_framework import generics, status
+from rest_framework.generics import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Q
-from django.db.models.functions import TruncDate
-from datetime import datetime, timedelta
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Sum, F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from datetime import timedelta
 
-from .models import Transaction
-from .serializers import TransactionSerializer
+from waxipay_backend.conditional import conditional_get
+from accounts import ledger
+from accounts.models import User, Wallet
+from .models import Transaction, TransactionDailyRollup, TransactionTombstone
+from .serializers import TransactionSerializer, TransactionReadSerializer, TransferSerializer
+from .pagination import TransactionCursorPagination
+from .filters import filter_transactions
+from . import exports, payouts, sync, transfers
+
+
+def transaction_rows(request, *args, **kwargs):
+    """Transactions de l'utilisateur, leurs suppressions et l'utilisateur lui-même (relu en base)"""
+    return [
+        Transaction.objects.filter(user=request.user),
+        TransactionTombstone.objects.filter(user_id=request.user.pk),
+        User.objects.filter(pk=request.user.pk),
+    ]
+
+
+def stats_rows(request, *args, **kwargs):
+    """
+    Les agrégats sont tenus dans la transaction qui écrit la transaction suivie :
+    ses lignes et tombstones suffisent, plus le portefeuille et son grand livre (solde)
+    """
+    wallets = Wallet.objects.filter(user=request.user)
+    return transaction_rows(request) + [wallets, ledger.wallet_entries(wallets)]
+
+
+def stats_window(request):
+    # La fenêtre weekly_data / month_transactions glisse chaque jour à minuit
+    return timezone.localdate().isoformat()
 
 
 class TransactionListView(generics.ListAPIView):
     """Liste des transactions avec filtres"""
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TransactionCursorPagination
     
     def get_queryset(self):
-        queryset = Transaction.objects.filter(user=self.request.user)
-        
-        transaction_type = self.request.query_params.get('type')
-        payment_method = self.request.query_params.get('payment_method')
-        status_filter = self.request.query_params.get('status')
-        date_from = self.request.query_params.get('date_from')
-        date_to = self.request.query_params.get('date_to')
+        return filter_transactions(
+            Transaction.objects.filter(user=self.request.user),
+            self.request.query_params
+        )
+    
+    @conditional_get(transaction_rows)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        queryset = TransactionReadSerializer.select(self.filter_queryset(self.get_queryset()))
         
-        if transaction_type:
-            queryset = queryset.filter(transaction_type=transaction_type)
-        if payment_method:
-            queryset = queryset.filter(payment_method=payment_method)
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        if date_from:
-            queryset = queryset.filter(created_at__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(created_at__lte=date_to)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(TransactionReadSerializer.serialize_many(page))
         
-        return queryset
+        return Response(TransactionReadSerializer.serialize_many(queryset))
 
 
 class TransactionDetailView(generics.RetrieveAPIView):
@@ -48,45 +78,136 @@ class TransactionDetailView(generics.RetrieveAPIView):
     
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
+    
+    def retrieve(self, request, *args, **kwargs):
+        queryset = TransactionReadSerializer.select(self.get_queryset())
+        row = get_object_or_404(queryset, pk=self.kwargs['pk'])
+        self.check_object_permissions(request, row)
+        return Response(TransactionReadSerializer.to_representation(row))
+
+
+class TransactionExportView(APIView):
+    """Export de l'historique des transactions en CSV ou NDJSON (flux continu)"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in exports.EXPORT_FORMATS:
+            return Response(
+                {'success': False, 'error': 'Format d\'export invalide (csv ou ndjson)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = filter_transactions(
+            Transaction.objects.filter(user=request.user),
+            request.query_params
+        ).order_by('-created_at', '-id')
+        
+        stream, content_type = exports.EXPORT_FORMATS[output]
+        content = stream(queryset)
+        if isinstance(request._request, ASGIRequest):
+            content = exports.aiterate(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        filename = f"transactions-{timezone.localdate():%Y%m%d}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class TransactionSyncView(APIView):
+    """Synchronisation incrémentale : transactions créées, modifiées ou supprimées depuis un jeton"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        reset, changes, deleted, has_more, sync_token = sync.changes_since(
+            request.user,
+            Transaction.objects.filter(user=request.user),
+            request.query_params.get('since')
+        )
+        
+        return Response({
+            'success': True,
+            'reset': reset,
+            'changes': changes,
+            'deleted': deleted,
+            'has_more': has_more,
+            'sync_token': sync_token,
+        })
+
+
+class TransferView(APIView):
+    """Transfert vers le portefeuille d'un autre utilisateur (par numéro de téléphone)"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = TransferSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            outgoing = transfers.transfer(request.user, **serializer.validated_data)
+        except transfers.TransferError as e:
+            return Response({'success': False, 'error': e.message}, status=e.status)
+        
+        return Response({
+            'success': True,
+            'message': 'Transfert effectué',
+            'data': TransactionSerializer(outgoing).data
+        }, status=status.HTTP_201_CREATED)
+
+
+class PayoutView(APIView):
+    """Paiement groupé d'un commerçant vers de nombreux chauffeurs et livreurs (seuls destinataires admis)"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if request.user.user_type != 'merchant':
+            return Response(
+                {'success': False, 'error': 'Réservé aux commerçants'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            report = payouts.payout(
+                request.user,
+                request.data.get('lines'),
+                str(request.data.get('description') or '')[:255]
+            )
+        except payouts.NothingPayable as e:
+            return Response({'success': False, 'error': e.message, 'lines': e.lines}, status=e.status)
+        except transfers.TransferError as e:
+            return Response({'success': False, 'error': e.message}, status=e.status)
+        
+        return Response({'success': True, 'data': report}, status=status.HTTP_201_CREATED)
 
 
 class TransactionStatsView(APIView):
     """Statistiques des transactions"""
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(stats_rows, stats_window)
     def get(self, request):
         user = request.user
+        today = timezone.localdate()
+        month_start = today.replace(day=1)
+        week_ago = today - timedelta(days=7)
         
-        total_received = Transaction.objects.filter(
-            user=user,
-            transaction_type='payment_in',
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        completed = TransactionDailyRollup.objects.filter(user=user, status='completed')
         
-        total_sent = Transaction.objects.filter(
-            user=user,
-            transaction_type__in=['payment_out', 'withdrawal'],
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        totals = dict(
+            completed.values_list('transaction_type').annotate(total=Sum('total_amount'))
+        )
+        total_received = totals.get('payment_in') or 0
+        total_sent = (totals.get('payment_out') or 0) + (totals.get('withdrawal') or 0)
         
-        month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_transactions = Transaction.objects.filter(
-            user=user,
-            created_at__gte=month_start,
-            status='completed'
-        ).count()
+        month_transactions = completed.filter(
+            day__gte=month_start
+        ).aggregate(count=Sum('count'))['count'] or 0
         
-        week_ago = datetime.now() - timedelta(days=7)
-        weekly_data = Transaction.objects.filter(
-            user=user,
-            created_at__gte=week_ago,
-            status='completed'
-        ).annotate(
-            date=TruncDate('created_at')
-        ).values('date').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        ).order_by('date')
+        weekly_data = completed.filter(
+            day__gte=week_ago
+        ).values(date=F('day')).annotate(
+            total=Sum('total_amount'),
+            count=Sum('count')
+        ).filter(count__gt=0).order_by('date')
         
         return Response({
             'success': True,
@@ -95,6 +216,6 @@ class TransactionStatsView(APIView):
                 'total_sent': float(total_sent),
                 'month_transactions': month_transactions,
                 'weekly_data': list(weekly_data),
-                'wallet_balance': float(user.wallet.balance)
+                'wallet_balance': float(user.wallet.current_balance)
             }
         })
@@ -0,0 +1,63 @@
+# ===========================================
+# waxipay_backend/conditional.py
+# ===========================================
+from functools import wraps
+
+from django.core import signing
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.views.decorators.http import condition
+
+from .snapshots import current_snapshot, snapshot_bounds, written_since
+
+ETAG_SALT = 'waxipay_backend.conditional'
+
+
+def conditional_get(rows_func, variant_func=None):
+    """
+    GET conditionnel (ETag) pour une méthode de vue DRF.
+
+    L'ETag est l'instantané PostgreSQL pris avant que la vue ne lise, signé
+    pour l'utilisateur, l'URL et la variante. `rows_func(request, *args, **kwargs)`
+    renvoie les querysets des lignes servies (modèles portant sync_xid), et
+    ceux de leurs tombstones pour les suppressions. Si aucune de ces lignes n'a
+    été écrite par une transaction invisible dans l'instantané du client, la
+    vue n'est pas exécutée et un 304 est renvoyé. L'ordre est celui des
+    validations, pas des horloges : une transaction longue validée après une
+    plus récente invalide l'ETag.
+
+    `variant_func(request)` distingue les réponses qui changent sans écriture
+    (fenêtre glissante d'un jour, par exemple).
+    """
+    def salt(request):
+        variant = variant_func(request) if variant_func else ''
+        return '|'.join([ETAG_SALT, str(request.user.pk), request.get_full_path(), variant])
+
+    def etag_func(request, *args, **kwargs):
+        request_salt = salt(request)
+        for etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            try:
+                snapshot = signing.loads(etag.removeprefix('W/').strip('"'), salt=request_salt)
+                snapshot_bounds(snapshot)
+            except (signing.BadSignature, AttributeError, ValueError):
+                continue
+            if not written_since(snapshot, rows_func(request, *args, **kwargs)):
+                return etag
+            break
+        return 'W/"%s"' % signing.dumps(current_snapshot(), salt=request_salt, compress=True)
+
+    def decorator(method):
+        conditional = condition(etag_func=etag_func)
+
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            response = conditional(lambda request, *a, **kw: method(self, request, *a, **kw))(
+                request, *args, **kwargs
+            )
+            patch_vary_headers(response, ['Authorization'])
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
     'accounts',
     'transactions',
     'payments',
+    'webhooks',
+    'sms',
 ]
 
 MIDDLEWARE = [
@@ -95,9 +98,24 @@ DATABASES = {
     }
 }
 
+# Cache partagé entre processus (Redis) si REDIS_URL est défini, sinon cache mémoire local
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -111,6 +129,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Empreinte du mot de passe dans chaque jeton : un changement de mot de passe
+    # révoque les jetons émis avant lui (voir accounts/authentication.py)
+    'CHECK_REVOKE_TOKEN': True,
 }
 
 LOGGING = {
@@ -125,10 +146,17 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO', 
     },
+    'loggers': {
+        # httpx journalise chaque requête sortante en INFO
+        'httpx': {
+            'level': 'WARNING',
+        },
+    },
 }
 
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 
 # Password validation
@@ -171,18 +199,135 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Clés API PayTech
-PAYTECH_API_KEY = "112fdcd2f5798e746f3a8626d2bddf2720104ac95ea9cfdfac8c8304807036be"
-PAYTECH_API_SECRET = "0f29497c19fe0a9292b2656ce007c064e405573199ea9cdd639ce60e567856d8"
+PAYTECH_API_KEY = os.getenv('PAYTECH_API_KEY', "112fdcd2f5798e746f3a8626d2bddf2720104ac95ea9cfdfac8c8304807036be")
+PAYTECH_API_SECRET = os.getenv('PAYTECH_API_SECRET', "0f29497c19fe0a9292b2656ce007c064e405573199ea9cdd639ce60e567856d8")
 
 # Environnement
 # 'test' pour développement / 'prod' pour production
-PAYTECH_ENV = "test"
+PAYTECH_ENV = os.getenv('PAYTECH_ENV', "test")
 
 # URLs de redirection et IPN (ngrok ou domaine public HTTPS)
-PAYTECH_SUCCESS_URL = "https://4c21f1e8ea4c.ngrok-free.app/payments/success/"
-PAYTECH_CANCEL_URL = "https://4c21f1e8ea4c.ngrok-free.app/payments/cancel/"
-PAYTECH_IPN_URL = "https://4c21f1e8ea4c.ngrok-free.app/payments/ipn/"
+PAYTECH_SUCCESS_URL = os.getenv('PAYTECH_SUCCESS_URL', "https://4c21f1e8ea4c.ngrok-free.app/payments/success/")
+PAYTECH_CANCEL_URL = os.getenv('PAYTECH_CANCEL_URL', "https://4c21f1e8ea4c.ngrok-free.app/payments/cancel/")
+PAYTECH_IPN_URL = os.getenv('PAYTECH_IPN_URL', "https://4c21f1e8ea4c.ngrok-free.app/payments/ipn/")
 
 # Base URL PayTech
-PAYTECH_BASE_URL = "https://paytech.sn/api"
+PAYTECH_BASE_URL = os.getenv('PAYTECH_BASE_URL', "https://paytech.sn/api")
+
+# Client HTTP PayTech : connexions persistantes par processus et délais (secondes)
+PAYTECH_POOL_SIZE = int(os.getenv('PAYTECH_POOL_SIZE', '10'))
+PAYTECH_ASYNC_POOL_SIZE = int(os.getenv('PAYTECH_ASYNC_POOL_SIZE', '200'))
+PAYTECH_CONNECT_TIMEOUT = float(os.getenv('PAYTECH_CONNECT_TIMEOUT', '3.05'))
+PAYTECH_READ_TIMEOUT = float(os.getenv('PAYTECH_READ_TIMEOUT', '15'))
+
+# Processus du serveur web (WEB_CONCURRENCY, lu aussi par gunicorn et uvicorn)
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# Appels PayTech simultanés admis pour l'ensemble des processus web. La limite
+# d'un disjoncteur est par processus : chacun en reçoit une part égale et
+# PayTech voit au plus WEB_CONCURRENCY × max_concurrency appels. Un worker
+# gunicorn sync ne fait qu'un appel à la fois (un par thread avec --threads) :
+# la part n'y est jamais atteinte et la borne réelle est workers × threads ;
+# elle ne joue que sous ASGI (uvicorn), où un processus sert de nombreux appels
+# dans la limite de son pool de connexions (PAYTECH_ASYNC_POOL_SIZE).
+PAYTECH_TOTAL_CONCURRENCY = int(os.getenv('PAYTECH_TOTAL_CONCURRENCY', '100'))
+
+# Disjoncteurs par fournisseur (voir payments/circuit_breaker.py)
+CIRCUIT_BREAKERS = {
+    'paytech': {
+        'max_concurrency': int(os.getenv(
+            'PAYTECH_MAX_CONCURRENCY',
+            str(min(PAYTECH_ASYNC_POOL_SIZE, max(1, PAYTECH_TOTAL_CONCURRENCY // WEB_CONCURRENCY)))
+        )),
+        'failure_rate_threshold': 0.5,
+        'slow_call_rate_threshold': 0.5,
+        'slow_call_duration': float(os.getenv('PAYTECH_SLOW_CALL_SECONDS', '5')),
+        'window_size': 20,
+        'minimum_calls': 10,
+        'open_duration': 30.0,
+        'half_open_max_calls': 3,
+    },
+}
 
+# Idempotency-Key sur l'initiation de paiement (voir payments/idempotency.py), en secondes
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+# Attente maximale d'une requête dupliquée pendant que la première est en cours
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '5'))
+# Au-delà, une clé restée « en cours » (processus tué) peut être reprise
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '60'))
+
+# Règlement des IPN (voir payments/settlement.py et process_ipn_inbox)
+IPN_WORKERS = int(os.getenv('IPN_WORKERS', '2'))
+IPN_BATCH_SIZE = int(os.getenv('IPN_BATCH_SIZE', '100'))
+IPN_MAX_ATTEMPTS = int(os.getenv('IPN_MAX_ATTEMPTS', '5'))
+# Délai (secondes) avant la reprise d'une IPN en échec, doublé à chaque tentative
+IPN_BACKOFF_BASE = float(os.getenv('IPN_BACKOFF_BASE', '5'))
+IPN_BACKOFF_MAX = float(os.getenv('IPN_BACKOFF_MAX', '300'))
+
+# Grand livre : attente maximale (secondes) des transactions d'écriture en cours avant un instantané (compact_ledger)
+LEDGER_COMPACTION_WAIT = float(os.getenv('LEDGER_COMPACTION_WAIT', '60'))
+
+# Paiements groupés des commerçants (transactions/payouts.py)
+PAYOUT_MAX_LINES = int(os.getenv('PAYOUT_MAX_LINES', '10000'))
+PAYOUT_BATCH_SIZE = 2000
+
+# Grille tarifaire (transactions/fees.py) : délai max. avant prise en compte d'une modification, en secondes
+FEE_SCHEDULE_CHECK_INTERVAL = float(os.getenv('FEE_SCHEDULE_CHECK_INTERVAL', '5'))
+
+# Expiration des transactions en attente abandonnées (transactions/expiry.py), délais en secondes
+PENDING_TRANSACTION_TTL = {
+    'default': int(os.getenv('PENDING_TRANSACTION_TTL', '3600')),
+    'wave': int(os.getenv('PENDING_TRANSACTION_TTL_WAVE', '1800')),
+    'bank_card': int(os.getenv('PENDING_TRANSACTION_TTL_BANK_CARD', '3600')),
+}
+PENDING_EXPIRY_BATCH_SIZE = int(os.getenv('PENDING_EXPIRY_BATCH_SIZE', '500'))
+
+# Rapprochement des fichiers de règlement PayTech (payments/reconciliation.py)
+PAYTECH_SETTLEMENT_COLUMNS = {
+    'reference': os.getenv('PAYTECH_SETTLEMENT_REFERENCE_COLUMN', 'ref_command'),
+    'external_reference': os.getenv('PAYTECH_SETTLEMENT_TOKEN_COLUMN', 'token'),
+    'amount': os.getenv('PAYTECH_SETTLEMENT_AMOUNT_COLUMN', 'item_price'),
+}
+RECONCILIATION_PARTITIONS = int(os.getenv('RECONCILIATION_PARTITIONS', '64'))
+RECONCILIATION_LOOKBACK_DAYS = int(os.getenv('RECONCILIATION_LOOKBACK_DAYS', '2'))
+
+# Webhooks des commerçants (webhooks/delivery.py)
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv('WEBHOOK_MAX_IN_FLIGHT', '5000'))
+WEBHOOK_CONNECT_TIMEOUT = float(os.getenv('WEBHOOK_CONNECT_TIMEOUT', '3.05'))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '10'))
+WEBHOOK_LEASE_SECONDS = int(os.getenv('WEBHOOK_LEASE_SECONDS', '120'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '12'))
+WEBHOOK_BACKOFF_BASE = float(os.getenv('WEBHOOK_BACKOFF_BASE', '10'))
+WEBHOOK_BACKOFF_MAX = float(os.getenv('WEBHOOK_BACKOFF_MAX', '3600'))
+WEBHOOK_RETENTION_DAYS = int(os.getenv('WEBHOOK_RETENTION_DAYS', '7'))
+WEBHOOK_DNS_TTL = float(os.getenv('WEBHOOK_DNS_TTL', '60'))
+# URL http et adresses privées autorisées (développement avec un récepteur local uniquement)
+WEBHOOK_ALLOW_INSECURE_DESTINATIONS = os.getenv('WEBHOOK_ALLOW_INSECURE_DESTINATIONS', '0') == '1'
+
+# Flux SSE du statut des paiements (payments/async_views.py : payment_events), en secondes
+SSE_KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+SSE_MAX_DURATION = float(os.getenv('SSE_MAX_DURATION', '300'))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', '3000'))
+
+# Codes OTP conservés dans le cache (accounts/otp.py)
+OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', '600'))
+OTP_MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', '5'))
+
+# Envoi des SMS (sms/queue.py, worker `send_sms`) ; SMS_BACKEND : chemin de la classe du fournisseur
+SMS_BACKEND = os.getenv('SMS_BACKEND', 'sms.backends.console.SMSBackend')
+SMS_SENDER = os.getenv('SMS_SENDER', 'WaxiPay')
+SMS_BATCH_SIZE = int(os.getenv('SMS_BATCH_SIZE', '50'))
+SMS_CONCURRENCY = int(os.getenv('SMS_CONCURRENCY', '4'))
+SMS_LEASE_SECONDS = int(os.getenv('SMS_LEASE_SECONDS', '60'))
+SMS_MAX_ATTEMPTS = int(os.getenv('SMS_MAX_ATTEMPTS', '5'))
+SMS_BACKOFF_BASE = float(os.getenv('SMS_BACKOFF_BASE', '2'))
+SMS_BACKOFF_MAX = float(os.getenv('SMS_BACKOFF_MAX', '60'))
+SMS_RETENTION_DAYS = int(os.getenv('SMS_RETENTION_DAYS', '7'))
+SMS_LOCMEM_LATENCY = float(os.getenv('SMS_LOCMEM_LATENCY', '0'))
+
+# Utilisateurs authentifiés servis depuis le cache (accounts/authentication.py), en secondes
+AUTH_USER_CACHE_TTL = float(os.getenv('AUTH_USER_CACHE_TTL', '15'))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '10000'))
+AUTH_USER_SHARED_CACHE = os.getenv('AUTH_USER_SHARED_CACHE', '1' if os.getenv('REDIS_URL') else '0') == '1'
+AUTH_USER_SHARED_CACHE_TTL = int(os.getenv('AUTH_USER_SHARED_CACHE_TTL', '60'))
@@ -0,0 +1,54 @@
+# ===========================================
+# waxipay_backend/snapshots.py
+# ===========================================
+"""
+Instantanés PostgreSQL (pg_snapshot) et colonnes sync_xid.
+
+Les tables suivies portent le xid (xid8 ramené en bigint) de la dernière
+transaction qui a écrit chaque ligne, posé par trigger ou par défaut de
+colonne. Comparer ce xid à un instantané ordonne les écritures dans l'ordre de
+leurs validations, quelle que soit la durée des transactions qui les font.
+"""
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+
+def current_snapshot():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_current_snapshot()::text')
+        return cursor.fetchone()[0]
+
+
+def snapshot_bounds(snapshot):
+    """(xmin, xmax) d'un instantané 'xmin:xmax:xip,…' ; lève ValueError s'il est mal formé"""
+    xmin, xmax, xip = snapshot.split(':')
+    for xid in filter(None, xip.split(',')):
+        int(xid)
+    return int(xmin), int(xmax)
+
+
+def written_outside(queryset, snapshot):
+    """Lignes du queryset écrites par une transaction invisible dans `snapshot` (validée après lui)"""
+    column = f'{connection.ops.quote_name(queryset.model._meta.db_table)}.sync_xid'
+    # Tout xid inférieur au xmin de l'instantané y était déjà validé (ou annulé)
+    return queryset.filter(sync_xid__gte=snapshot_bounds(snapshot)[0]).alias(
+        written_outside=RawSQL(
+            f'NOT pg_visible_in_snapshot({column}::text::xid8, %s::pg_snapshot)',
+            [snapshot], output_field=BooleanField(),
+        )
+    ).filter(written_outside=True)
+
+
+def written_since(snapshot, querysets):
+    """Vrai si l'un des querysets a une ligne écrite hors de `snapshot` ; une seule requête"""
+    clauses, params = [], []
+    for queryset in querysets:
+        sql, query_params = written_outside(queryset, snapshot).order_by().values('pk')[:1].query.sql_with_params()
+        clauses.append(f'EXISTS ({sql})')
+        params.extend(query_params)
+    if not clauses:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {' OR '.join(clauses)}", params)
+        return cursor.fetchone()[0]
@@ -0,0 +1,35 @@
+# ===========================================
+# waxipay_backend/testing.py
+# ===========================================
+"""Aides communes aux tests des applications"""
+from decimal import Decimal
+
+from rest_framework.test import APIClient
+
+PASSWORD = 'pass12345!'
+
+
+def make_user(phone, user_type='individual', balance=0):
+    """Utilisateur avec son portefeuille, crédité de `balance` par le compte d'ouverture"""
+    from accounts import ledger, wallets
+    from accounts.models import User, Wallet
+
+    user = User.objects.create_user(phone, password=PASSWORD, full_name=f'Test {phone}', user_type=user_type)
+    Wallet.objects.create(user=user)
+    if balance:
+        wallets.credit(user.pk, Decimal(balance), source=ledger.OPENING_BALANCE)
+    return user
+
+
+def api_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def balance(user):
+    """Solde courant du portefeuille de l'utilisateur"""
+    from accounts import ledger
+
+    return ledger.wallet_balance(user.wallet.pk)
@@ -24,6 +24,7 @@ urlpatterns = [
     path('api/auth/', include('accounts.urls')),
     path('api/transactions/', include('transactions.urls')),
     path('api/payments/', include('payments.urls')),
+    path('api/webhooks/', include('webhooks.urls')),
     
     # Documentation API
     path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='api-docs'),
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import WebhookEndpoint, WebhookEvent
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ('user', 'url', 'max_concurrency', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'endpoint', 'event_type', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'event_type')
+    raw_id_fields = ('endpoint',)
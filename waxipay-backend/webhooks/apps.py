@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class WebhooksConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'webhooks'
+
+    def ready(self):
+        from . import outbox  # noqa: F401  (événements sur transactions.signals.status_changed)
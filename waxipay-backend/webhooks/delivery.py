@@ -0,0 +1,340 @@
+# ===========================================
+# webhooks/delivery.py
+# ===========================================
+"""
+Livraison des webhooks par une boucle asyncio.
+
+Le processus réserve les événements dus par lots (bail WEBHOOK_LEASE_SECONDS,
+FOR UPDATE SKIP LOCKED : plusieurs processus peuvent tourner en parallèle et
+un événement réservé par un processus arrêté redevient dû à la fin du bail).
+Les événements d'un même webhook partent groupés par POST (WEBHOOK_BATCH_SIZE),
+avec au plus `max_concurrency` POST simultanés par webhook, chacun sur son
+propre pool httpx de connexions persistantes (un pool partagé par des centaines
+de requêtes concurrentes s'effondre à quelques dizaines de requêtes/s), vers
+l'adresse IP contrôlée par webhooks/destinations.py.
+Un échec est reprogrammé avec un délai exponentiel.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import signal
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+from django.utils import timezone
+
+from . import destinations
+from .models import WebhookEndpoint, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+EVENTS_TABLE = WebhookEvent._meta.db_table
+ENDPOINTS_TABLE = WebhookEndpoint._meta.db_table
+SIGNATURE_HEADER = 'X-WaxiPay-Signature'
+
+Endpoint = namedtuple('Endpoint', ['id', 'url', 'secret', 'max_concurrency'])
+Event = namedtuple('Event', ['id', 'event_type', 'payload', 'created_at'])
+
+
+def claim(limit, busy_endpoints=()):
+    """
+    Réserve jusqu'à `limit` événements dus, hors webhooks `busy_endpoints`.
+    Renvoie {Endpoint: [Event]} ; les événements des webhooks désactivés sont marqués échoués.
+    """
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH due AS (
+                SELECT id FROM {EVENTS_TABLE}
+                WHERE status = 'pending' AND next_attempt_at <= %s AND NOT (endpoint_id = ANY(%s))
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE {EVENTS_TABLE} AS event SET next_attempt_at = %s
+            FROM due, {ENDPOINTS_TABLE} AS endpoint
+            WHERE event.id = due.id AND endpoint.id = event.endpoint_id
+            RETURNING event.id, event.event_type, event.payload, event.created_at,
+                      endpoint.id, endpoint.url, endpoint.secret, endpoint.max_concurrency, endpoint.is_active
+            """,
+            [now, list(busy_endpoints), limit, now + timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)],
+        )
+        rows = cursor.fetchall()
+
+    claimed, disabled = defaultdict(list), []
+    for event_id, event_type, payload, created_at, *endpoint, is_active in rows:
+        if not is_active:
+            disabled.append(event_id)
+            continue
+        # Django laisse psycopg2 rendre le jsonb en texte brut
+        claimed[Endpoint(*endpoint)].append(Event(event_id, event_type, json.loads(payload), created_at))
+    if disabled:
+        WebhookEvent.objects.filter(id__in=disabled).update(status='failed', last_error='Webhook désactivé')
+    return claimed
+
+
+def release(event_ids):
+    """Rend immédiatement dus des événements réservés mais non envoyés"""
+    WebhookEvent.objects.filter(id__in=event_ids, status='pending').update(next_attempt_at=timezone.now())
+
+
+def record(delivered_ids, failures):
+    """Enregistre les livraisons réussies et reprogramme les échecs ({erreur: [ids]})"""
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        if delivered_ids:
+            cursor.execute(
+                f"""
+                UPDATE {EVENTS_TABLE}
+                SET status = 'delivered', delivered_at = %s, attempts = attempts + 1, last_error = ''
+                WHERE id = ANY(%s)
+                """,
+                [now, delivered_ids],
+            )
+        for error, event_ids in failures.items():
+            # Délai exponentiel plafonné, ±25 % d'aléa pour étaler les reprises
+            cursor.execute(
+                f"""
+                UPDATE {EVENTS_TABLE} SET
+                    attempts = attempts + 1,
+                    last_error = %s,
+                    status = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE 'pending' END,
+                    next_attempt_at = %s + make_interval(
+                        secs => LEAST(%s * power(2, attempts), %s) * (0.75 + random() / 2)
+                    )
+                WHERE id = ANY(%s)
+                """,
+                [
+                    error[:1000], settings.WEBHOOK_MAX_ATTEMPTS, now,
+                    settings.WEBHOOK_BACKOFF_BASE, settings.WEBHOOK_BACKOFF_MAX, event_ids,
+                ],
+            )
+
+
+def purge(days=None):
+    """Supprime les événements livrés ou abandonnés depuis plus de `days` jours"""
+    days = settings.WEBHOOK_RETENTION_DAYS if days is None else days
+    deleted, _ = WebhookEvent.objects.filter(
+        status__in=['delivered', 'failed'], created_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def sign(secret, body, timestamp=None):
+    """En-tête de signature : t=<horodatage>,v1=HMAC-SHA256(secret, "<horodatage>.<corps>")"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def encode(events):
+    return json.dumps({
+        'events': [
+            {
+                'id': event.id,
+                'type': event.event_type,
+                'created_at': event.created_at.isoformat(),
+                'data': event.payload,
+            }
+            for event in events
+        ]
+    }, separators=(',', ':')).encode()
+
+
+class Route:
+    """
+    Pool httpx, limite de concurrence et adresse vérifiée d'un webhook. Refaite
+    dès que l'URL ou max_concurrency lus à la réservation changent ; l'ancienne
+    est fermée après ses derniers POST.
+    """
+
+    def __init__(self, endpoint):
+        self.url = endpoint.url
+        self.limit = endpoint.max_concurrency
+        self.semaphore = asyncio.Semaphore(endpoint.max_concurrency)
+        self.client = new_client(endpoint.max_concurrency)
+        parts = urlsplit(endpoint.url)
+        self.hostname = parts.hostname
+        self.host_header = parts.netloc.rsplit('@', 1)[-1]
+        self.address = None
+        self.resolved_at = 0.0
+        self.queued = 0  # POST en attente ou en vol
+        self.retired = False
+
+    def matches(self, endpoint):
+        return endpoint.url == self.url and endpoint.max_concurrency == self.limit
+
+    async def target(self):
+        """URL vers l'adresse vérifiée (destinations.resolve), résolue de nouveau après WEBHOOK_DNS_TTL secondes"""
+        if self.address is None or time.monotonic() - self.resolved_at > settings.WEBHOOK_DNS_TTL:
+            self.address = await destinations.resolve(self.url)
+            self.resolved_at = time.monotonic()
+        return destinations.pinned_url(self.url, self.address)
+
+
+class Dispatcher:
+    """Boucle de livraison d'un processus"""
+
+    def __init__(self, batch_size=None, max_in_flight=None, poll_interval=1.0):
+        self.batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+        self.max_in_flight = max_in_flight or settings.WEBHOOK_MAX_IN_FLIGHT
+        self.poll_interval = poll_interval
+
+        self.routes = {}  # id du webhook -> Route
+        self.in_flight = 0  # événements réservés non encore enregistrés
+        self.tasks = set()
+        self.delivered, self.failures = [], defaultdict(list)
+        self.stats = {'delivered': 0, 'failed': 0, 'requests': 0}
+
+    async def run(self, stop, once=False):
+        """Livre jusqu'à `stop` (ou jusqu'à boîte vide avec `once`) ; renvoie les compteurs"""
+        stopping = asyncio.ensure_future(stop.wait())
+        while not stop.is_set():
+            await self.flush()
+            claimed = await self.claim()
+            if claimed:
+                continue
+            if once and not self.tasks:
+                break
+            # Boîte vide ou capacité atteinte : attendre la fin d'un POST, l'arrêt ou l'intervalle
+            await asyncio.wait(
+                {stopping, *self.tasks}, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED
+            )
+        stopping.cancel()
+
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+        await self.flush()
+        return self.stats
+
+    async def claim(self):
+        capacity = self.max_in_flight - self.in_flight
+        if capacity < self.batch_size:
+            return 0
+        busy = [endpoint_id for endpoint_id, route in self.routes.items() if route.queued >= route.limit]
+        claimed = await sync_to_async(claim)(capacity, busy)
+
+        excess = []
+        for endpoint, events in claimed.items():
+            route = self.routes.get(endpoint.id)
+            if route is None or not route.matches(endpoint):
+                if route is not None:
+                    self._retire(route)
+                route = self.routes[endpoint.id] = Route(endpoint)
+            # Au plus max_concurrency POST en file par webhook : le reste est rendu,
+            # pour qu'un webhook lent ne garde pas des événements au-delà du bail
+            allowed = max(route.limit - route.queued, 0) * self.batch_size
+            excess.extend(event.id for event in events[allowed:])
+            events = events[:allowed]
+            for start in range(0, len(events), self.batch_size):
+                self._start(endpoint, route, events[start:start + self.batch_size])
+        if excess:
+            await sync_to_async(release)(excess)
+        return sum(len(events) for events in claimed.values()) - len(excess)
+
+    def _retire(self, route):
+        route.retired = True
+        if route.queued == 0:
+            self._spawn(close_client(route.client))
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _start(self, endpoint, route, events):
+        self.in_flight += len(events)
+        route.queued += 1
+        self._spawn(self._deliver(endpoint, route, events))
+
+    async def _deliver(self, endpoint, route, events):
+        body = encode(events)
+        error = None
+        try:
+            async with route.semaphore:
+                url = await route.target()
+                response = await route.client.post(url, content=body, headers={
+                    'Host': route.host_header,
+                    'Content-Type': 'application/json',
+                    SIGNATURE_HEADER: sign(endpoint.secret, body),
+                }, extensions={'sni_hostname': route.hostname})
+                self.stats['requests'] += 1
+                if not 200 <= response.status_code < 300:
+                    error = f'HTTP {response.status_code}'
+        except destinations.UnsafeDestination as e:
+            error = e.message
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            error = f'{type(e).__name__}: {e}'
+        except Exception as e:
+            # OSError, socket.gaierror, ssl.SSLError… hors des exceptions httpx : un échec
+            # comme un autre, sans quoi ses événements resteraient comptés dans in_flight
+            logger.exception(f"Webhook delivery to endpoint {endpoint.id} raised")
+            error = f'{type(e).__name__}: {e}'
+        finally:
+            route.queued -= 1
+            if route.retired and route.queued == 0:
+                await close_client(route.client)
+
+        event_ids = [event.id for event in events]
+        if error is None:
+            self.delivered.extend(event_ids)
+        else:
+            self.failures[error].extend(event_ids)
+
+    async def flush(self):
+        """Enregistre en base les résultats accumulés depuis le dernier appel"""
+        if not self.delivered and not self.failures:
+            return
+        delivered, failures = self.delivered, dict(self.failures)
+        self.delivered, self.failures = [], defaultdict(list)
+        await sync_to_async(record)(delivered, failures)
+
+        failed = sum(len(event_ids) for event_ids in failures.values())
+        self.in_flight -= len(delivered) + failed
+        self.stats['delivered'] += len(delivered)
+        self.stats['failed'] += failed
+        for error, event_ids in failures.items():
+            logger.warning(f"Webhook delivery failed for {len(event_ids)} events: {error}")
+
+    async def aclose(self):
+        for route in self.routes.values():
+            await route.client.aclose()
+
+
+def new_client(pool_size):
+    return httpx.AsyncClient(
+        headers={'User-Agent': 'WaxiPay-Webhooks/1.0'},
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=httpx.Timeout(settings.WEBHOOK_TIMEOUT, connect=settings.WEBHOOK_CONNECT_TIMEOUT),
+    )
+
+
+async def close_client(client):
+    try:
+        await client.aclose()
+    except Exception:
+        logger.exception("Closing a webhook connection pool failed")
+
+
+async def run(batch_size=None, max_in_flight=None, poll_interval=1.0, once=False):
+    """Point d'entrée du worker : livre jusqu'à SIGINT / SIGTERM (ou boîte vide avec `once`)"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    dispatcher = Dispatcher(batch_size, max_in_flight, poll_interval)
+    try:
+        return await dispatcher.run(stop, once)
+    finally:
+        await dispatcher.aclose()
+        await sync_to_async(connections.close_all)()
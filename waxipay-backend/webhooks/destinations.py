@@ -0,0 +1,92 @@
+# ===========================================
+# webhooks/destinations.py
+# ===========================================
+"""
+Contrôle des URL de webhook (protection SSRF).
+
+Un webhook ne peut viser qu'une URL https dont l'hôte ne résout que vers des
+adresses publiques : ni boucle locale, ni réseaux privés (RFC 1918), ni
+lien-local (169.254.169.254, métadonnées cloud), ni adresses réservées.
+Le contrôle est fait à l'enregistrement, puis refait à la livraison sur
+l'adresse effectivement contactée : le worker se connecte à l'IP vérifiée
+(en-tête Host et SNI conservés), un changement de DNS entre la vérification et
+la connexion (DNS rebinding) ne peut donc pas le détourner.
+
+WEBHOOK_ALLOW_INSECURE_DESTINATIONS lève ces restrictions (développement et
+benchmarks avec un récepteur local uniquement).
+"""
+import asyncio
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+
+class UnsafeDestination(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def parse(url):
+    """(schéma, hôte, port) de l'URL ; lève UnsafeDestination si elle n'est pas autorisée"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        raise UnsafeDestination('URL invalide')
+    if not parts.hostname:
+        raise UnsafeDestination('URL invalide')
+    if parts.scheme != 'https' and not (parts.scheme == 'http' and settings.WEBHOOK_ALLOW_INSECURE_DESTINATIONS):
+        raise UnsafeDestination("L'URL du webhook doit être en https")
+    return parts.scheme, parts.hostname, port or (443 if parts.scheme == 'https' else 80)
+
+
+def check_address(address):
+    """Lève UnsafeDestination si l'adresse IP n'est pas publique"""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    if not ip.is_global or ip.is_multicast:
+        if not settings.WEBHOOK_ALLOW_INSECURE_DESTINATIONS:
+            raise UnsafeDestination(f"Adresse de destination non autorisée : {ip}")
+    return str(ip)
+
+
+def _addresses(infos):
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses:
+        raise UnsafeDestination("Hôte introuvable")
+    # Toutes les adresses doivent être publiques : sinon l'hôte pourrait alterner entre elles
+    return [check_address(address) for address in addresses]
+
+
+def validate(url):
+    """Contrôle d'enregistrement : schéma et résolution DNS de l'hôte"""
+    _, host, port = parse(url)
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise UnsafeDestination("Hôte introuvable")
+    _addresses(infos)
+
+
+async def resolve(url):
+    """Contrôle de livraison : renvoie l'adresse IP vérifiée à contacter pour cette URL"""
+    _, host, port = parse(url)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise UnsafeDestination("Hôte introuvable")
+    return _addresses(infos)[0]
+
+
+def pinned_url(url, address):
+    """URL dont l'hôte est remplacé par l'adresse vérifiée (le Host et le SNI restent ceux d'origine)"""
+    parts = urlsplit(url)
+    host = f'[{address}]' if ':' in address else address
+    netloc = f'{host}:{parts.port}' if parts.port else host
+    if '@' in parts.netloc:
+        netloc = parts.netloc.rsplit('@', 1)[0] + '@' + netloc
+    return parts._replace(netloc=netloc).geturl()
@@ -0,0 +1,99 @@
+# ===========================================
+# webhooks/management/commands/bench_webhooks.py
+# ===========================================
+import asyncio
+import json
+import multiprocessing
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from transactions.state_machine import Transition
+from webhooks import delivery, outbox
+from webhooks.models import WebhookEndpoint
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with self.server.events.get_lock():
+            self.server.events.value += len(json.loads(body)['events'])
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReceiverServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, events):
+        super().__init__(('127.0.0.1', 0), ReceiverHandler)
+        self.events = events
+
+
+def serve(events, ports):
+    server = ReceiverServer(events)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (événements/s) de la livraison des webhooks vers un récepteur local"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=50000)
+        parser.add_argument('--endpoints', type=int, default=20)
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        # Récepteur dans un processus séparé : il ne partage pas le GIL de la boucle de livraison
+        context = multiprocessing.get_context('fork')
+        received, ports = context.Value('i', 0), context.Queue()
+        receiver = context.Process(target=serve, args=(received, ports), daemon=True)
+        receiver.start()
+        url = f'http://127.0.0.1:{ports.get()}/hook'
+
+        merchant = User.objects.create_user(
+            phone_number=f"bench-{uuid.uuid4().hex[:8]}", full_name='Bench webhooks', user_type='merchant'
+        )
+        try:
+            WebhookEndpoint.objects.bulk_create([
+                WebhookEndpoint(user=merchant, url=f'{url}/{index}') for index in range(options['endpoints'])
+            ])
+            now = timezone.now()
+            transitions = [
+                Transition(uuid.uuid4(), f'BENCH-{index}', merchant.pk, 'payment_out',
+                           Decimal('25.50'), Decimal('0'), now, None, 'completed')
+                for index in range(options['events'] // options['endpoints'])
+            ]
+            started = time.perf_counter()
+            created = outbox.enqueue(transitions)
+            enqueued = time.perf_counter() - started
+
+            started = time.perf_counter()
+            # Récepteur local en http sur 127.0.0.1 : refusé hors de ce banc
+            with override_settings(WEBHOOK_ALLOW_INSECURE_DESTINATIONS=True):
+                stats = asyncio.run(delivery.run(batch_size=options['batch_size'], poll_interval=0.1, once=True))
+            elapsed = time.perf_counter() - started
+        finally:
+            merchant.delete()
+            receiver.terminate()
+
+        self.stdout.write(f"{created} événements ajoutés en {enqueued:.2f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['delivered']} livrés ({received.value} reçus) en {stats['requests']} requêtes, "
+            f"{elapsed:.2f}s : {stats['delivered'] / elapsed:.0f} événements/s"
+        ))
@@ -0,0 +1,34 @@
+# ===========================================
+# webhooks/management/commands/deliver_webhooks.py
+# ===========================================
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from webhooks import delivery
+
+
+class Command(BaseCommand):
+    help = "Livre les webhooks des commerçants depuis la boîte d'envoi (boucle asyncio, un processus par cœur)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.WEBHOOK_BATCH_SIZE,
+                            help="Événements maximum par POST")
+        parser.add_argument('--max-in-flight', type=int, default=settings.WEBHOOK_MAX_IN_FLIGHT,
+                            help="Événements réservés simultanément par ce processus")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Attente en secondes quand la boîte est vide")
+        parser.add_argument('--once', action='store_true', help="S'arrêter une fois la boîte vidée")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = asyncio.run(delivery.run(
+            options['batch_size'], options['max_in_flight'], options['poll_interval'], options['once']
+        ))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['delivered']} événements livrés, {stats['failed']} en échec, "
+            f"{stats['requests']} requêtes en {elapsed:.1f}s"
+        ))
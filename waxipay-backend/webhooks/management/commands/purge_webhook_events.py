@@ -0,0 +1,17 @@
+# ===========================================
+# webhooks/management/commands/purge_webhook_events.py
+# ===========================================
+from django.core.management.base import BaseCommand
+
+from webhooks import delivery
+
+
+class Command(BaseCommand):
+    help = "Supprime les événements webhook livrés ou abandonnés (à planifier, ex. chaque jour)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Ancienneté minimale en jours (défaut : WEBHOOK_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        deleted = delivery.purge(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} événements supprimés"))
@@ -0,0 +1,75 @@
+# ===========================================
+# webhooks/models.py
+# ===========================================
+from django.db import models
+from accounts.models import User
+import secrets
+
+
+def new_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """URL d'un commerçant notifiée des changements de statut de ses transactions"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhook_endpoints')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=new_secret)
+    max_concurrency = models.PositiveSmallIntegerField(default=4)
+    is_active = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'webhook_endpoints'
+        verbose_name = 'Webhook'
+        verbose_name_plural = 'Webhooks'
+        indexes = [
+            models.Index(fields=['user'], condition=models.Q(is_active=True), name='webhook_endpoint_active_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.phone_number} → {self.url}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Boîte d'envoi des webhooks.
+
+    Les événements sont ajoutés dans la transaction SQL du changement de statut
+    (webhooks/outbox.py) ; `deliver_webhooks` les envoie ensuite hors du chemin
+    des requêtes (webhooks/delivery.py). Livraison « au moins une fois » : le
+    destinataire dédoublonne sur l'id de l'événement.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('delivered', 'Livré'),
+        ('failed', 'Échoué'),
+    ]
+
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='events')
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'webhook_events'
+        verbose_name = 'Événement webhook'
+        verbose_name_plural = 'Événements webhook'
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], condition=models.Q(status='pending'), name='webhook_event_due_idx'
+            ),
+            models.Index(fields=['endpoint', '-created_at'], name='webhook_event_endpoint_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id} ({self.status})"
@@ -0,0 +1,73 @@
+# ===========================================
+# webhooks/outbox.py
+# ===========================================
+"""
+Ajout des événements webhook à la boîte d'envoi, dans la transaction SQL du
+changement de statut : un événement n'existe que si le changement est validé.
+Coût pour les transactions d'utilisateurs sans webhook : une requête indexée.
+"""
+import json
+
+from django.db import connection
+from django.dispatch import receiver
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from transactions.models import Transaction
+from transactions.signals import status_changed
+from .models import WebhookEndpoint, WebhookEvent
+
+
+def event_type(transition):
+    return f'transaction.{transition.status}'
+
+
+def event_data(transition):
+    return {
+        'id': str(transition.id),
+        'reference': transition.reference,
+        'transaction_type': transition.transaction_type,
+        'amount': f'{transition.amount:.2f}',
+        'fees': f'{transition.fees:.2f}',
+        'status': transition.status,
+        'previous_status': transition.old_status,
+    }
+
+
+def enqueue(transitions):
+    """Crée un événement par transition et par webhook actif de son utilisateur ; renvoie leur nombre"""
+    endpoints = {}
+    for endpoint_id, user_id in WebhookEndpoint.objects.filter(
+        user_id__in={transition.user_id for transition in transitions}, is_active=True
+    ).values_list('id', 'user_id'):
+        endpoints.setdefault(user_id, []).append(endpoint_id)
+    if not endpoints:
+        return 0
+
+    now = timezone.now()
+    rows = []
+    for transition in transitions:
+        subscribed = endpoints.get(transition.user_id)
+        if not subscribed:
+            continue
+        payload = json.dumps(event_data(transition))
+        rows.extend((endpoint_id, event_type(transition), payload, now, now) for endpoint_id in subscribed)
+
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor.cursor,
+            f"""
+            INSERT INTO {WebhookEvent._meta.db_table}
+                (endpoint_id, event_type, payload, next_attempt_at, created_at, status, attempts, last_error)
+            VALUES %s
+            """,
+            rows,
+            template="(%s, %s, %s::jsonb, %s, %s, 'pending', 0, '')",
+            page_size=2000,
+        )
+    return len(rows)
+
+
+@receiver(status_changed, sender=Transaction)
+def transaction_status_changed(sender, transitions, **kwargs):
+    enqueue(transitions)
@@ -0,0 +1,20 @@
+# ===========================================
+# webhooks/serializers.py
+# ===========================================
+from rest_framework import serializers
+from . import destinations
+from .models import WebhookEndpoint
+
+
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookEndpoint
+        fields = ['id', 'url', 'secret', 'is_active', 'created_at']
+        read_only_fields = ['id', 'secret', 'created_at']
+
+    def validate_url(self, value):
+        try:
+            destinations.validate(value)
+        except destinations.UnsafeDestination as e:
+            raise serializers.ValidationError(e.message)
+        return value
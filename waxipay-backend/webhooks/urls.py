@@ -0,0 +1,12 @@
+# ===========================================
+# webhooks/urls.py
+# ===========================================
+from django.urls import path
+from . import views
+
+app_name = 'webhooks'
+
+urlpatterns = [
+    path('', views.WebhookEndpointListView.as_view(), name='list'),
+    path('<int:pk>/', views.WebhookEndpointDetailView.as_view(), name='detail'),
+]
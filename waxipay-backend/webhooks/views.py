@@ -0,0 +1,36 @@
+# ===========================================
+# webhooks/views.py
+# ===========================================
+from rest_framework import generics
+from rest_framework.permissions import BasePermission, IsAuthenticated
+
+from .models import WebhookEndpoint
+from .serializers import WebhookEndpointSerializer
+
+
+class IsMerchant(BasePermission):
+    message = 'Réservé aux commerçants'
+    
+    def has_permission(self, request, view):
+        return request.user.user_type == 'merchant'
+
+
+class WebhookEndpointListView(generics.ListCreateAPIView):
+    """Webhooks du commerçant, notifiés des changements de statut de ses transactions"""
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [IsAuthenticated, IsMerchant]
+    
+    def get_queryset(self):
+        return WebhookEndpoint.objects.filter(user=self.request.user).order_by('-created_at')
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class WebhookEndpointDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Modification (URL, activation) ou suppression d'un webhook"""
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [IsAuthenticated, IsMerchant]
+    
+    def get_queryset(self):
+        return WebhookEndpoint.objects.filter(user=self.request.user)